@@ -264,3 +264,346 @@ def play_taxi(env, agent, passengers=2, wait_btw_frames=1):
 
 # + colab={"base_uri": "https://localhost:8080/"} id="Zmyw9mKsmRZs" outputId="8dfe9b5a-4084-4779-95c7-26431ba2f4c5"
 play_taxi(env, agent, passengers=3, wait_btw_frames=1)
+
+
+# + [markdown] id="aBm8jV6svgj4"
+# ## 8- Batched training on many copies of the environment
+#
+# The training loop above updates one transition at a time and redraws the plot after every episode, which dominates the run time. Since the Taxi dynamics are deterministic, we can read them once from the environment's transition model `env.P` into three `(500, 6)` arrays (next state, reward, terminal flag), and then step many copies of the environment in lockstep with array indexing.
+#
+# `BatchedTabularAgent` holds one Q table per hyperparameter setting, shape `(n_agents, states_n, actions_n)`, and each agent drives `n_envs` environments. The SARSA (or Q-learning) updates of all the transitions of one step are applied at once with a scatter-add (`np.bincount` over the flattened state-action indices). When several environments visit the same state-action pair in the same step we apply the average of their updates, since summing them would multiply the learning rate by the number of duplicates and make large learning rates diverge. As in `Sarsa_Agent`, epsilon is reduced by `epsilon_decay_factor` for every episode the agent finishes.
+
+# + id="8q2Bz6eHh0Vd"
+def taxi_tables(env):
+    """Precompute the deterministic dynamics of a toy-text environment as arrays"""
+    P = env.unwrapped.P
+    states_n, actions_n = len(P), len(P[0])
+    next_state = np.zeros((states_n, actions_n), dtype=np.int64)
+    reward = np.zeros((states_n, actions_n))
+    terminal = np.zeros((states_n, actions_n), dtype=bool)
+    for s in range(states_n):
+        for a in range(actions_n):
+            (_, next_state[s, a], reward[s, a], terminal[s, a]), = P[s][a]
+    isd = getattr(env.unwrapped, 'initial_state_distrib', None)
+    isd = env.unwrapped.isd if isd is None else isd
+    return {'next_state': next_state, 'reward': reward, 'terminal': terminal,
+            'initial_states': np.flatnonzero(isd), 'max_steps': env.spec.max_episode_steps or 200}
+
+
+class BatchedTabularAgent:
+    def __init__(self, states_n, actions_n, n_envs=32, learning_rate=0.2, epsilon=0.1, gamma=0.95,
+                 epsilon_decay_factor=0.01, method='sarsa', seed=0):
+        # Hyperparameters may be scalars or arrays, one entry per agent
+        self.learning_rate, self.epsilon0, self.gamma, self.epsilon_decay_factor = np.broadcast_arrays(
+            *[np.atleast_1d(np.asarray(x, dtype=float))
+              for x in (learning_rate, epsilon, gamma, epsilon_decay_factor)])
+        self.n_agents = len(self.learning_rate)
+        self.n_envs = n_envs
+        self.actions_n = actions_n
+        self.method = method
+        self.Q = np.zeros((self.n_agents, states_n, actions_n))
+        self.episodes_done = np.zeros(self.n_agents, dtype=np.int64)
+        self.rng = np.random.default_rng(seed)
+        self.agent_idx = np.repeat(np.arange(self.n_agents)[:, None], n_envs, axis=1)
+
+    @property
+    def epsilon(self):
+        return np.maximum(self.epsilon0 - self.epsilon_decay_factor * self.episodes_done, 0)
+
+    def act(self, states):
+        """Epsilon-greedy actions for an (n_agents, n_envs) array of states"""
+        greedy = np.argmax(self.Q[self.agent_idx, states], axis=-1)
+        explore = self.rng.random(states.shape) < self.epsilon[:, None]
+        return np.where(explore, self.rng.integers(self.actions_n, size=states.shape), greedy)
+
+    def update(self, new_s, r, s, a, terminal):
+        """Apply the updates for one step of every environment, and return the next actions"""
+        new_a = self.act(new_s)
+        if self.method == 'sarsa':
+            next_q = self.Q[self.agent_idx, new_s, new_a]
+        elif self.method == 'qlearning':
+            next_q = self.Q[self.agent_idx, new_s].max(axis=-1)
+        else:
+            raise ValueError('Unknown method')
+        target = r + self.gamma[:, None] * next_q * ~terminal
+        delta = self.learning_rate[:, None] * (target - self.Q[self.agent_idx, s, a])
+        # Average the updates of the environments that hit the same state-action pair,
+        # so the effective step size does not grow with n_envs
+        pairs, inverse = np.unique(np.ravel_multi_index((self.agent_idx, s, a), self.Q.shape),
+                                   return_inverse=True)
+        counts = np.bincount(inverse.ravel())
+        self.Q.flat[pairs] += np.bincount(inverse.ravel(), weights=delta.ravel()) / counts
+        return new_a
+
+
+# + [markdown] id="hW0x3zL6nQ2e"
+# The training loop logs the return and length of every finished episode into preallocated buffers. Plotting is left to an optional callback, which is called at most once every `callback_every` seconds.
+
+# + id="wZ3tTtW9rH2C"
+import time
+
+def train_taxi_batched(tables, agent, episodes=1500, callback=None, callback_every=5.):
+    """Train until every agent has finished `episodes` episodes"""
+    shape = (agent.n_agents, agent.n_envs)
+    returns = np.full((agent.n_agents, episodes + agent.n_envs), np.nan)
+    steps = np.full((agent.n_agents, episodes + agent.n_envs), np.nan)
+    rng = agent.rng
+    state = rng.choice(tables['initial_states'], size=shape)
+    action = agent.act(state)
+    return_episode = np.zeros(shape)
+    step_n = np.zeros(shape, dtype=np.int64)
+    last_callback = time.time()
+    while agent.episodes_done.min() < episodes:
+        new_state = tables['next_state'][state, action]
+        reward = tables['reward'][state, action]
+        terminal = tables['terminal'][state, action]
+        return_episode += reward
+        step_n += 1
+        new_action = agent.update(new_state, reward, state, action, terminal)
+
+        done = terminal | (step_n >= tables['max_steps'])
+        if done.any():
+            g, e = np.nonzero(done)
+            # Position of each finished episode in its agent's buffer
+            rank = np.cumsum(done, axis=1)[g, e] - 1
+            idx = agent.episodes_done[g] + rank
+            keep = idx < returns.shape[1]
+            returns[g[keep], idx[keep]] = return_episode[g[keep], e[keep]]
+            steps[g[keep], idx[keep]] = step_n[g[keep], e[keep]]
+            agent.episodes_done += done.sum(axis=1)
+            new_state[done] = rng.choice(tables['initial_states'], size=len(g))
+            new_action[done] = agent.act(new_state)[done]
+            return_episode[done] = 0
+            step_n[done] = 0
+        state, action = new_state, new_action
+
+        if callback is not None and time.time() - last_callback > callback_every:
+            callback(returns, steps)
+            last_callback = time.time()
+    return returns[:, :episodes], steps[:, :episodes]
+
+
+def plot_returns(returns, steps, labels=None):
+    clear_output(wait=True)
+    for i in range(len(returns)):
+        plt.plot(returns[i], label=None if labels is None else labels[i])
+    plt.xlabel("Episode")
+    plt.ylabel("Return")
+    if labels is not None:
+        plt.legend()
+    plt.show()
+
+
+def evaluate_greedy(tables, Q, episodes=100, seed=0):
+    """Average return of the greedy policy of each Q table over `episodes` episodes"""
+    rng = np.random.default_rng(seed)
+    n_agents = Q.shape[0]
+    agent_idx = np.arange(n_agents)[:, None]
+    state = rng.choice(tables['initial_states'], size=(n_agents, episodes))
+    total = np.zeros((n_agents, episodes))
+    active = np.ones((n_agents, episodes), dtype=bool)
+    for _ in range(tables['max_steps']):
+        action = np.argmax(Q[agent_idx, state], axis=-1)
+        total += tables['reward'][state, action] * active
+        active &= ~tables['terminal'][state, action]
+        state = tables['next_state'][state, action]
+    return total.mean(axis=1)
+
+
+# + [markdown] id="4kDGi0EtLu1c"
+# The same agent as in section 5, but with 32 copies of the environment. 5000 episodes take well under a second, and the greedy policy reaches the optimal average return of about 8.
+
+# + id="x2c5sJYqB9sE"
+tables = taxi_tables(env)
+batched_agent = BatchedTabularAgent(env.observation_space.n, env.action_space.n, n_envs=32)
+t0 = time.time()
+returns, steps = train_taxi_batched(tables, batched_agent, episodes=5000)
+print(f"{time.time() - t0:.1f}s, greedy return {evaluate_greedy(tables, batched_agent.Q)[0]:.2f}")
+plot_returns(returns, steps)
+
+# + [markdown] id="mAJk9qEQvN4F"
+# A grid over the learning rate, the discount and the epsilon decay, for both SARSA and Q-learning, trained together in one process.
+
+# + id="6ZPz7u0bYmu8"
+import itertools
+
+grid = list(itertools.product([0.05, 0.2, 0.5], [0.9, 0.99], [0.01, 0.0001]))
+learning_rate, gamma, epsilon_decay_factor = np.array(grid).T
+for method in ['sarsa', 'qlearning']:
+    grid_agent = BatchedTabularAgent(env.observation_space.n, env.action_space.n, n_envs=16,
+                                     learning_rate=learning_rate, gamma=gamma,
+                                     epsilon_decay_factor=epsilon_decay_factor, method=method)
+    t0 = time.time()
+    returns, steps = train_taxi_batched(tables, grid_agent, episodes=1500)
+    scores = evaluate_greedy(tables, grid_agent.Q)
+    print(f"{method}: {len(grid)} settings in {time.time() - t0:.1f}s")
+    for (lr, g, d), score in zip(grid, scores):
+        print(f"  learning_rate={lr}, gamma={g}, epsilon_decay_factor={d}: greedy return {score:.2f}")
+
+# + [markdown] id="NFv_T7a0u4aP"
+# ## 9- Checkpoints with memory-mapped loading
+#
+# `Sarsa_Agent.save` pickles the Q table, so loading it always reads and unpickles the whole table, and pickles are unsafe to load from untrusted sources. Here is a small versioned binary format for the tabular agents instead. A checkpoint file consists of
+#
+# - the magic bytes `TABQCKPT` and the format version (`uint32`),
+# - the length of a JSON header (`uint32`) and the header itself, which holds the hyperparameters, episode counters, and the dtype, shape and offset of the Q table,
+# - padding to a 64-byte boundary, followed by the raw Q table in C order.
+#
+# Because the table is stored raw at a known offset, `load_checkpoint` can open it with `np.memmap`, so an agent can start serving its policy immediately and only the rows it visits are read from disk.
+#
+# For long training runs, `DeltaCheckpointer` writes a full checkpoint once, and then only the rows of the Q table that changed since the previous save, as small `.npz` files next to the base checkpoint. `load_checkpoint` applies any delta files it finds, in order, on a copy-on-write mapping of the base file. The mapping is always copy-on-write, so a loaded agent can keep training, and its updates never reach the file. `save_checkpoint` writes to a temporary file and renames it over the old one, so an agent can be saved back to the checkpoint it was loaded from.
+
+# + id="FYAs0ZAUUEZy"
+import glob
+import json
+import os
+
+CHECKPOINT_MAGIC = b'TABQCKPT'
+CHECKPOINT_VERSION = 1
+CHECKPOINT_ALIGN = 64
+CHECKPOINT_KEYS = ('learning_rate', 'epsilon', 'epsilon0', 'gamma', 'epsilon_decay',
+                   'epsilon_decay_factor', 'method', 'n_envs', 'episodes_done')
+
+def agent_metadata(agent):
+    """JSON-serializable hyperparameters and counters of an agent"""
+    meta = {}
+    for key in CHECKPOINT_KEYS:
+        if key in vars(agent):
+            value = vars(agent)[key]
+            meta[key] = value.tolist() if isinstance(value, np.ndarray) else value
+    return meta
+
+def set_agent_metadata(agent, meta):
+    for key, value in meta.items():
+        setattr(agent, key, np.asarray(value) if isinstance(value, list) else value)
+
+def save_checkpoint(agent, file_name="taxi.ckpt"):
+    """Write the agent's Q table and hyperparameters, and remove any stale delta files"""
+    Q = np.ascontiguousarray(agent.Q)
+    header = {'agent': type(agent).__name__, 'dtype': Q.dtype.str, 'shape': Q.shape,
+              'hyperparameters': agent_metadata(agent)}
+    # The data offset depends on the header length, which depends on the offset
+    header['data_offset'] = 0
+    while True:
+        header_bytes = json.dumps(header).encode()
+        prefix = len(CHECKPOINT_MAGIC) + 8 + len(header_bytes)
+        offset = -(-prefix // CHECKPOINT_ALIGN) * CHECKPOINT_ALIGN
+        if offset == header['data_offset']:
+            break
+        header['data_offset'] = offset
+    # agent.Q may be a memmap of file_name itself, so write a new file and swap it in
+    with open(file_name + '.tmp', mode="wb") as f:
+        f.write(CHECKPOINT_MAGIC)
+        f.write(np.array([CHECKPOINT_VERSION, len(header_bytes)], dtype='<u4').tobytes())
+        f.write(header_bytes)
+        f.write(b'\0' * (offset - prefix))
+        f.write(Q.tobytes())
+    os.replace(file_name + '.tmp', file_name)
+    for delta in glob.glob(file_name + '.delta*.npz'):
+        os.remove(delta)
+
+def read_checkpoint_header(file_name):
+    with open(file_name, mode="rb") as f:
+        if f.read(len(CHECKPOINT_MAGIC)) != CHECKPOINT_MAGIC:
+            raise ValueError(f"{file_name} is not a tabular agent checkpoint")
+        version, header_len = np.frombuffer(f.read(8), dtype='<u4')
+        if version > CHECKPOINT_VERSION:
+            raise ValueError(f"Checkpoint version {version} is newer than {CHECKPOINT_VERSION}")
+        return json.loads(f.read(header_len))
+
+def load_checkpoint(file_name, agent, mmap=True):
+    """Load a checkpoint (and its deltas) into agent; with mmap the Q table stays on disk"""
+    header = read_checkpoint_header(file_name)
+    deltas = sorted(glob.glob(file_name + '.delta*.npz'))
+    dtype, shape, offset = np.dtype(header['dtype']), tuple(header['shape']), header['data_offset']
+    if mmap:
+        # Copy-on-write, so that the deltas and later training never modify the file
+        Q = np.memmap(file_name, dtype=dtype, mode='c', offset=offset, shape=shape)
+    else:
+        Q = np.fromfile(file_name, dtype=dtype, offset=offset).reshape(shape)
+    meta = header['hyperparameters']
+    for delta in deltas:
+        with np.load(delta) as d:
+            Q.reshape(-1, shape[-1])[d['rows']] = d['values']
+            meta = json.loads(str(d['hyperparameters']))
+    agent.Q = Q
+    set_agent_metadata(agent, meta)
+    return agent
+
+
+class DeltaCheckpointer:
+    """Full checkpoint once, then only the rows of Q that changed since the last save"""
+    def __init__(self, agent, file_name="taxi.ckpt"):
+        self.agent = agent
+        self.file_name = file_name
+        self.save_full()
+
+    def save_full(self):
+        save_checkpoint(self.agent, self.file_name)
+        self.last_Q = np.array(self.agent.Q)
+        self.seq = 0
+
+    def save_delta(self):
+        Q = np.asarray(self.agent.Q).reshape(-1, self.agent.Q.shape[-1])
+        last = self.last_Q.reshape(Q.shape)
+        rows = np.flatnonzero(np.any(Q != last, axis=1))
+        self.seq += 1
+        np.savez(f"{self.file_name}.delta{self.seq:06d}.npz", rows=rows, values=Q[rows],
+                 hyperparameters=np.array(json.dumps(agent_metadata(self.agent))))
+        last[rows] = Q[rows]
+        return len(rows)
+
+
+# + [markdown] id="Z0-hXv2xWBb4"
+# Save the SARSA agent trained in section 5, and serve its greedy policy from a memory-mapped copy.
+
+# + id="CrilYE7wvxY3"
+save_checkpoint(agent, "taxi.ckpt")
+print(read_checkpoint_header("taxi.ckpt"))
+
+serving_agent = load_checkpoint("taxi.ckpt", Sarsa_Agent(env.observation_space.n, env.action_space.n))
+serving_agent.epsilon = 0
+print(type(serving_agent.Q), np.array_equal(serving_agent.Q, agent.Q))
+
+# A loaded agent is writable, and can be saved back to the file it is mapped from
+round_trip_agent = load_checkpoint("taxi.ckpt", Sarsa_Agent(env.observation_space.n, env.action_space.n))
+round_trip_agent.Q[0, 0] += 1.0
+save_checkpoint(round_trip_agent, "taxi.ckpt")
+reloaded_agent = load_checkpoint("taxi.ckpt", Sarsa_Agent(env.observation_space.n, env.action_space.n))
+print(np.array_equal(reloaded_agent.Q, round_trip_agent.Q), reloaded_agent.Q[0, 0] - agent.Q[0, 0])
+
+play_taxi(env, serving_agent, passengers=1, wait_btw_frames=0.1)
+
+# + [markdown] id="sXNbVfNoRDcO"
+# Delta checkpoints while training the batched agent of section 8: as training converges fewer rows of the Q tables change between saves, so the deltas shrink.
+
+# + id="BmOMA1pSZU5J"
+delta_agent = BatchedTabularAgent(env.observation_space.n, env.action_space.n, n_envs=32,
+                                  learning_rate=[0.2, 0.5])
+checkpointer = DeltaCheckpointer(delta_agent, "taxi_batched.ckpt")
+for episodes in range(1000, 6000, 1000):
+    train_taxi_batched(tables, delta_agent, episodes=episodes)
+    n_rows = checkpointer.save_delta()
+    print(f"{episodes} episodes: {n_rows} of {delta_agent.Q.shape[0] * delta_agent.Q.shape[1]} rows changed")
+
+restored = BatchedTabularAgent(env.observation_space.n, env.action_space.n, n_envs=32,
+                              learning_rate=[0.2, 0.5])
+load_checkpoint("taxi_batched.ckpt", restored)
+print(np.array_equal(restored.Q, delta_agent.Q), restored.episodes_done, restored.learning_rate)
+
+# + [markdown] id="Pf1M0Vzhbr_R"
+# Load times for a large table (a million states), compared with pickle.
+
+# + id="Z-56IzcMT1Rr"
+big_agent = Sarsa_Agent(10**6, 6)
+big_agent.Q = np.random.rand(10**6, 6)
+big_agent.save("big.pkl")
+save_checkpoint(big_agent, "big.ckpt")
+
+t0 = time.time()
+big_agent.load("big.pkl")
+print(f"pickle: {time.time() - t0:.4f}s")
+t0 = time.time()
+load_checkpoint("big.ckpt", big_agent)
+action = big_agent.act(123456)
+print(f"memmap: {time.time() - t0:.4f}s")
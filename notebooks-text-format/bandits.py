@@ -117,5 +117,344 @@ import pandas as pd
 # + [markdown] id="WEL7iOACn-PT"
 # ![48b557e7-55c8-46ee-9c34-f589318ef6b5.png](data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAwQAAAGmCAIAAABN0tR5AAAAAXNSR0IArs4c6QAAAARnQU1BAACxjwv8YQUAAAAJcEhZcwAADsMAAA7DAcdvqGQAAAAHdElNRQfiAwsFNw8BipK2AAAAB3RFWHRBdXRob3IAqa7MSAAAAAx0RVh0RGVzY3JpcHRpb24AEwkhIwAAAAp0RVh0Q29weXJpZ2h0AKwPzDoAAAAHdEVYdFNvdXJjZQD1/4PrAAAACHRFWHRDb21tZW50APbMlr8AAAAGdEVYdFRpdGxlAKju0icAAAAadEVYdFNvZnR3YXJlAFBhaW50Lk5FVCB2My41LjExR/NCNwAAP7lJREFUeF7t3Yl3FFX+9/HnD/qd8zs+Z36O8+jP36OiQgwJIIJAcBsdxhlFHxckLAlhFVBQdFwAZwIKWUGQRWSRZQQ3UJawiiCCsoU9IYQkzXOTW7m5fbu6uru6U93V9/0636Op6lq6b92u++nqSvhftwAAACxGGAIAAFYjDAEAAKsRhgAAgNUIQwAAwGqEIQAAYDXCEAAAsBphCAAAWI0wBAAArEYYAgAAViMMAQAAqxGGAACA1QhDAADAaoQhAABgNcIQAACwGmEIAABYjTCEoC1at7Ny7XdU8vXJ+h+ctkPva73Z9s+YQ0AlqM+/azh22mnBXHDw0J33Dv6P2/uJuuOeR/YdcmbH0Tx91jty4YqZ85udmXlky3b56kTdV/jUWWduDnN5wr1+jAhDCFq/8UuGv7+TSrJGvL+zaOJSp+3Q+65dv9F3Yp1xFCjvGvr2V3WbdzstmEhl5VI11KnauNV5tJMWZVS9PPEt59FkpBSGtKFXVNQzyQ/JhSHX4yJrcMlz8xctCy4mxj7h3j9GhCEErWBC1WML91HJV3FZldN26H0iDPUrX2YcAsq7hv/juzTDUFTWiR75ZGUqDDUcPLJwUXXfAY9/ULnSmUUY6uIRhmQlcY0tQ1IJQy4H1BfCEIJGGEq1CENBIgz5qPTD0IhnxqkLD+PKZhiPispEGGosKHpcbVAfO/maTEgYhkTph6kXuT1ht2MU94D6QBhC0AhDqRZhKEiEIR/lLwyJmPL8K+Xq5+7I0vznv7ws5ohR8MlnO3+Q1athKM+lHobUYpu37NC/svRYPZOSe8KEIYQbYSjVIgwFiTDko3xfGRpbPlv97Hz30Z1jBo54fsiIZ9WjThjSUo4oZ5XYsTMmDLlebRLVuVn35OShuapu9VOjxuhrjSmbc+xX52FjkBZPcs3aDWJh8dz23Tpijt8nTopNyUmxEXnNQy4v5ogtL6n7omteDxFQ1CpigcdHjdV23UXbpmjGhYuq5c+iPLKFaxhS2VSWdmUo5UYQ7awOqHkFLuETTumA+kIYQtAIQ6kWYShIhCEf5TsMzX1/kRrknGGsO9mMemmKPgznThjSn79e2rpROUAFvtgw9PdXJusvR5RIG2+//5E+R5R2zSMqmujlNIUQ3URGpRqG9CtDeuOk2gj6gZbV86KSecIpHVBfCEMIGmEo1SIMBYkw5KN8h6Gl9WvVkCmHPTXIvfnex+EKQ6K6R+KoHKBKPDcjDCVZ6nqMx66740vctCSrezEXHhsXZVx/8t0IqlJ7woQh5B/CUKpFGAoSYchH+Q5DIs2oUU0Mcl//sE8OjfrPstIMQ12ihmfXKxPJhKHaupVjyubsPXjUmdZW7x7go3aktrlmzSYjDDkpR3v+ouQr1VspdrNijowmRmMa7bNi7TaRNvTc0L0pF95hSLwK/bfrU20E8aLEuvounGZJ8gm7H6M4B9QXwhCCRhhKtQhDQSIM+ah0wpA+WTH7fTm8iSHw51unshiGjGRgZohzjQsXVT//SvngkufcFvMYpN0eSvSinGcVnZliS2xNf9o9zzm2fdwYL9m1oq67pNIIzouKaepkn3BKB9QXwhCCRhhKtQhDQSIM+ah0wpA+zolhVf7cNehGfYGSO2HIIzR45QBHcGGo52Znbfv6CzG455Lo6zTx2kcvr0aIaepkn7DbMSIMIdwIQ6kWYShIhKF5E6vUAHPbPSOHLT1kLBBbaYWh6CFNVtfAlpNhSFtYPKVjv5zSN+uVAxxuzyHRi3KeVezLjOGeLZJYUdDXjVosOoR1Pj3fjRDT1Mk+Ybdj5N6YfhGGELRcDkOjFu+8/6kK+da658nXSxbtNxbIShGGgpRSGLq3ZKw6F+t1e8HTD45+b/g7iWNEDlbgYci8GbZ7tHMLQy7jn89bTLo3GG9hd/qTl6PvmrUb1ByvHOBwG7+1JyAqbhiKXkw8fyc66KKDi+97hrTFzBucxdPz3wixTZ3kE07pgPpCGELQ0gxDL1Ztv/3e4eoNIOr2ohczlVr0YUBUcdkJY4GsFGEoSBkJQ7L+885Bj8w6aqyS+xV8GNLniOoeTV3DkDk2G+U5drr8ClLnZuMs7C568DbKKwc40ghDcf42tyxnU9Hbj63uZ+jCOAqu5azuuxFcmjq5J5zSAfWFMISgpRmGjLwiyveQM2TWun6j3/5Dn2EPjF4g5xCGkMEwJCqDST2wCj4MGWmg++sS1zCUYMz2HjtjR/GUw1DM4F3y1zFqjlcOcEQ9lGoYEqvrf4hSr+4wlFz7uEkYhvSn4bMR3Jo68wfUF8IQgpZmGHIdflSaSbKMy0v66nxNZjnfYUjmntI5X+pdK4wXh7IQhlwjQpwwJNTWrZRDoxgXx5TNSeYPFvfQ/g6yeOjN9z72WthV9F9SPn7rZFI5wJFmGBKa16zdoP8Cl3j08VFjv9npPCyIBfoOcPbi3j5uPELJ/QOeMP/Ven+NEKepEz/hlA6oL4QhBC2dMKSHmD8OfE79nOrnb48wlINFGApSmmHImGmEoYfLqu8s/rt66I7i54fOPSIf0te6a0SFmOPaS/WkIueMWryz8OUFYrO33TVQzhdbvrukXG3Z2E5x2YmBpZViYRV0RIBTz+q/Cp7pN/pttXBvhCEgBxGGELR0wpA+EvR5du5/FzsfCOJ9/tbHHrmYGD9cry2JEiPQ5Flr9RFFbVOMN8amxDBWPLFnyIwdb8Sm/tTvSTmZ5kUmwpAPpy+3NN9ou3UrIjizkpPZMKTChOhCqrsaJb+NLRr9lpojw5DeG9VMtZjqn/qKeqkFjM75f0smyB/kczP2YhRhCJYgDCFo6YQhNczIE70+6hhXd+KNPWJESTUMibFExRqj1PhnjDf3/+1NY4BJ5+ITYciH9Q3nn/5Xw/JdZ663phaJ0gxDRrZQxz1eZBEVG0rkpow72ORMtUcVUzy2LPOT0TlViS0Mrd8cL6LJIgzBEoQhBM13GNLP6fIcrQ8DKpfI8kg8qYaheMvL8h5vVCU5qLgWYciHDQ2NIxfsFfV0ZWqRKFM3UIv+U1jqdHWj68ovsPTeW1x2wrt7y5l6dpEdT1Txyx/cXVI+eNZ6Oan3Ybkdo3Oqjj1w7OIBk6v16CaesPgUob+oJPstYQhhRxhC0HyHIf2DshwJXLOLMV8uLHNS6ZwvHxz9nvjBGB7Ux/fYDRqbksObPkrJxYwNyj3GLib3kmr5C0MHfr82rv6ItTV6ycGRC5wG1CJRe8JIlJEwJA63SkKijGs8sSV7oNqaWH3Q9FXGNRtjpn6t8cV52/uNfvvuoS/dXvC0Wl6UaxjSV9S7qMo9+rMlDMEShCEEzXcY0gceeUKPd5Z3PcXrlXwYct2UsbrxsV7Ocd2a3Euq5S8M7frlirEdy0tGou+PXXYaKI5MXRkSpfpVkmFI72wFr3wke5T+iwJqpt6d9LWMcg1DsnPGrquurer9ljAESxCGEDR/Ycg4obuW+uLA9RSvl78wpDYVu3oOhqEfTlx5fOE+a0u0m35lSPy37NOfjp5t7rwu1DtXhkT3GDJrnd4NVJJI8lqL3mHUbWeFpVU9X40NfVXOdA0uov8/Omez3hX9hSGuDMFChCEEzV8YSvjZWpQ6ceuneNezub8wpDYVO7rkYBiy3PqG8/KeoccW7C1bkVQMktK8gdroqLJr6T1BlPre1ii9F8kvvIxOeFufEfIH19wv9zWwtFLNSRiGjGfLPUOwFmEIQfMXhry/j1AlT/TGKV6NPfHuGVJDS2x8MYaxJO8ZIgxlnQhDJV0x6OezTclkICXNMGT0BHW5xaMDqyweu5jMIrGfBFSg8f6QkDAMGQ/FFmEIliAMIWg+wpBxytYHD+NX6GWs8fibLir3xA5O4qHY+OKxKVlyg4ShXLPn1ytHU4xBUpphyJipjrvoIfH+QIPen/WcLUpu00jkel+KTTP6PUYJw5AoY49GEYZgCcIQguYjDBkff42zuT72qHN3vLFHhaHYj9SuYchjU6LU+Oc63hCGwij9MBR7YVIuLIL1wNJK/Re+RK+4o/j5QVOOywVEGblH5iSjd6kdqVX0P+85rL7n3wNJJgyJEs/qD32GyUfvLinnL1DDQoQhBM1HGHKNO6qMj7bqXC/HHnWWF3VbnxH6Lzzro4gYlvo8OzdefIndVMK/QC1mEobCKKUwRMkiDCHsCEMImr97hmwuwlCQCEM+ijCEsCMMIWiEoVSLMBQkwpCPIgwh7AhDCBphKNUiDAWJMOSjCENBO3joznsHy6/g77jnkX2HnNnwjTCEoBGGUi3CUJAIQz4qT8KQljA2bnXm5ajAw1Bl5VK5u/sKnzrrzMsrhCEEjTCUahGGgkQY8lF5EYaa//yXl+V4//LEt5x5SWg4eGThouq+Ax7/oHKlMysVPlfPwpUhn+0TFoQhBI0wlGoRhoJEGPJReRCG1JWPVLJFY0HR43ItUamHoTRWz8rXZFu2q2eb61fOUkcYQtAIQ6kWYShIhCEfFf4w1JNLUrnsYVkY0i4OjXhmXLMzM08QhhA0wlCqRRgKEmHIR4U+DHlc8zhx8qlRY9SjInm8+d7HYva4shlqpl7dWaq5qm61WFGPLGPK5hz7tevBxKt32rxlh9q1WP3xUWPV6h5hyGstKc4rcng+6uv6WTgQhhA0wlCqRRgKEmHIR4U9DKloYt4drIUkVTKveKcZFRqMUhkiYZZS12CMcrKaexhKtJYQ/xUlflTQ9pv6lbCcRhhC0AhDqRZhKEiEIR8V8jDU83VV9Lc/UV9jqUonDIlKc3UnrrmFocRreb6iRI9K8doq9AhDCBphKNUiDAWJMOSjwh2GtGARb+CP861QVHrQr5TU1q0cUzZn78GjzrS2C+3iU7zVe+aLheWXXHrQ6bzM4xKGklgrwSvyflTqufikvZB8QBhC0AhDqRZhKEiEIR+Vp2Eo6lsnkQ/0m366xEszXc41LlxU/fwr5YNLnlPLiEochty+q9Krc8nYMJTMWgleUcLXKxCGgAwhDKVahKEgEYZ8VJ6Goc6Hhox4Vj6kqmLmfOfR+GEoiW+shODDUKJXlOD1CoQhIEMIQ6nVRw2EoSB1haHl5lGgPGv4e9/nZxjq0nDwyLjymXIBWd33I8dJM9EbPPbLKX3JlMJQ3MDhGYYSxpT4r6iT56OEISBDnpld//TsZVTy9be5nzpth97X3NL6xOu1xiGgElX9F98ddlowfHpCiXED9biJs9V9P/otz93BJSrNqCClXxaSS65Zu0HNiReGenKYFnTkfJf7lGPDUDJrJXhFCV+vEK+tQo8whEBFIhHnJ6SCdgN6TbyrHVFhRS91pST2l8I6M43nN1b6LtxXd5uvysklsWEombUSvKLEr1ffb096ywuEIQCA1WJ+60pyDwdRISAm93Q9aq5Y8tcxak5U3nJfXWiMvXdHlkcYSrxWgleU+PXGaah8QBgCANjN/YJH8/RZ7/Qd0JMPHh81duOW750HFe2mY5FLnL/XrM2smDn/+K2T7mFIcF29U/OatRv030QTj4on8M3Orgfdw5DguVaCV5Tw9ebtDUMCYQgAYDv1HVN0toBGu46l3UWUJwhDAAD0fEmkfzGEbj2XhfLvX2kVCEMAAER995RnN8SkT90tlH9fkEmEIQAAYDXCEAAAsBphCAAAWI0wBAAArEYYAgAAViMMAQAAqxGGAACA1QhDAADAaoQhAABgNcIQAACwGmEIAABYjTAEAACsRhgCAABWIwwBAACrEYYAAIDVCEMAAMBqhCEAAGA1whAAALAaYQgAAFiNMAQAAKxGGAIAAFYjDAEAAKsRhgAAgNUIQwAAwGqEIQAAYDXCEAAAsBphCAAAWI0wBAAArEYYAgAAVks3DEUikeMAAAC9r62tzckfGcWVIQAAYDXCEAAAsBphCAAAWI0wBAAArEYYAgAAViMMAQAAqxGGAACA1QhDAADAaoQhAABgNcIQAACwGmEIAABYjTAEAACsRhgCAABWIwwBAACrEYYAAIDVCEMAAMBqhCEAAGA1whAAALAaYQgAAFiNMAQAAKxGGAIAAFYjDAEAAKsRhgAAgNUIQwAAwGqEIQAAYDXCEAAAsBphCAAAWI0wBAAArEYYAgAAViMMAQAAqxGGAACA1QhDAADAaoQhAABgNcIQAACwGmEIAABYjTAEAACsRhgCAABWIwwhUJFIxPkJqaDdAKD3pBuGrja3HPjlDJVaHT/T2tbmtKB9+o75Z8GEKir5Khq/yGk79L72jg7xDjXfs1SiarzS5LQgEELphqGv9h4bMGPt4Dc3U8lXv4l1pxuvOC1oHzG6P7ZwH5V8FZdVOW2H3nft+o37S5cY71nKuwbNXF+3ebfTgkAIZSAMDZ233Th3U95VNG0tYYhKvghDQRJhqF/5MuMQUN41/B/fEYYQaoShLBRhyGgQyrsIQ0EiDPkowhDCjjCUhSIMGQ1CeRdhKEiEIR9FGELYEYayUIQho0Eo7yIMBYkw5KMIQwg7wlAWijBkNAjlXYShIBGGfBRhCGFHGMpCEYaMBqG8izAUJMKQjyIMIewIQ1kowpDRIJR3EYaCRBjyUYQhhB1hKAtFGDIahPIuwlCQCEM+ijCEsCMMZaEIQ0aDUN5FGAoSYchHEYYQdoShLBRhyGgQyrsIQ0EiDPkowhDCjjCUhSIMGQ2SUzVq8c77n6r4j9v7ibrnyddLFu03Fgi+CENBIgyJmjexSr4FRN12z8hhSw8ZCxhFGELY5VAYeris+s7iv6t3oKjbC55+cPR7xmJ5UIQho0FSrRertt9+7/CorlL0YqZSiz4MiCouO2EsEHwRhoKUahi6t2Ss3mFUydPX8HcSxIjcLMIQbJMTYUh8Fv/v4mfVe08vY5AbMmtdv9Fv/6HPsAdGL1Azk680V89UEYaMBkm1jLwi6j/vHPTIrKPGYslUbJcgDFkuU2FIlu+emd0iDME2ORGGika/pd54RqkwZFwMSDXNpLl6ZoswZDRIquU6/GSwS/A1mc0yG4ZEZfCyZWBFGIJtsh+GjDFJnThGLd75cFn1fU9NJwzlmTTDkH4o/zjwOfVzqkNOTnUJ7yIMBSmdMCQ7YemcL/WuFcaLQ4Qh2Cb7YWjyrLW33TVQvfH+z5DXYoe0eJ+97hpRIR4Vsanw5QV3Fv9dbUecfe4uKR8690gyq8vS71gSq99R/LxaPeMVxjB0/UZ7JBJxJtKTZhjST9N9np2rvmCNN+QY96KJxUTu8egSeofUtynTub4p0UmKJ/aMmka6Ki47ITb1p35Pysl0LjIRhny43uqzx6YfhoyZRs/0ONXoa8mzk2tk198Cck7Cc2Bs5xxYWikWVkFHBDj1rP6r4Jl+o99WCxOGYIOcuzIkSrwV9TFGlHeaifctmzoHea/uccdSL90vEsYwtGr3ufHLjhz47dqttCNRmmFIHU15fPWDa1zdiXdkxXH36BKuYUj0UhVrjFLjn9GT7//bm2o7snxffCIM+bCh4fzY+sP7Tl29dSu1HpvxMKTCRMJTjX4qk2cn47OiccZT/TPhOdDonP+3ZIL8QT43Yy9GEYZgg+yHoXgnCPE2Lix1Rk2PoUs86nHLkVzA9+rJnAV8VEjD0MgFe0WNXy4i0dV0IlE6YUg/p8ujox8+45syj+Pu8ZBrGIq3vCzZkWJjvVG+uxNhyIf1Dedljy2tP7LvZAqRKP0wZGQLFYITnmr0FeWm9ItAaqbao+pRCc+B8Tqn2MLQ+s3xIpqsZPotYQhhlxM3UHt8LlHnEePNrH/ILn75g7tLygfPWi8n9a2pt3G81Y3BVV5V1s8svXFxyHcYOn6++ZOvf89KTfns6MgFXc9/wT4xwExIIxKlE4b0sUGe5V2zizFfLixzUumcL+Xfa4jXJWI3aGxKZnS9k8jFjA3KPcYuJveSUvkLQycvtBgH0aqavvpn0VFF640UJSLRsmQjUQZvoBZHXH2iS+ZUYywjzl1GyulcUcsu8i0gKuE50OicqisOHLt4wORqo3uLD6j6i5JbkFuOV4QhhF1OhCFRYoiK9zWEjCPxhi5ZL87b3m/023cPfen2gqfVMqLU2zje6sYHr9gydpSR8h2Gvj56ydhUtkoEIzHAjF9++Ni55lTvzEgnDOnnaHlo4h1ZfRRxPZvHWzE2DLluyljdGMnkHNetyb2kVP7C0K5frhjbsblkJBpbf+SnM01OA8WRqTCkJyFRSZ5q1NbE6oOmrzKu2Rgz9bOT9zkwXm8X5dq99Wfr+vYxijCEsMuVMCRLRKJ7S8apN6Es+b5N8s1sVLyhS60erjC04+ilEfP3ZqVKuj5kqxLjyt8+3r++4dyNmynfpuo7DBkH0bXUZ2W9Vxhfn8mK1yW8w5DaVOzqxpxcCEPGQbSqYnvsXxftX7PnXEtru9NAcWTwypCoVE81emcreOUj2aP035pUM/XulPAc6No5Y9dV3Tv22pJa3rUIQwi7nLiBuu9z7+ljlXHWkMNbMkOXWPLROZv1JVMKQ8m85zNSvsNQy82O89das1I1354Ww4l48jIGfdFwrrUtwaASj+8wlHA4EaUOon6Kdz2yyfSo2DAUr0fl4JWhG9nrLblQn+46o3rsXxd3xqAke2ya9wwNmbVO7waqwyR5qtE7jLoHv7C0quersaGvypmuwSXeOdC1c8pyDUOpnhgJQwi7nAhD4l2q/waZ8SlHjlLGm9n1AoBccmBppZoTb+hSq+vnETlfj2W9VCG9gVp81O6MQfvO3WzrcOb64jsMeX8EVyVP9LGRWh7ZePcMuXYJGV+MTpLkPUNZD0OWW99wXvTYlGKQlP4N1Ebfk+elJE81ei+SX3gZify2PiPkD6rHJnMOdO2csoxnyz1DsFOuhCH1xjNKfx/GjoXidGC8k41KuLrrfFXqakFmK4xhaNOBxnVpxyDJXxgy+ol+aIxfSJSH1ePXmNUo4tolYuOLx6ZkyQ0ShnLKvw9fXL1b9NiUr1+mH4aMnqAutyR5qjEWkyex2BOdCjTJnAM9wpD3GVgUYQg2yOkwZAwese95MQjFrq5/v66/jV1XF/PFFuLdu00Y6g3+wpBx+PSzuSh9/FAHPd6RVWHItUu4xhePTqKGOqMrEoZCKv0wZMxMphfppxrj0rjcpnFhSe9LRscTFXsOdO2cqow9GkUYCpmDh+68d7A8dnfc88i+Q87s3LVlu+ps9xU+dbZzVvP0We/IORUz5zd3LdXbcuIG6ofLqu8e+pL+Vpf/4LM8reglzgjqbCJOB32enWvMvOfJ14fV9/wtfONt7Lq6KPHRf2Bppf5bGOLRO4qfHzTluFo3g0UYMhokmXKNO6qMs7k618sj+4c+w9RDt/UZof+OT2yX0EcdfciJ3VTCv0AtZsbbWkpFGApSRsKQkbNV/k7mVKP3GVEyJxm9S+1IreJ9DvQOQ6L0vn13SXnO/AXq5oWLqgeXPKeejBjdxWQIBvgsSi4MVVYuVa1qlGjh+YuWBRNBOsWGIW2OqI1b5XK9KyfCkG1FGDIahPIuwlCQUg1DlKjeCENr1m5Qg7pRvTc6Nhw8IuJX3wGPf1C50pnVC3p3L2mHIVnBXVVKJQz1XtMRhrJQhCGjQSjvIgwFiTDkozIehryH6t4JQ40FRY+rXfRaGOr9vWQoDIka8cy4IK4PuXxNdsvta7LebTrCUBaKMGQ0COVdhKEgEYZ8VIbDUPSFATGib9zyvfPQucaFi6q/2elMZZS9YUhFkM1bduhX49T83uUWhtwQhvKuCENGg1DeRRgKEmHIR2U0DDX/+S8vqzEv0Zc1zWL8fmrUGLX846PG9iSnTlEjaOclpYOHhoxwfjlUXXUYVzZDLaPXyxPf6nq8k74j8azEjo796jxkXGXpvnAV9ULEprz2oiUYUc4W3FNCc1XdavFM9MQzpmyOejLphCHjOWtXhhLtNLl2dpw4qVpy4IjnRbqVP4tynknMS0jmAKWJMJSFIgwZDUJ5F2EoSIQhH5XJMBQdCzwvADSq4dYobRSPGqTnvr9I37gouf1EY21URNCrO/dE7cXZe0yUyUgYivf1Vk/uSSMM6VeG9HUT7zS5du4U/UqNIgzZVYQho0Eo7yIMBYkw5KMyGYaivyPrThsu4g2QsrqHyahBOrYSx5T4UUCUihH6044dvxNHrrTDkCjnJacehmJLv+4lJN5pcu3sEStlEYbsKsKQ0SCUdxGGgkQY8lFZCEPR6WHF2m1inj5md+eAqEFajJ3N7ouZS2pXpHrmi6FaRgR9C+oZ6gN2yV/HqLWib0OOs5ekw1Bt3coxZXP2HjzaNRW1Yrwk4co7DIkV9d+uT7zTJNvZ5ag16+3m+RLiHaDMIAxloQhDRoNQ3kUYChJhyEcFH4b0gVYFBWO87Fo3dk6KY23084mteIFGVkwcibOX6HU9wlCnrrvIn3+lXP8LTD3LuL86k3cYkhV13cV7p8m1s/tRi32ZKR2gDCEMZaEIQ0aDUN5FGAoSYchH9V4Yijfm6cNqvDuEutZNapDuEmesTT4MuX0RFn1ZSIizl6TDkEeI8R2GenJJ9HUatXrinSbXzu5HTVuMMGRXEYaMBqG8izAUJMKQj8pkGIoe87RxutuJkw0H4o3lsUNyUoN0lzhjbbzLM7G0zeoVPWzH2Uv0unHDkLbYyxPfOvbLKX2DnknCFKcBzfDX+UyS2Wly7ewehjxfJmEon4swZDQI5V2EoSARhnxURsOQeR1CDIfqt+Xln6U2RmhRSd4zlHwY6vmGKHpH8m4YN1G3Bo8tn61+jooa8fbiMtK73Eyjv0CZBkSDqDmeScIUJwyZNziLFktqp0m2c3TSSueeIa3pMoMwlIUiDBkNQnkXYShIhCEfldkwJIa9eL8zL6trrE3we0ndg2Vyg3SX2C+55EZi56tS1yeMbLHv1pF4I3ecvST3a1bRYcIozyRh0p9wvEphp8m2c9RiseX9EuIdoIwgDGWhCENGg1DeRRgKEmHIR2U6DAle4cAZa1P/O0PeYSh21FeJKt6OnDCkbVDN1EfuZPbinU5cM4co/dfWMhuGtHWT2GnS7ZzUy0z5AGUAYSgLZXkYeuC1xQ/P3kQlW29sKhz/sdN26H2EIR81/L2Mh6FODQePjCufqeeMwSXPTZ31gfYncJrXrN3Qd0DPMJz4L1ALHnFB+7vJ4qE331Nvvc4d6b9IJR4V+5L/MIh77olOSFF3UsfZS23dSrmKmDmmbI7Ln2YWov+y8/FbJzMehu4f8IT5r9Yn3Gkq7awfMveX6ecApSvdMLRj3/GHxn1SOLGKSr4efK3y9IWrTgva56eT56mU6uipRqft0PtEGLr/1X8a71nKux4av2TZ1r1OCwIhlG4YAgAACDXCEAAAsBphCAAAWI0wBAAArEYYAgAAViMMAQAAq+VnGLrafOPU+cuRSMSZBoD8Is5vzS2t4n/ONIA05GcYmrBw3X2vLrrR2uZMA0AeEUno1LnLheMqz1+6xqc+IH35GYbGzV/74PgawhCAfPXiu58NmbdjwkdfiGjkzALgF2EIAELmu4MnBkxfO3LBvv5TPms4dtqZC8AvwhAAhEl7e8eIabUl83ePXLC35MPdf569rKOjw3kMgC+EIQAIk5ovdw+es1X9I6kDZ21Y+/VB5zEAvhCGACA0rjbfKC6vGblgrwpD4ueHK2qu32jlTmrAN8IQAIREJDJ9yZePvvutSkKyhry9/d3l251lAKSOMAQA4XDx6vW+r/2reMpKUUWTV4gMJP4rJwtLK69dv+EsByBFhCEACIdIJHL52nVZn23f/9CkTzftOuLMaWrhazLAN8IQAITPxp1HCso//Wb/L840gDQQhgAgfAhDQAYRhgAgfAhDQAYRhgAgfAhDQAYRhgAgfAhDQAYRhgAgfAhDQAYRhgAgfAhDQAYRhgAgfAhDQAYRhgAgfAhDQAYRhgAgfAhDQAYRhgAgfAhDQAYRhgAgfAhDQAblcxi6fuOmMw0A+WXDd4cLypcThoCMyM8wVPGv9Q9OqLna3OJMA0B+WbV9f7/y5T8cOeVMA0hDfoah91fu6FdWf+LMJWcaAPLL/FXf9C2rP376gjMNIA35GYY2/3C0/5SVX+095kwDQH4pXfB5YXndteYbzjSANORnGPrt/JX+Fcvn1m5zpgEgn0Qij0yufXRabUdHhzMHQBryMwxFIpHBFbWPTq1tb+dMASDfnDhzUXzee6Oaz3tAZuRnGBLeqNlSUL684dhpZxoA8sXsanF+W7b/+BlnGkB68jYM/Xb+cuGkZc+/89mtSMSZBQDhd7W5pai8tmR6XTvfkQEZkrdhSCid//lDk5Z9f+hXZxoAwm/Gki8fqlix5cejzjSAtOVtGIpEIucvN/Uvrxkypaa5pVVMOg8AQGjt/ulUYcXyv85d0dHBOQ3ImHy+MiR8+u99hZNXvPrBmnZx5iAPAQizc5ebHq6oLpxY/XvjFWcWgEzI8zAkAtDkRRsLp6ycsmgjeQhAeDVeaRo2tfahSfV8QQZkXP6Hofb2jlc/WFM4eeUr769paml1HgCAMJAf4Y6cOv/I5Or+k5Yt27pXzgeQQXkehgSZh6Ys3lhYsWLIlJpvD3I/NYDQuNnWvviLnQ+V1RSW1a779pA4ocl4BCCD8j8MCfL0seLf+4rKax6atPy5eZ/tOfpbG3+PEUAOa25pXbXjwNApNYWTVw6fVvfTyfPOAwAyzYowpDReaRq/8IvCSctEJHpkSu3s6q2bfzz682+Nl65db7p+Q5x6KIqislXiLHT+ctOB42c+277/tQ/XFpd3xqABk2orP/+eD29Ar7IrDMnLy6cbr75Vt23I5Nr+FcsLK1b2K1v24IRaiqKobFdN3wm1BeXLRAbqX1735zeWL9u6V4QkefoC0HvsCkNRIrfOXLi6bc+xj9Z8O/2TTZP+9QVFUVR2643qLVUbf9x99LfLTdedMxWA3mdxGAIAACAMAQAAyxGGAACA1QhDAADAaoQhAABgNcIQAACwGmEIAABYjTAEAACsRhgCAABWIwwBAACrEYYAAIDVCEMAAMBqhCEAAGA1whAAALAaYQgAAFiNMAQAAKxGGAIAAFYjDAEAAKsRhgAAgNUIQwAAwGqEIQAAYDXCEAAAsBphCAAAWI0wBAAArEYYAgAAViMMAQAAqxGGAACA1QhDAADAaoQhAABgNcIQAACwGmEIAABYjTAEAACslm4YikQiJwAAAHpfW1ubkz8yKgNhCAAAIBhO/sgoviYDAABWIwwBAACrEYYAAIDVCEMAAMBqhCEAAGA1whAAALAaYQgAAFiNMAQAAKxGGAIAAFYjDAEAAKsRhgAAgNUIQwAAwGqEIQAAYDXCEAAAsBphCAAAWI0wBAAArEYYAgAAViMMAQAAqxGGAACA1QhDAADAaoQhAABgNcIQAACwGmEIAABYjTDUqaml9dCJsxu+P1K/ZW/tl7upfKvNu9d8ffCHI6cuXbveEYk4Rx0AgC6WhqFI14jYerNNBKBn535aOHHp/WOX9B1fXVhW25/KuxKHtWBizf2lSx8ct3TEtNpP1v9w8ep12RMAALA0DHV0RNZ9e2jQpKq+E6ofrqie/smmLT8ePXn2UuPlpotXm6k8qwtXmk43Xt15+OR7K7Y/MbO+YEJNwfgl85Z91Xyj1ekQAACL2RiGLl27/vy8z/pNqHns9fod+3/p6OgQM+W1Itjg+OkLYz5cW9CZg5ce+OVM57Hn6AOAxawLQ6fOXRZD4EMTqqo2/ShjEGwjo8+PR04NmlTVb9ySTbt+6opD5CEAsJRdYejcxWsDypcUTaxqOHbamQVbifRztbnlyZn1/cZXbdvzszMXAGAfW8KQGPlab7Y9NqOu/4SlR06ec+bCbqJXtNxoFb2i3/glJ85cdOYCACxj0ZWhecu+6je+evOPR51poEvj5abisqrHX69va293ZgEAbGJFGIpEIqfOX+43fun4j9aJKWcu0G3dt4f6jq9e8VWDMw0AsIktV4amLN5YMGHpuUvXuE8WsUSveGJm/ZDJ1Te5OAQA9rEiDDVdv9F/4tKJ//zCmQZibNh5+IFxS3ceOulMAwCskf9hSHzo37bn5/tLl+w6zDiHuJpvtPafWDX1403ONADAGlZcGXqjemv/suqm6zecacDN395aOXRKFV+kAoBtrAhDf3vrs6GTq5wJII65tduKRGhu4d/oAAC7WBGGHqmoeuHd1c4E4CYSidR+ufvBcUsvXm12ZgEA7GBFGBpUvvS1+eucCSCOVdv33z/2k8bLTc40AMAOtoShsQsIQ0hgzdcHCEMAYCHCEOAgDAGAnQhDgIMwBAB2ys8wdPS389Wbdld/2Vk1m3cXjv/4iZn1NV/ukXNEXbp23VkU6EYYAgA75WcY+veeY0XTVg/7x7eyhr+/a/h733dPfvfQxJrfz19xFgW6EYYAwE75GYY6IpEnXq8r+XD3yAV7H1u4Ty8RhiYv2uAsB2gIQwBgp7y9Z+i7g78OnLnOSEIjF+4rqlh27lITf2QYsQhDAGCnvA1DkVuRZ95cVvLh7p4ktGDvo+9+O6tqs7MEEI0wBAB2ytswJOw5+lvx9DUqDD22cG/RpLpLV6/zj0/BFWEIAOyUz2Ho1q3I399eMfyDH+SdQ0Pnff3O8q+cR4AYhCEAsFN+h6Fbh06cLZq6SoQhUQMm1VxpbuGyEOIhDAGAnfI8DN26FXnpH6uGv79ryNtfLVzzrTMPcEMYAgA75XkYikQiP//e2H/KyoEVtc0trc5cwA1hCADslPdXhjqNX/D50o0/OhNAHIQhALBT/oehSCRys629o4NbhZAAYQgA7GTFlSEgGYQhALATYQhwEIYAwE6EIcCx+usDfV4jDAGAdQhDgOP47xemLt7Y0nrTmQYA2IEwBAAArEYYAgAAViMMAQAAqxGGAACA1QhDAADAaumGoabrN46eOk+lWjfb2p0WtM/RU41Ga1De9fNvjU7bofe1d3T8dNI8BFTCunTtutOCQAilG4a+2nuseNrqQbM3UsnXgxNqTzdecVrQPg+8tshoEMqzNhWO/9hpO/S+a9dv9Hntk5ijQHnVgBmf127e7bQgEEIZCEND521/bOE+KvkqmrbW5jBUMKHKaBDKu4rLqpy2Q+8TYahf+TLjEFDeNfwf39URhhBmhKEsFGHIaBDKuwhDQSIM+SjCEMKOMJSFIgwZDUJ5F2EoSIQhH0UYQtgRhrJQhCGjQSjvIgwFiTDkowhDCDvCUBaKMGQ0COVdhKEgEYZ8FGEIYUcYykIRhowGobyLMBQkwpCPIgwh7AhDWSjCkNEglHcRhoJEGPJRhCGEHWEoC0UYMhqE8i7CUJAIQz6KMISwIwxloQhDRoNQ3kUYChJhyEcRhhB2hKEsFGHIaBDKuwhDQSIM+SjCEMIuy2HoiY8awljGq0i1CENGg1DeRRgKUjJhyDgh5Fm9W1b9H7f3k3XbPSOHLT1kvPzYIgxlwMFDd947WDb7Hfc8su+Q2xz0GsKQnzJeRapFGDIaJKdq1OKd9z9VIU9A9zz5esmi/cYCwRdhKEgphaH7SsbKrmLUHwue7vvC+yPePayWDFERhlI1rmyGajGjXp74lrNQQn7DULy9Dy55bv6iZWfPO4sJ+pIjnhnX7MxGp1wMQ4PLau4a8Jw6ZqLkmcVYLItlvIpUizBkNEiq9WLV9tvvHa73kNuLXsxUapk3sUrfcnHZCWOB4IswFKSMhCFZ/3nnoCGzf1YLh6UIQ6nKzTAkS1+RMOQht8LQsx/vurv4WXW09Ppj8YuPLT6glnx09rqCF+b9oc/wB0cvUDOTrzRXN15FqkUYMhrEo4yWl6WfrGX5HnVie4Kx8QHlv6qFe6+MV20UYShIGQxDoowTVyiKMJSqXA5DolTuIQx5yK0wVDz6LXWojFLnlP9XveOP2lWBVNNMmqvLMl5FqkUYMhrEo4yWl+U6AmWwJzzw1GQ5856nZgYzkhmv2ijCUJB8hyF5jho3d7Per8J4cYgwlKrMhIxMhCFn7ydOFhQ9rmaqdQlDHnIoDBmDk0o/z368a3BZTZ+nZhCGsqiltf1WJOJMpCfNMKQfwT8OfK7n5xQ/gmekJ2SqjFdtFGHIh5abPntsmmHImGmEIf0eAPHQnwaMHvbWT/Ihfa3/LqkQc1y7qJ5U5Bxxhuz/ykKx2dvuGijniy3/T0m52rKxnQHlvw4qrRQLi6AzoqrzriYR4NSz+q+CZwpemKcWJgwlI0HI0DKNqI1bu2Zu2a7m3Ff41NnoxdINQ9EzCUPJyKEwNHX25+rNLOr/DHktdmxzvSQgSp47Ep4UvFeX5XG2UmW8ilQrjGFo1e5zk1b89NOZpvQjUZphSB8M7n92rvpe1Rh1VBm3oInFxBDi0RP0fqhvU4ZyfVOibwwsW652FDvkiE39qd+TctL7IpPxqo0iDPmwoeH8xE9/OvT7tVu3UuuxmQ1DKnB43AMgv4rVr4vLM5JxSpQz1WKqc8a7oK4WMHrmPSMnyB/kczP2YhRhKBk5Hoac7ROGPOXulSFR4jOKPtiI8k4zCU8K3qsnPFupMl5FqhXSMDRywV5Rk1amG4nSDEPqIMrDqh9T4+pOvAMqDrdHT3ANQ6JzqlhjlBoCjQ78wN/eNMYYj4tPxqs2ijDkw/qG87LHlqUYidIMQ0a2UAfd4x6A2FAiN2XcviZnqj2qmOWxZXlmiz21yhJbeHTZlngnPVmEoWToIcOozugTfBiK3uMHlSvjLoluORSG4g1dYkDqX1oll/EYw8SjCU8KvldX5x1ZxqtItXyHoV8vXF+280xWasaan0cu6Hr+C/alGYnSCUP6aV0eFP2oqVwiy+NwezzkGobiLS9L9p94Q44qoxfpZbxqo/yFod8utchjd/ryDTlnxQ9nxeTavc7v2h4+3SQm63eeudR8U0xGIhHxs5iz6UCjXGDn8ctisu77M9db28Vka1uH+FnM+froJbnAtkMX5ALtHZ094VpLW33XAvtOXpULiEQiJpfvkp9Lb52/1ip38cv563KOCNli8rMfz8nJE42dPVwsc+5qq5zz6a7O5/zFPuc57z91rXOB789cbWkTk2K/co9bDl2QC3zz8yUxKZ7S6j2d8V203khRqUSiTN1ArZ+4jH4rLzbrXVd83PLu23Kmnl1krxM14JUP/6ekfMjs9XJS78ByO0bPVL160NjFAyfX6NFNPGFxHtZfVOezJQwlkjthyCix1oq125zlCEOecusGauNDlV7qA5bxxtY/bSc8KYiZ8VZP5mwllxRlvIpUy3cYEoOQsalslQhGMhKJ0UsMos7zS046YUj/rCwHA9fsYsyXC8ucNG7uZvlnGuL1hNgNGpuSI5zeN+RixgblHmMXk3sxynjVRvkLQ7t+uSJX3/OrE02eruzc0f+rcs6pIhWJyZIFe09caBGTHR0RmR7KPz0qF/ho2ykxOWL+XpmWmm60i5/FnLc3nJALzFh9TC4gcpKYPHOlVS5Q891pucBrdUfE5BMf7ZOTh880y11sO3JRzvn7xwfE5LOLD8jJHV09XCxz8PcmOefJf3Y+51drD8tJEXTEZMn8vb93Jbyb7R3iZzFn2qqf5QLvbvpVTIqnsXzXGbkvWTISTfz0p2PnEgwBGQlD4lirJCTKuMYTW7L7qa2J1QfPWG18ODRm6qe+l97ZUfDCvLuHvvTHgqfV8qJcw5C+ot4/1UlSf7aEoWTkZhgykpBAGPKQW2FIlBir4n0fIeOIxxtblPdJwWP1JM9WsoxXkWr5DkNiqBCn/qyUPq6IEpOjFu9ftbvzmkGQYUgfe+QRiXdAXc/yesVbMTYMuW7KWN34ZC/nuG5N7sUo41Ub5TsMyWO3uzsM/flfDWLyhaUH5eSaPefFpMgNKgyJn8UckRjkAgu3nhKTwz7co8KQ+FnMeWv9L3KB6auPyQVUGBretUD1t04YGlN7WEw+vlCFoSa5i22HnTAkYpCY/Oui/XJy+09OD1dhSAQpMflKjROG6neeEZPDP+wJQ+JnMWfKZ04YemfjCTEpnpIZhhbs/Utlw6e7zly/0XlJyUOmrgyJSvX0ove0wlf+KbuT/lsCaqbel/S1jJLd1bVnxq6rLqzqnZYwlIwEISNLYUiW+o5MIAx5yLkwJEtEovtGjlOHTZb34Ccq4UnBY/VQhCGRPE5fvpGVWvrN73JoUTHoxs3Or0588B2GjGPnWuq7A9ezvF7xeoJ3GFKbil3dmJP1MNRy0+ktLTc7k4pw5krn5Nnub6Cu3WiTC9zsijIi1MrJxmvOApebb4pJETvkt2AiLYmfxZyLXdlIuNDUKheQgbit3VlAfoclnLvauYAoOSkyk5xs7vreTTjb9ZTEE5OTqoff6H7OclJ9aya2LCbFXsS+xKTYr9yjes4it8kF1u3rvGdItF5XDNovslGSPTade4Yenb1O7wPqtGNca4mN5rL03qLuOetfWqWuBt019FU50zW4iM4/fO4WvR/6C0NcGUpV7oQhsfeGg0f036t3Nt6FMOQht26g7vf8+/qgZQQUOc7FDkJy4WROCh6rJ3m2kmW8ilQrvDdQj1rc0BmD2nzGIMl3GEoYWEWpY6ef5V0PaDIdKdRXhiy3vuF8SYoxSErzBmqjl8p+pXcDUfIrVLURVXoXkte2jR74v/uMkD+4hn65r0GllWqO7K6uPVOW8Wy5Z8ifRCGjUU8nXZdqmvVVMhuGOveuJS1R3ECdjNwKQ+Idq/8Gmf4+FyXf6sYbO6WTgsfqSZ6tZBmvItUKYxjasP/8Zz+eaU0vBkm+w5D3VxKq5Lk+NknLAxrvniHXniCHIqNvJHnPEGEou7YeupBqDJLSDENGN1CXWzx6rwrisYvJE1fsxwAVaLw/ISQMQ8ZDsUUYSkaikNH857+8rBaIrcyHoej4pZ6SvqRR+gUkO+VcGDKOkCqVZkTFnlbESJbMScFjddf5qvSzlSjjVaRaYQxDGeQvDBndQz8ixu8hyqMZ75cTRanc49oTYuOLx6ZkyQ26DjmEodBJMwwZM9VBF90j3t2Qemc2PgHKbRpxXO9IsadN/R6jhGFIlLFHowhDyUh4xaWycqlaILZ6IQxFzVTrEoY8ZDkM6RX7r2+qEm/+R2YdVUsa/5SmqLtGVMSuLk4Kao7+lnZdXcwXW4h3tnpg9AK5bkaKMGQ0SDLl/e+n3qsNP+pYxzug8nCLcu0Jk2et1eOL7HgefUP9G7FGD5TP0HVrqRZhKEjph6HYq5JyYZGqB5VW6r/bIbrEnwaMfnjqcbmAKCP3yJxkpBm1I7WK6pz3PDVz+LKefw8kmTAkSjyrP/RxFvifknL+AnWqEoYhobZupUw2IpqMKZuzcFFPJ+mNMGR8Uyb/iTTCkIccCkOiHi6rvnvoS/q54PaCpx8c/V7sP0guxhj1/hcnlD7PzjVm3vPk68Pqv3QNQ/FWFzVq8c6BpZVip/Ih+egdxc8PmnJcrZt+EYaMBkmmXOOOqqLoT7cqKskD+oc+w9RDt/UZUVja8wRie0K8+BK7KdExiif2jJqEofyQTBiijLI8DCEP5FYYsqQIQ0aDUN5FGAoSYchHEYYQdoShLBRhyGgQyrsIQ0EiDPkowhDCjjCUhSIMGQ1CeRdhKEiEIR9FGELYEYayUIQho0Eo7yIMBYkw5KMIQwg7wlAWijBkNAjlXYShIBGGfBRhCGFHGMpCEYaMBqG8izAUJMKQjyIMIewIQ1kowpDRIJR3EYaCRBjyUYQhhB1hKAtFGDIahPIuwlCQCEM+ijCEsCMMZaEIQ0aDUN5FGAoSYchHEYYQdoShLBRhyGgQyrsIQ0EiDPkowhDCjjCUhSIMGQ1CeRdhKEiEIR9FGELYEYayUIQho0Eo7yIMBYkw5KMIQwg7wlAWijBkNAjlXYShIBGGfBRhCGGXbhjavu94v9JPxPBGJV/3v/ovm8PQg2P+aTQI5V1F4xY5bYfeJ8LQfS9/ZBwCyrv6jVtSv2WP04JACKUbhoCURCIR5yekgnYDgN5DGAIAAFYjDAEAAKsRhgAAgNUIQwAAwGqEIQAAYLX8DENNLa1nLlzlF3AA5LHrrTcjtzjLARmQn2FowsJ19732cePlJmcaAPKI+KR3/tK14vGLTl+w9y+WARmUn2Fo3Py1D01aLk4WzjQA5Jex8z8f+vb2MR+scaYBpIEwBAAhs+fo78XTVj3W+W/7rN51+JQzF4BfhCEACJP2jo7HZtSN+HD3yAV7S+bvHjmjrq29w3kMgC+EIQAIk0+37Rv85mb1j6Q+/Obm2s38u2BAWghDABAa11puFJfXjJy/R4WhkQv2Fk+qudzUwu/PAr4RhgAgJCKRmUs3P/ruNyNFBuqKQfIHMWfax5ucZQCkjjAEAOHQ3NJaWPqvwolV/SdWFYxf+sjcbQUTloqfRRWOq7zW3OIsByBFhCEACJ+Nu44UTV297rtDzjSANBCGACB8nDD0LWEIyADCEACED2EIyCDCEACED2EIyCDCEACED2EIyCDCEACED2EIyCDCEACED2EIyCDCEACED2EIyCDCEACED2EIyCDCEACED2EIyCDCEACED2EIyCDCEACED2EIyCDCEACED2EIyCDCEACED2EIyCDCEACED2EIyKD8DEMTFn4uwtDZi1edaQDIL+u/O9R/6uovvj/sTANIQ36GoZlLviycvOL46YvONADkl/otewqnrPpq7zFnGkAa8jMMLdmwq2jqmu8PnYxEIs4sAMgjc2u3PVSx8siv55xpAGnIzzD0w5GTxTPWLt34ozMNAPnlhXdWPVRef6WpxZkGkIb8DEMXrzT3r1j+97dXONMAkEfa2toHTKp5dGpdR0eHMwtAGvIzDAmPvV7fv6y26foNZxoA8kIkEtl37HTxtNVv1mx1ZgFIT96GoUXrvi+avmbVjv3ONADki3ELPn+oYsWBX8440wDSk7dh6NLV5v6T6oZNq21rb3dmAUDIRSKRc5euFU1aNnJGXTvfkQEZkrdhSHh9yZdF01Yv27rXmQaA8Cud/7k4s2358agzDSBt+RyGLl+7PmBSbVF5zdmLV/kNewB54OuG40VTVj79xnIuCwEZlM9hSFiz40DR1FV/eWP5zbZ2/uYQgFA7d/FacXn1Q2U1J/iLskBG5XkYuhWJVFRuKJ62tnTBuvb2DvIQgJC63NQybGqN+HT32Vf8XgiQYXkehkT6aWvveOGdz4qnr331/bU3WtucBwAgPM5evDpsam3xtDXvr/yaD3VAxuX7laGuPNR6s+2lf6wqnv75yBl1J850Xl7mbAIgFMTJakfD8aKyqqKpq0QS6ry+zekLyLT8D0OCOHe0d3TMrt7Sf/LKwvLa91bsaGrhjzECyGnixHXm4tWx8z/vP3lF//K6z77a3xWESEJA5lkRhhyRW9/sP/FIRfWAGeuKyqrfrNn682+N3EgEIKeIM1LrzbYff/ptzIdrC8vri6etffqNZb+eu+w8DKAX2BSGuoizTNWmHx+uqC6evqb/5JUPV9Q8P2/lu8u3L9+274vvDq3//ghFUVTw9fm3h2o375ldvWXUnE/7l9UUTVvTf8rKx2bU/3vPsUjXd2POKQxAL7AuDMlzSltbx87DJyd+9MUjU2oLyur7T+28w3rgjM8HzvyCoigq+Brw+jpxFhIBqKCstmR63ZzarT+dOk8GAoJhXRiS1CmmoyNy+VrLkV/P7zx86pv9v3zdQFEUlYX6Zv+JH4/8duz3C80trR1kICBYloYhAAAAiTAEAACsRhgCAABWIwwBAACrEYYAAIDVCEMAAMBqhCEAAGA1whAAALAaYQgAAFiNMAQAAKxGGAIAABa7dev/A04vo8DQmkhnAAAAAElFTkSuQmCC)
 
+# + [markdown] id="S-zUeCn-E9r7"
+# ## Simulating bandit policies
+#
+# Below we simulate many independent replications of a bandit problem at once. The posterior over the reward of each arm is conjugate, so the belief state of all replications is just a few arrays of shape `(n_reps, n_arms)`, and one step of every replication is a handful of numpy operations:
+#
+# * For Bernoulli rewards we use a Beta prior, $p(\mu_a) = \text{Beta}(\alpha_a, \beta_a)$. Observing reward $r$ for arm $a$ adds $r$ to $\alpha_a$ and $1-r$ to $\beta_a$.
+# * For Gaussian rewards with unknown mean and precision we use a Normal-Gamma prior, $p(\mu_a, \tau_a) = N(\mu_a|m_a, (\kappa_a \tau_a)^{-1}) \text{Ga}(\tau_a|a_a, b_a)$. Observing reward $r$ gives $m_a \leftarrow (\kappa_a m_a + r) / (\kappa_a + 1)$, $b_a \leftarrow b_a + \kappa_a (r - m_a)^2 / (2(\kappa_a + 1))$, $\kappa_a \leftarrow \kappa_a + 1$ and $a_a \leftarrow a_a + 1/2$.
+#
+# We compare three policies: **Thompson sampling**, which samples a reward for each arm from the posterior and picks the best; the **upper confidence bound** rule above, using the posterior mean and standard deviation; and **epsilon-greedy**, which picks the arm with the highest posterior mean, except for a random arm with probability $\epsilon$. We measure the **regret** $\max_{a'} \mu_{a'} - \mu_{a_t}$ of every pull.
+
+# + id="XBwscgZvfYOb"
+def random_argmax(rng, values):
+  # argmax over the last axis, breaking ties at random
+  return np.argmax(values + 1e-9 * rng.random(values.shape), axis=-1)
+
+class BetaBernoulli:
+  def __init__(self, n_reps, n_arms, alpha=1., beta=1.):
+    self.alpha = np.full((n_reps, n_arms), alpha)
+    self.beta = np.full((n_reps, n_arms), beta)
+
+  def mean(self):
+    return self.alpha / (self.alpha + self.beta)
+
+  def std(self):
+    n = self.alpha + self.beta
+    return np.sqrt(self.alpha * self.beta / (n**2 * (n + 1)))
+
+  def sample(self, rng):
+    return rng.beta(self.alpha, self.beta)
+
+  def update(self, arms, rewards):
+    reps = np.arange(len(arms))
+    self.alpha[reps, arms] += rewards
+    self.beta[reps, arms] += 1 - rewards
+
+  @staticmethod
+  def sample_rewards(rng, means, arms):
+    # means has shape (n_reps, n_arms)
+    return (rng.random(len(arms)) < means[np.arange(len(arms)), arms]).astype(float)
+
+class NormalGamma:
+  def __init__(self, n_reps, n_arms, m=0., kappa=1., a=2., b=1., noise_std=1.):
+    self.m = np.full((n_reps, n_arms), m)
+    self.kappa = np.full((n_reps, n_arms), kappa)
+    self.a = np.full((n_reps, n_arms), a)
+    self.b = np.full((n_reps, n_arms), b)
+    self.noise_std = noise_std  # only used to simulate rewards
+
+  def mean(self):
+    return self.m
+
+  def std(self):
+    # The marginal posterior of the mean is a Student t distribution
+    return np.sqrt(self.b / ((self.a - 1) * self.kappa))
+
+  def sample(self, rng):
+    tau = rng.gamma(self.a, 1. / self.b)
+    return self.m + rng.normal(size=self.m.shape) / np.sqrt(self.kappa * tau)
+
+  def update(self, arms, rewards):
+    reps = np.arange(len(arms))
+    m, kappa = self.m[reps, arms], self.kappa[reps, arms]
+    self.b[reps, arms] += kappa * (rewards - m)**2 / (2 * (kappa + 1))
+    self.m[reps, arms] = (kappa * m + rewards) / (kappa + 1)
+    self.kappa[reps, arms] = kappa + 1
+    self.a[reps, arms] += 0.5
+
+  def sample_rewards(self, rng, means, arms):
+    return means[np.arange(len(arms)), arms] + self.noise_std * rng.normal(size=len(arms))
+
+
+def thompson_sampling():
+  return lambda rng, posterior, t: random_argmax(rng, posterior.sample(rng))
+
+def ucb(c=1.):
+  return lambda rng, posterior, t: random_argmax(rng, posterior.mean() + c * posterior.std())
+
+def epsilon_greedy(epsilon=0.1):
+  def policy(rng, posterior, t):
+    greedy = random_argmax(rng, posterior.mean())
+    n_reps, n_arms = posterior.mean().shape
+    explore = rng.random(n_reps) < epsilon
+    return np.where(explore, rng.integers(n_arms, size=n_reps), greedy)
+  return policy
+
+
+def simulate_bandit(make_posterior, policy, means, horizon, seed=0):
+  """
+  Run len(means) independent replications for horizon steps.
+  means has shape (n_reps, n_arms), the true mean reward of every arm in every replication.
+  Returns the regret of every pull, shape (n_reps, horizon).
+  """
+  rng = np.random.default_rng(seed)
+  n_reps, n_arms = means.shape
+  posterior = make_posterior(n_reps, n_arms)
+  best = means.max(axis=1)
+  regret = np.empty((n_reps, horizon))
+  for t in range(horizon):
+    arms = policy(rng, posterior, t)
+    rewards = posterior.sample_rewards(rng, means, arms)
+    posterior.update(arms, rewards)
+    regret[:, t] = best - means[np.arange(n_reps), arms]
+  return regret
+
+
+# + [markdown] id="27Rkg1HBFYwH"
+# Cumulative regret of the three policies on the 3-armed Bernoulli bandit with success probabilities 0.3, 0.5 and 0.6, averaged over 2000 replications, with 95% confidence bands for the mean.
+
+# + id="Y2ijEZZKmL4C"
+import matplotlib.pyplot as plt
+
+def plot_cumulative_regret(results, title):
+  plt.figure()
+  for name, regret in results.items():
+    cum = np.cumsum(regret, axis=1)
+    mean = cum.mean(axis=0)
+    band = 1.96 * cum.std(axis=0) / np.sqrt(len(cum))
+    steps = np.arange(1, cum.shape[1] + 1)
+    plt.plot(steps, mean, label=name)
+    plt.fill_between(steps, mean - band, mean + band, alpha=0.3)
+  plt.xlabel('t')
+  plt.ylabel('cumulative regret')
+  plt.title(title)
+  plt.legend()
+  plt.show()
+
+policies = {'Thompson': thompson_sampling(), 'UCB (c=2)': ucb(2.), 'eps-greedy (0.1)': epsilon_greedy(0.1)}
+n_reps, horizon = 2000, 1000
+means = np.tile([0.3, 0.5, 0.6], (n_reps, 1))
+results = {name: simulate_bandit(BetaBernoulli, policy, means, horizon) for name, policy in policies.items()}
+plot_cumulative_regret(results, 'Bernoulli bandit')
+
+# + [markdown] id="GpLZ62S-vuds"
+# A Gaussian bandit with 10 arms, where each replication draws its own arm means from $N(0, 1)$ and the rewards have unit noise.
+
+# + id="7okDKxmFrBoP"
+rng = np.random.default_rng(1)
+means = rng.normal(size=(n_reps, 10))
+results = {name: simulate_bandit(NormalGamma, policy, means, horizon) for name, policy in policies.items()}
+plot_cumulative_regret(results, 'Gaussian bandit, 10 arms')
+
+# + [markdown] id="DJKzRCs7t0FO"
+# ### Benchmark
+#
+# The cost per pull and per replication of Thompson sampling on a Bernoulli bandit, as the number of arms and the horizon grow. The Python overhead of a step is shared by all the replications, so the cost of a pull is dominated by drawing a posterior sample for every arm, and grows linearly with the number of arms.
+
+# + id="R6uIF_21qEEj"
+import time
+
+rows = []
+n_reps = 1000
+for n_arms in [2, 10, 100]:
+  for horizon in [100, 1000]:
+    means = np.random.default_rng(0).random((n_reps, n_arms))
+    t0 = time.time()
+    simulate_bandit(BetaBernoulli, thompson_sampling(), means, horizon)
+    elapsed = time.time() - t0
+    rows.append({'arms': n_arms, 'horizon': horizon, 'replications': n_reps,
+                 'us per pull': 1e6 * elapsed / (n_reps * horizon),
+                 'ms per replication': 1e3 * elapsed / n_reps})
+pd.DataFrame(rows)
+
+# + [markdown] id="h9UeckXPZzzV"
+# ## Contextual bandits with Bayesian linear and logistic models
+#
+# Here is the contextual bandit sketched above. Each arm $a$ has a Gaussian posterior $N(\theta_a|\mu_a, \Lambda_a^{-1})$ over the weights of a linear model $E[R|s,a] = \theta_a^T \phi(s)$, or a logistic model $p(R=1|s,a) = \sigma(\theta_a^T \phi(s))$. Instead of refitting, we update the posterior after each observation $(x, r)$, where $x = \phi(s)$:
+#
+# * For the linear-Gaussian model with noise variance $\sigma^2$ the update is exact: $\Lambda_a \leftarrow \Lambda_a + x x^T / \sigma^2$ and $\mu_a \leftarrow \mu_a + \Lambda_a^{-1} x (r - \mu_a^T x) / \sigma^2$, using the updated $\Lambda_a$.
+# * For the logistic model we use a Laplace approximation, linearized at the current mean: with $p = \sigma(\mu_a^T x)$, $\Lambda_a \leftarrow \Lambda_a + p(1-p) x x^T$ and $\mu_a \leftarrow \mu_a + \Lambda_a^{-1} x (r - p)$, which is one Newton step on the log posterior. Optionally only the diagonal of $\Lambda_a$ is kept, as in (Chapelle and Li, 2011).
+#
+# We store the Cholesky factor $\Lambda_a = L_a L_a^T$ rather than $\Lambda_a$. The update adds a rank-one term to $\Lambda_a$, and the Cholesky factor of $L L^T + x x^T$ can be computed from $L$ in $O(d^2)$ operations, instead of the $O(d^3)$ of a new factorization. For a batch of more than $d$ observations of the same arm it is cheaper to add all of them to $\Lambda_a$ and factorize once.
+#
+# Given the factor, the policies are cheap to evaluate for a whole batch of contexts at once:
+#
+# * LinUCB scores an arm by $\mu_a^T x + \alpha \sqrt{x^T \Lambda_a^{-1} x}$, where $\sqrt{x^T \Lambda_a^{-1} x} = \|L_a^{-1} x\|$ is one triangular solve.
+# * Thompson sampling scores an arm by $\theta_a^T x$ with $\theta_a = \mu_a + L_a^{-T} z$, $z \sim N(0, I)$, drawn independently for every context.
+
+# + id="efF1n_nRHtSK"
+from scipy.linalg import cho_solve, solve_triangular
+
+def chol_update(L, x):
+  """Cholesky factor of L L^T + x x^T, given the lower triangular factor L, in O(d^2)"""
+  L, x = L.copy(), x.astype(float)
+  for k in range(len(x)):
+    r = np.hypot(L[k, k], x[k])
+    c, s = r / L[k, k], x[k] / L[k, k]
+    L[k, k] = r
+    L[k+1:, k] = (L[k+1:, k] + s * x[k+1:]) / c
+    x[k+1:] = c * x[k+1:] - s * L[k+1:, k]
+  return L
+
+def sigmoid(z):
+  return 1. / (1. + np.exp(-z))
+
+
+class BayesianLinearBandit:
+  """
+  Per-arm Gaussian posteriors over the weights of a linear (likelihood='gaussian')
+  or logistic (likelihood='bernoulli') reward model.
+  """
+  def __init__(self, n_arms, dim, prior_precision=1., noise_var=1., likelihood='gaussian',
+               diagonal=False, seed=0):
+    if likelihood not in ('gaussian', 'bernoulli'):
+      raise ValueError('Unknown likelihood')
+    self.n_arms, self.dim = n_arms, dim
+    self.noise_var = noise_var
+    self.likelihood = likelihood
+    self.diagonal = diagonal
+    self.mu = np.zeros((n_arms, dim))
+    # Cholesky factors of the posterior precisions
+    self.L = np.tile(np.sqrt(prior_precision) * np.eye(dim), (n_arms, 1, 1))
+    self.rng = np.random.default_rng(seed)
+
+  def _contexts(self, X):
+    # Contexts are either shared by all arms, (n, d), or per arm, (n, n_arms, d)
+    return np.broadcast_to(X[:, None, :], (len(X), self.n_arms, self.dim)) if X.ndim == 2 else X
+
+  def scores(self, X, policy='ucb', alpha=1.):
+    X = self._contexts(X)
+    scores = np.einsum('nkd,kd->nk', X, self.mu)
+    if policy == 'ucb':
+      width = np.stack([np.linalg.norm(solve_triangular(self.L[k], X[:, k].T, lower=True), axis=0)
+                        for k in range(self.n_arms)], axis=1)
+      scores += alpha * width
+    elif policy == 'thompson':
+      z = self.rng.normal(size=X.shape)
+      # x^T L^{-T} z for every context and arm
+      scores += np.stack([np.sum(X[:, k] * solve_triangular(self.L[k], z[:, k].T, lower=True, trans='T').T, axis=1)
+                          for k in range(self.n_arms)], axis=1)
+    elif policy != 'greedy':
+      raise ValueError('Unknown policy')
+    return scores
+
+  def act(self, X, policy='ucb', alpha=1.):
+    return np.argmax(self.scores(X, policy, alpha), axis=1)
+
+  def _weights(self, X, r, mu):
+    """Curvature weights and scaled residuals of the observations at the mean mu"""
+    if self.likelihood == 'gaussian':
+      return np.full(len(X), 1. / self.noise_var), (r - X @ mu) / self.noise_var
+    p = sigmoid(X @ mu)
+    return p * (1 - p), r - p
+
+  def update(self, arms, X, rewards):
+    """Update the posteriors with a batch of observations; arms has shape (n,), X has shape (n, d) or (n, n_arms, d)"""
+    if X.ndim == 3:
+      X = X[np.arange(len(arms)), arms]
+    for k in np.unique(arms):
+      Xk, rk = X[arms == k], rewards[arms == k]
+      if self.diagonal:
+        w, resid = self._weights(Xk, rk, self.mu[k])
+        precision = np.diag(self.L[k])**2 + w @ Xk**2
+        self.L[k] = np.diag(np.sqrt(precision))
+        self.mu[k] += Xk.T @ resid / precision
+      elif len(Xk) <= self.dim:
+        # Sequential rank-one updates, O(d^2) each
+        for x, r in zip(Xk, rk):
+          (w,), (resid,) = self._weights(x[None], r, self.mu[k])
+          self.L[k] = chol_update(self.L[k], np.sqrt(w) * x)
+          self.mu[k] += cho_solve((self.L[k], True), x) * resid
+      else:
+        # One Newton step for the whole batch, and a single O(d^3) factorization
+        w, resid = self._weights(Xk, rk, self.mu[k])
+        precision = self.L[k] @ self.L[k].T + (Xk.T * w) @ Xk
+        self.L[k] = np.linalg.cholesky(precision)
+        self.mu[k] += cho_solve((self.L[k], True), Xk.T @ resid)
+
+
+# + [markdown] id="iekEKGn3WOmf"
+# The rank-one update agrees with refactorizing the updated precision matrix, and the sequential updates of the linear-Gaussian model give the same posterior mean as the batch update.
+
+# + id="sUHua2rhZL3X"
+rng = np.random.default_rng(0)
+A = rng.normal(size=(8, 8))
+L = np.linalg.cholesky(A @ A.T + np.eye(8))
+x = rng.normal(size=8)
+print(np.allclose(chol_update(L, x), np.linalg.cholesky(L @ L.T + np.outer(x, x))))
+
+X = rng.normal(size=(8, 5))
+y = X @ rng.normal(size=5) + 0.1 * rng.normal(size=8)
+batch, sequential = BayesianLinearBandit(1, 5), BayesianLinearBandit(1, 5)
+batch.update(np.zeros(8, dtype=int), X, y)  # more rows than dim: one factorization
+for i in range(8):
+  sequential.update(np.zeros(1, dtype=int), X[i:i+1], y[i:i+1])  # rank-one updates
+print(np.allclose(sequential.mu, batch.mu), np.allclose(sequential.L, batch.L))
+
+# + [markdown] id="TSN_cvmVvPEw"
+# ### Replaying logged traffic
+#
+# To evaluate a policy offline we use the replay method of (Li et al., 2011). The log contains the context, the action taken by a uniformly random logging policy, and its reward. We go through the log in batches: the policy chooses an action for every context of the batch at once, and the events where it agrees with the logged action are kept, counted towards the reward of the policy, and used to update its posteriors. The posteriors only change between batches, as in a deployed system where the feedback arrives with a delay. Since the logged actions are uniformly random, the average reward of the kept events is an unbiased estimate of the online reward of the policy.
+#
+# We simulate a log of a million events with 10 arms and 10 features, where the click probabilities follow a logistic model.
+
+# + id="Qks1DeEgV6PR"
+import time
+
+def simulate_log(n_events, n_arms, dim, seed=0):
+  rng = np.random.default_rng(seed)
+  theta = rng.normal(size=(n_arms, dim))
+  X = rng.normal(size=(n_events, dim)) / np.sqrt(dim)
+  X[:, 0] = 1.  # bias feature
+  theta[:, 0] = -2.  # clicks are rare
+  arms = rng.integers(n_arms, size=n_events)
+  rewards = (rng.random(n_events) < sigmoid(np.sum(X * theta[arms], axis=1))).astype(float)
+  return X, arms, rewards
+
+def replay(bandit, X, logged_arms, rewards, policy='ucb', alpha=1., batch_size=1000):
+  total, n_matched = 0., 0
+  for start in range(0, len(X), batch_size):
+    s = slice(start, start + batch_size)
+    match = bandit.act(X[s], policy, alpha) == logged_arms[s]
+    total += rewards[s][match].sum()
+    n_matched += match.sum()
+    bandit.update(logged_arms[s][match], X[s][match], rewards[s][match])
+  return total / n_matched, n_matched
+
+n_arms, dim = 10, 10
+X, logged_arms, rewards = simulate_log(10**6, n_arms, dim)
+print('average reward of the logging policy', rewards.mean())
+
+configs = {
+  'LinUCB': dict(likelihood='gaussian', noise_var=0.1, policy='ucb'),
+  'linear Thompson': dict(likelihood='gaussian', noise_var=0.1, policy='thompson'),
+  'logistic Thompson (Laplace)': dict(likelihood='bernoulli', policy='thompson'),
+  'logistic Thompson (diagonal)': dict(likelihood='bernoulli', diagonal=True, policy='thompson'),
+  'logistic UCB (Laplace)': dict(likelihood='bernoulli', policy='ucb'),
+}
+rows = []
+for name, config in configs.items():
+  config = dict(config)
+  policy = config.pop('policy')
+  bandit = BayesianLinearBandit(n_arms, dim, **config)
+  t0 = time.time()
+  reward, n_matched = replay(bandit, X, logged_arms, rewards, policy)
+  elapsed = time.time() - t0
+  rows.append({'policy': name, 'average reward': reward, 'matched events': n_matched,
+               'events per second': len(X) / elapsed})
+pd.DataFrame(rows)
+
 # + id="Ggq5DO3OX3f0"
 
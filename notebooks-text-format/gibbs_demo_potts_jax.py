@@ -243,5 +243,234 @@ for t in tqdm(range(len(Jvals))):
   axs[t].imshow(arr, cmap='Accent', interpolation="nearest")
   axs[t].set_title(f"J = {Jvals[t]}")
 
+# + [markdown] id="WU_oKjodFZvf"
+# # Compiled sampler for many chains and couplings
+#
+# `gibbs_sampler` above only jits a single checkerboard update and drives it from a Python loop, and it runs one chain for one value of $J$ at a time. Below the whole sweep schedule runs under `lax.scan`, with the random keys for every step split up front, and we `vmap` over independent chains and over a vector of couplings. A sweep over dozens of $J$ values then becomes a single compiled call.
+#
+# Since the logits for a half-sweep are the numbers of same-coloured neighbours times $J$, the energy $\mathcal{E}(x) = -J\sum_{i\sim j}\mathbb{I}(x_i = x_j)$ of the current state is almost free: we pick out the logit of the current colour at each site and halve the sum, as every edge is counted twice. We record it for every half-sweep. Optionally we also store the lattice every `thin` half-sweeps.
+
+# + id="y8AK9rKW215z"
+from functools import partial
+
+def total_energy(state_mat, logits):
+  # Energy of state_mat given its logits energy(state_mat, jvalue)
+  return -0.5 * jnp.sum(state_mat * logits)
+
+@partial(jit, static_argnames=("n_chains", "niter", "thin"))
+def gibbs_sampler_scan(key, jvalues, n_chains=1, niter=1000, thin=None):
+  """
+  Run n_chains independent chains for every coupling in jvalues.
+  Returns the final lattices (n_J, n_chains, ix, iy), the energy before every
+  half-sweep (n_J, n_chains, niter) and, if thin is given, the lattice after
+  every thin half-sweeps (n_J, n_chains, niter // thin, ix, iy).
+  """
+  n_outer, n_inner = (niter // thin, thin) if thin else (1, niter)
+  assert n_outer * n_inner == niter, "niter must be a multiple of thin"
+  mask = make_checkerboard_pattern1()
+  inverse_mask = make_checkerboard_pattern2()
+
+  def run_chain(key, jvalue):
+    key, key_init = random.split(key)
+    X = random.randint(key_init, shape=(ix, iy), minval=0, maxval=K)
+    state_mat = jax.nn.one_hot(X, K, axis=0)[:, :, :, jnp.newaxis]
+
+    def step(carry, key):
+      state_mat, mask, inverse_mask = carry
+      logits = energy(state_mat, jvalue)
+      sample = sampler(K, key, logits)
+      new_state = state_mat_update(mask, inverse_mask, sample, state_mat)
+      return (new_state, inverse_mask, mask), total_energy(state_mat, logits)
+
+    def outer_step(carry, keys):
+      carry, energies = lax.scan(step, carry, keys)
+      labels = jnp.argmax(carry[0], axis=0)[:, :, 0].astype(jnp.int8)
+      return carry, (labels, energies)
+
+    keys = random.split(key, niter).reshape((n_outer, n_inner) + key.shape)
+    carry, (snapshots, energies) = lax.scan(outer_step, (state_mat, mask, inverse_mask), keys)
+    return snapshots[-1], energies.reshape(-1), snapshots
+
+  jvalues = jnp.asarray(jvalues, dtype=jnp.float32)
+  keys = random.split(key, len(jvalues) * n_chains)
+  keys = keys.reshape((len(jvalues), n_chains) + keys.shape[1:])
+  labels, energies, snapshots = vmap(vmap(run_chain, in_axes=(0, None)))(keys, jvalues)
+  return labels, energies, (snapshots if thin else None)
+
+
+# + [markdown] id="Kk0Mm_ukic1E"
+# The same three couplings as above, now in one call with two chains each, keeping a snapshot every 2000 half-sweeps.
+
+# + id="XLKweLcG70Pp"
+labels, energies, snapshots = gibbs_sampler_scan(key, jnp.array(Jvals), n_chains=2, niter=8000, thin=2000)
+
+fig, axs = plt.subplots(len(Jvals), snapshots.shape[2], figsize=(10, 8))
+for t in range(len(Jvals)):
+  for s in range(snapshots.shape[2]):
+    axs[t, s].imshow(snapshots[t, 0, s], cmap='Accent', interpolation="nearest")
+    axs[t, s].set_title(f"J = {Jvals[t]}, sweep {(s + 1) * 2000}", fontsize=8)
+    axs[t, s].axis('off')
+
+# + [markdown] id="-g23rMYbYz29"
+# A phase-diagram sweep: the energy per site (averaged over chains and over the second half of the run) across the transition at $J = \log(1 + \sqrt{K}) \approx 1.43$.
+
+# + id="Bw_JrRunlvKg"
+Jsweep = jnp.linspace(1.30, 1.56, 27)
+labels, energies, _ = gibbs_sampler_scan(key, Jsweep, n_chains=4, niter=4000)
+energy_per_site = energies[:, :, energies.shape[-1] // 2:].mean(axis=(1, 2)) / (ix * iy)
+
+plt.figure()
+plt.plot(Jsweep, energy_per_site, 'o-')
+plt.axvline(jnp.log(1 + jnp.sqrt(K)), color='k', linestyle='--')
+plt.xlabel('J')
+plt.ylabel('energy per site')
+
+
+# + [markdown] id="CxrhwL2C5yzx"
+# # Integer lattice with red/black updates
+#
+# The one-hot representation stores $K$ floats per site, and the convolution computes all $K$ logits for every site even though each half-sweep only resamples half of them. For a 1024x1024 lattice with $K=10$ that is 40MB per copy of the state, plus the same again for the logits and for the uniform noise.
+#
+# Instead we keep the lattice as integer labels, and count the neighbours with label $k$ by comparing shifted copies of the lattice with $k$; sites outside the grid get the label $-1$, which matches the zero padding of the convolution.
+
+# + id="eVJxJ5Vy0qYe"
+def shifted_neighbours(X):
+  # Up, down, left and right neighbours of every site, -1 outside the grid
+  pad = jnp.pad(X, 1, constant_values=-1)
+  return pad[:-2, 1:-1], pad[2:, 1:-1], pad[1:-1, :-2], pad[1:-1, 2:]
+
+def neighbour_count(neighbours, k):
+  # Number of neighbours with label k
+  return sum((n == k).astype(jnp.int32) for n in neighbours)
+
+def test_neighbour_count(key):
+  """
+  The shifted comparisons give the same logits as the one-hot convolution.
+  """
+  X = jnp.ones((3, 3), dtype=jnp.int32)
+  assert np.array_equal(neighbour_count(shifted_neighbours(X), 1),
+                        jnp.array([[2,3,2], [3, 4, 3], [2, 3, 2]]))
+  X = random.randint(key, shape=(ix, iy), minval=0, maxval=K)
+  state_mat = jax.nn.one_hot(X, K, axis=0)[:, :, :, jnp.newaxis]
+  logits = energy(state_mat, 1)[:, :, :, 0]
+  counts = vmap(neighbour_count, in_axes=(None, 0))(shifted_neighbours(X), jnp.arange(K))
+  assert np.array_equal(logits, counts)
+
+test_neighbour_count(key)
+
+
+# + [markdown] id="Y6TrOji5izXU"
+# On a checkerboard every neighbour of a red site is black and vice versa, so we store the two colours as separate half-width arrays,
+# `red[i, j] = X[i, 2j + i % 2]` and `black[i, j] = X[i, 2j + 1 - i % 2]`.
+# The four neighbours of `red[i, j]` are `black[i - 1, j]`, `black[i + 1, j]`, `black[i, j]`, and `black[i, j - 1]` on even rows or `black[i, j + 1]` on odd rows (the other way round for black sites). A half-sweep then only reads the other colour and only writes the sites it resamples. We draw the new labels with the Gumbel-max trick one colour $k$ at a time, keeping the running maximum, so we never hold more than one value per site.
+
+# + id="LYagGMffsTQw"
+def to_red_black(X):
+  parity = (jnp.arange(X.shape[0]) % 2)[:, None]
+  even, odd = X[:, 0::2], X[:, 1::2]
+  return jnp.where(parity == 0, even, odd), jnp.where(parity == 0, odd, even)
+
+def from_red_black(red, black):
+  parity = (jnp.arange(red.shape[0]) % 2)[:, None]
+  even = jnp.where(parity == 0, red, black)
+  odd = jnp.where(parity == 0, black, red)
+  return jnp.stack([even, odd], axis=-1).reshape(red.shape[0], -1)
+
+def half_lattice_neighbours(other, shift_left_on_even):
+  # Neighbours of the sites of one colour, read from the array of the other colour
+  pad = jnp.pad(other, 1, constant_values=-1)
+  left, right = pad[1:-1, :-2], pad[1:-1, 2:]
+  even_row = (jnp.arange(other.shape[0]) % 2 == 0)[:, None]
+  side = jnp.where(even_row == shift_left_on_even, left, right)
+  return pad[:-2, 1:-1], pad[2:, 1:-1], other, side
+
+def sample_half_lattice(key, neighbours, jvalue):
+  # Gumbel-max over the K colours, one colour at a time
+  def body(k, carry):
+    best_score, best_label = carry
+    gumbel = random.gumbel(random.fold_in(key, k), best_score.shape)
+    score = jvalue * neighbour_count(neighbours, k) + gumbel
+    best_label = jnp.where(score > best_score, k.astype(best_label.dtype), best_label)
+    return jnp.maximum(score, best_score), best_label
+  shape = neighbours[2].shape
+  init = (jnp.full(shape, -jnp.inf), jnp.zeros(shape, dtype=neighbours[2].dtype))
+  return lax.fori_loop(0, K, body, init)[1]
+
+def sweep_red_black(key, red, black, jvalue):
+  key_red, key_black = random.split(key)
+  red = sample_half_lattice(key_red, half_lattice_neighbours(black, True), jvalue)
+  black = sample_half_lattice(key_black, half_lattice_neighbours(red, False), jvalue)
+  return red, black
+
+def energy_red_black(red, black, jvalue):
+  # Every edge joins a red and a black site, so count the edges from the red side
+  same = neighbour_count(half_lattice_neighbours(black, True), red)
+  return -jvalue * jnp.sum(same)
+
+def test_red_black(key):
+  X = random.randint(key, shape=(ix, iy), minval=0, maxval=K).astype(jnp.int8)
+  red, black = to_red_black(X)
+  assert np.array_equal(from_red_black(red, black), X)
+  # The half-lattice neighbours are the full-lattice neighbours of the red sites
+  full = vmap(neighbour_count, in_axes=(None, 0))(shifted_neighbours(X), jnp.arange(K))
+  half = vmap(neighbour_count, in_axes=(None, 0))(half_lattice_neighbours(black, True), jnp.arange(K))
+  assert np.array_equal(vmap(lambda counts: to_red_black(counts)[0])(full), half)
+  state_mat = jax.nn.one_hot(X, K, axis=0)[:, :, :, jnp.newaxis]
+  assert jnp.allclose(energy_red_black(red, black, 1.), total_energy(state_mat, energy(state_mat, 1.)))
+
+test_red_black(key)
+
+
+# + [markdown] id="esZjCkQ4dYrl"
+# The compiled sampler for the integer lattice. It has the same interface as `gibbs_sampler_scan`, except that each of the `niter` iterations is a full sweep (red then black), and the lattice shape can be chosen independently of the global `ix`, `iy` (the number of columns must be even).
+
+# + id="AOkthmabtDg4"
+@partial(jit, static_argnames=("n_chains", "niter", "thin", "shape"))
+def gibbs_sampler_labels(key, jvalues, n_chains=1, niter=1000, thin=None, shape=(ix, iy)):
+  n_outer, n_inner = (niter // thin, thin) if thin else (1, niter)
+  assert n_outer * n_inner == niter, "niter must be a multiple of thin"
+  assert shape[1] % 2 == 0, "the lattice needs an even number of columns"
+
+  def run_chain(key, jvalue):
+    key, key_init = random.split(key)
+    X = random.randint(key_init, shape=shape, minval=0, maxval=K).astype(jnp.int8)
+
+    def step(carry, key):
+      red, black = carry
+      e = energy_red_black(red, black, jvalue)
+      return sweep_red_black(key, red, black, jvalue), e
+
+    def outer_step(carry, keys):
+      carry, energies = lax.scan(step, carry, keys)
+      return carry, (from_red_black(*carry), energies)
+
+    keys = random.split(key, niter).reshape((n_outer, n_inner) + key.shape)
+    carry, (snapshots, energies) = lax.scan(outer_step, to_red_black(X), keys)
+    return snapshots[-1], energies.reshape(-1), snapshots
+
+  jvalues = jnp.asarray(jvalues, dtype=jnp.float32)
+  keys = random.split(key, len(jvalues) * n_chains)
+  keys = keys.reshape((len(jvalues), n_chains) + keys.shape[1:])
+  labels, energies, snapshots = vmap(vmap(run_chain, in_axes=(0, None)))(keys, jvalues)
+  return labels, energies, (snapshots if thin else None)
+
+
+# + [markdown] id="ZKnROAuoziFB"
+# A 1024x1024 lattice with $K = 10$ colours. The state is 1MB of `int8` labels, against 40MB of `float32` for the one-hot tensor.
+
+# + id="BiZbru5yIi3_"
+import time
+
+t0 = time.time()
+labels, energies, _ = gibbs_sampler_labels(key, jnp.array(Jvals), niter=500, shape=(1024, 1024))
+labels.block_until_ready()
+print(f"{time.time() - t0:.1f}s")
+
+fig, axs = plt.subplots(1, len(Jvals), figsize=(12, 4))
+for t in range(len(Jvals)):
+  axs[t].imshow(labels[t, 0], cmap='Accent', interpolation="nearest")
+  axs[t].set_title(f"J = {Jvals[t]}")
+  axs[t].axis('off')
+
 # + id="gAQtirK6kGja"
 
@@ -95,14 +95,41 @@ plt.show()
 # ## Gradient Descent Implementation
 
 # + [markdown] id="XY1sCs3Ywfwy"
-# Creates mini-batches.
+# Creates mini-batches. The chorales have very different lengths, and padding all of them to the longest one wastes most of the forward pass on padding. So we sort them into `num_buckets` buckets of similar lengths (split at the quantiles of the lengths, rounded up to a multiple of 8), and pad the sequences of each bucket only to the longest one in it.
+#
+# For every epoch and bucket, the batches are rows of a `(num_batches, batch_size)` array of sequence indices, from a random permutation of the bucket, with the last batch padded with `-1`. A batch never mixes buckets, so a batch is at most as large as its bucket. Full batch training (`batch_size` at least the number of chorales) therefore uses a single bucket, padded to the longest chorale, so that it still makes one step per epoch. The batches of all the buckets are visited in a random order, drawn again at every epoch, so that the last steps of an epoch do not always come from the longest chorales. All the index arrays and orders are computed before training, so the whole training loop is a single compiled `lax.scan` over the epochs, in which every step picks the bucket of its batch with `lax.switch` and gathers the sequences of the batch from the device. The padding entries of the batches are masked out of the loss.
 
 # + id="qPPNWQEf__ga"
-def hmm_sample_minibatches(iterables, batch_size):
-    sequences, lens = iterables
-    n_seq = len(sequences)
-    for idx in range(0, n_seq, batch_size):
-        yield sequences[idx:min(idx + batch_size, n_seq)], lens[idx:min(idx + batch_size, n_seq)]
+import time
+
+
+def length_buckets(lens, num_buckets=4, multiple=8):
+    """Indices of the sequences in each bucket, and the length they are padded to"""
+    lens = np.asarray(lens)
+    bounds = np.quantile(lens, np.linspace(0, 1, num_buckets + 1)[1:])
+    bounds = np.unique(np.minimum(np.ceil(bounds / multiple) * multiple, lens.max()).astype(int))
+    bucket = np.searchsorted(bounds, lens)
+    return [(np.where(bucket == b)[0], int(bound)) for b, bound in enumerate(bounds) if np.any(bucket == b)]
+
+
+def hmm_minibatch_indices(rng_key, idx, batch_size, num_epochs):
+    """(num_epochs, num_batches, batch_size) indices of the sequences in each batch, padded with -1"""
+    batch_size = min(batch_size, len(idx))
+    num_batches = -(-len(idx) // batch_size)
+    padding = -jnp.ones(num_batches * batch_size - len(idx), dtype=jnp.int32)
+
+    def epoch_indices(key):
+        return jnp.concatenate([permutation(key, jnp.asarray(idx, dtype=jnp.int32)), padding]).reshape(num_batches, batch_size)
+
+    return vmap(epoch_indices)(split(rng_key, num_epochs))
+
+
+def bucket_schedule(rng_key, num_batches, num_epochs):
+    """(num_epochs, total number of batches) bucket and batch ids, in a random order for every epoch"""
+    bucket_ids = jnp.repeat(jnp.arange(len(num_batches)), jnp.array(num_batches))
+    batch_ids = jnp.concatenate([jnp.arange(n) for n in num_batches])
+    order = vmap(lambda key: permutation(key, len(bucket_ids)))(split(rng_key, num_epochs))
+    return bucket_ids[order], batch_ids[order]
 
 
 # + id="am4zrOwe-Mav"
@@ -120,58 +147,81 @@ def make_hmm(params):
                       obs_dist=obs_dist,
                       init_dist=distrax.Categorical(probs=initial_hmm.init_dist.probs))
     return hmm
-  
+
 @jit
 def hmm_loglikelihood(hmm, observations, lens):
     def forward_(x, length):
       return hmm.forward(x, length)[0] / length
     return vmap(forward_, in_axes=(0, 0))(observations, lens)
-    
-@jit
-def loss_fn(params, batch, lens):
-    hmm = make_hmm(params)
-    return -hmm_loglikelihood(hmm, batch, lens).mean()
 
 @jit
-def update(i, opt_state, batch, lens):
-    params = get_params(opt_state)
-    loss, grads = jax.value_and_grad(loss_fn)(params, batch, lens)
-    return opt_update(i, grads, opt_state), loss
+def loss_fn(params, batch, lens, mask):
+    # The entries of the batch where mask is False are padding
+    hmm = make_hmm(params)
+    ll = hmm_loglikelihood(hmm, batch, jnp.where(mask, lens, 1))
+    return -jnp.where(mask, ll, 0.).sum() / jnp.maximum(mask.sum(), 1)
 
 
-def fit(observations, lens, beta, trans_dist,  batch_size, rng_key=None, num_epochs=300):
+def fit(observations, lens, beta, trans_dist,  batch_size, rng_key=None, num_epochs=300, num_buckets=4):
     if rng_key is None:
         rng_key = PRNGKey(0)
 
-    opt_state = opt_init((beta.logits, trans_dist.logits))
-    #opt_state = opt_init((logit(beta.probs), logit(trans_dist.probs)))
-    itercount = itertools.count()
-
-    num_complete_batches, leftover = jnp.divmod(num_epochs, batch_size)
-    num_batches = num_complete_batches + jnp.where(leftover==0, 0, 1)
+    observations, lens = jnp.asarray(observations), jnp.asarray(lens)
+    if batch_size >= len(lens):
+        # Full batch training: one step per epoch, over all the sequences
+        num_buckets = 1
+    buckets = length_buckets(lens, num_buckets)
+    keys = split(rng_key, len(buckets) + 1)
+    batch_indices = [hmm_minibatch_indices(key, idx, batch_size, num_epochs) for key, (idx, _) in zip(keys, buckets)]
+    schedule = bucket_schedule(keys[-1], [indices.shape[1] for indices in batch_indices], num_epochs)
 
-    def epoch_step(opt_state, key):
-        perm = permutation(key, len(observations))
-        observatios_, lens_= observations[perm], lens[perm]
-        sample_generator = hmm_sample_minibatches((observatios_, lens_), batch_size)
-        
-        def train_step(opt_state, i):
-            batch, length = next(sample_generator)
-            opt_state, loss = update(next(itercount), opt_state, batch, length)
-            return opt_state, loss
-
-        opt_state, losses = jax.lax.scan(train_step, opt_state, jnp.arange(num_batches))
-        return opt_state, losses.mean()
-
-    epochs = split(rng_key, num_epochs)
-    opt_state, losses = jax.lax.scan(epoch_step, opt_state, epochs)
+    opt_state = opt_init((beta.logits, trans_dist.logits))
 
-    losses = losses.flatten()
+    def make_train_step(observations_):
+        def train_step(carry, idx):
+            opt_state, i = carry
+            mask = idx >= 0
+            idx = jnp.maximum(idx, 0)
+            params = get_params(opt_state)
+            loss, grads = jax.value_and_grad(loss_fn)(params, observations_[idx], lens[idx], mask)
+            return (opt_update(i, grads, opt_state), i + 1), loss
+        return train_step
+
+    @jit
+    def train(opt_state, batch_indices, schedule):
+        def epoch_step(carry, inputs):
+            epoch_indices, (bucket_ids, batch_ids) = inputs
+            def make_branch(length, indices):
+                # The sequences of this bucket are at most `length` long
+                train_step = make_train_step(observations[:, :length])
+                return lambda carry, batch_id: train_step(carry, indices[batch_id])
+
+            branches = [make_branch(length, indices) for (_, length), indices in zip(buckets, epoch_indices)]
+
+            def step(carry, ids):
+                bucket_id, batch_id = ids
+                return lax.switch(bucket_id, branches, carry, batch_id)
+
+            carry, losses = lax.scan(step, carry, (bucket_ids, batch_ids))
+            return carry, losses.mean()
+
+        (opt_state, _), losses = lax.scan(epoch_step, (opt_state, 0), (batch_indices, schedule))
+        return opt_state, losses
+
+    # Compile first, so that the timing only includes the training
+    train = train.lower(opt_state, batch_indices, schedule).compile()
+    t0 = time.time()
+    opt_state, losses = jax.block_until_ready(train(opt_state, batch_indices, schedule))
+    elapsed = time.time() - t0
+
+    tokens = num_epochs * int(lens.sum())
+    padded_tokens = sum(indices[0].size * length for (_, length), indices in zip(buckets, batch_indices)) * num_epochs
+    stats = {'tokens/s': tokens / elapsed, 'padding efficiency': tokens / padded_tokens, 'time (s)': elapsed}
 
     params = get_params(opt_state)
     hmm = make_hmm(params)
     obs_logits, _ = params
-    return hmm, losses, obs_logits
+    return hmm, losses, obs_logits, stats
 
 
 # + [markdown] id="NlZF_rstDO_3"
@@ -219,8 +269,9 @@ for learning_rate, batch_size in zip(learning_rates,batch_sizes):
   losses, obs_logits = [], []
   for k in hidden_states:
     initial_hmm, b = init_hmm(k, D)
-    hmm, loss_, obs_logits_ = fit(sequences, lengths, b, initial_hmm.trans_dist, batch_size, num_epochs=num_epochs)
-    
+    hmm, loss_, obs_logits_, stats = fit(sequences, lengths, b, initial_hmm.trans_dist, batch_size, num_epochs=num_epochs)
+    print(f"batch_size={batch_size}, K={k}: {stats['tokens/s']:.0f} tokens/s, padding efficiency {stats['padding efficiency']:.2f}")
+
     #Store results
     models[k]= hmm
     losses.append(loss_)
@@ -138,5 +138,162 @@ hmm_utils.plot_loss_curve(neg_ll_jax, "EM JAX")
 dot = hmm_plot_graphviz(params_jax, '../figures/hmm_casino_em', state_names, obs_names)
 dot
 
+# + [markdown] id="Yq3Lm8Tn0sRc"
+# # Online EM for streams
+
+# + [markdown] id="Vb7wPz2KcE1d"
+# Batch EM needs all the sequences in memory, and goes over all of them at every iteration. For a stream of observations that never ends we use stepwise (online) EM instead. The stream comes in chunks $x^{(k)}$ of fixed length. For each chunk we run forward-backward with the current parameters, starting from the filtered distribution $p(z | x^{(1:k-1)})$ of the last state of the previous chunk (and from $\pi$ before the first chunk), which gives the expected transition and emission counts $s^{(k)}$ of the chunk, per observation. These are averaged into running statistics with a decreasing step size,
+# $$
+# S^{(k)} = (1 - \eta_k) S^{(k-1)} + \eta_k s^{(k)}, \quad \eta_k = \max((k + 1)^{-\kappa}, \eta_{min}),
+# $$
+# with $\kappa \in (0.5, 1]$, and the M-step normalizes the rows of $S^{(k)}$ into the new $A$ and $B$. The memory is that of one chunk, whatever the length of the stream. With $\eta_{min} > 0$ the estimates keep adapting, so they can track parameters that change over time.
+#
+# After every chunk, `hmm_online_em` yields the parameters, the average log likelihood of the chunk under the parameters before the update, and the drift of the parameters, the largest change of an entry of $A$ and $B$ in this update.
+
+# + id="Hc5rMw8sTnUe"
+import itertools
+from functools import partial
+
+import jax
+from jax import jit, lax
+from jax.nn import one_hot
+
+
+@jit
+def chunk_statistics(trans_mat, obs_mat, filtered, obs):
+    """Expected transition and emission counts of a chunk of observations, and the filtered
+    distribution of its last state, given the filtered distribution of the state before it"""
+    def forward(alpha, x):
+        alpha = (alpha @ trans_mat) * obs_mat[:, x]
+        c = alpha.sum()
+        return alpha / c, (alpha / c, c)
+
+    _, (alphas, cs) = lax.scan(forward, filtered, obs)
+
+    def backward(beta, inputs):
+        x, c = inputs
+        beta_prev = trans_mat @ (obs_mat[:, x] * beta) / c
+        return beta_prev, beta
+
+    _, betas = lax.scan(backward, jnp.ones_like(filtered), (obs, cs), reverse=True)
+
+    # Posterior of the state at every step, and of the transitions into it
+    gamma = alphas * betas
+    prev = jnp.vstack([filtered, alphas[:-1]])
+    trans_counts = jnp.einsum('ti,ij,tj->ij', prev, trans_mat, obs_mat[:, obs].T * betas / cs[:, None])
+    obs_counts = gamma.T @ one_hot(obs, obs_mat.shape[1])
+    return trans_counts, obs_counts, alphas[-1], jnp.log(cs).sum()
+
+
+def hmm_online_em(chunks, trans_mat, obs_mat, init_dist, kappa=0.6, min_step_size=0.):
+    """Yields the parameters, the log likelihood per observation and the parameter drift after every chunk"""
+    filtered = init_dist
+    trans_stats, obs_stats = None, None
+    for k, obs in enumerate(chunks):
+        trans_counts, obs_counts, filtered, log_likelihood = chunk_statistics(trans_mat, obs_mat, filtered, obs)
+        step_size = max((k + 1) ** -kappa, min_step_size)
+        if trans_stats is None:
+            trans_stats, obs_stats = trans_counts / len(obs), obs_counts / len(obs)
+        else:
+            trans_stats = (1 - step_size) * trans_stats + step_size * trans_counts / len(obs)
+            obs_stats = (1 - step_size) * obs_stats + step_size * obs_counts / len(obs)
+
+        new_trans_mat = trans_stats / trans_stats.sum(axis=1, keepdims=True)
+        new_obs_mat = obs_stats / obs_stats.sum(axis=1, keepdims=True)
+        drift = {'trans_mat': float(jnp.max(jnp.abs(new_trans_mat - trans_mat))),
+                 'obs_mat': float(jnp.max(jnp.abs(new_obs_mat - obs_mat)))}
+        trans_mat, obs_mat = new_trans_mat, new_obs_mat
+        yield HMMJax(trans_mat, obs_mat, init_dist), float(log_likelihood) / len(obs), drift
+
+
+# + [markdown] id="Pk4dGx9sWq2L"
+# A stream of rolls of the casino dice, generated in chunks of 1000, with the state carried from chunk to chunk. After 3000 chunks the loaded die changes from favouring 6 to favouring 1, and the transition probabilities change too.
+
+# + id="Gm6zXcTb1uQe"
+@partial(jit, static_argnames='chunk_size')
+def sample_chunk(key, trans_mat, obs_mat, state, chunk_size):
+    def step(state, key):
+        k1, k2 = split(key)
+        state = jax.random.choice(k1, len(trans_mat), p=trans_mat[state])
+        return state, jax.random.choice(k2, obs_mat.shape[1], p=obs_mat[state])
+
+    return lax.scan(step, state, split(key, chunk_size))
+
+
+def dice_stream(key, schedule, chunk_size=1000):
+    """Endless stream of chunks of observations; schedule(k) gives the parameters of chunk k"""
+    state = 0
+    for k in itertools.count():
+        key, subkey = split(key)
+        trans_mat, obs_mat = schedule(k)
+        state, obs = sample_chunk(subkey, trans_mat, obs_mat, state, chunk_size)
+        yield obs
+
+
+B_changed = jnp.array([
+    [1/6, 1/6, 1/6, 1/6, 1/6, 1/6],
+    [5/10, 1/10, 1/10, 1/10, 1/10, 1/10]
+])
+A_changed = jnp.array([
+    [0.98, 0.02],
+    [0.05, 0.95]
+])
+schedule = lambda k: (A, B) if k < 3000 else (A_changed, B_changed)
+
+# + [markdown] id="Rj8fUa3nYk5D"
+# Online EM over the first 6000 chunks ($6 \cdot 10^6$ rolls), once with the decreasing step size only, and once with $\eta_{min} = 0.01$. We start from random observation probabilities, but from a transition matrix that favours staying in the same state: from a random transition matrix, online EM (like batch EM) can settle on states that are not persistent, which only model the frequencies of the faces. With $\kappa = 0.6$ the step size decreases slowly, so both runs follow the change to some extent, but the one with $\eta_{min}$ ends closer to the new parameters.
+
+# + id="Ws5xEh2aQz7F"
+keys = split(PRNGKey(0), 2)
+init_trans_mat = 0.8 * jnp.eye(n_hidden) + 0.2 / n_hidden
+init_obs_mat = jax.random.dirichlet(keys[0], jnp.ones(n_obs), (n_hidden,))
+
+n_chunks = 6000
+runs = {}
+for min_step_size in [0., 0.01]:
+    t0 = time.time()
+    stream = itertools.islice(dice_stream(keys[1], schedule), n_chunks)
+    history = list(hmm_online_em(stream, init_trans_mat, init_obs_mat, pi, min_step_size=min_step_size))
+    runs[min_step_size] = history
+    params, _, _ = history[-1]
+    print(f'min_step_size={min_step_size}: {time.time() - t0:.1f}s')
+    print(np.round(params.trans_mat, 3))
+    print(np.round(params.obs_mat, 3))
+
+# + [markdown] id="Lk2Wd9RcVa4x"
+# The log likelihood per roll of every chunk, before the update, and the drift of the parameters, averaged over 50 chunks. The drift decreases with the step size, and jumps when the dice change.
+
+# + id="Zc8nFv4eLd3A"
+import matplotlib.pyplot as plt
+
+# Moving averages over 50 chunks
+smooth = lambda x: np.convolve(x, np.ones(50) / 50, mode='valid')
+
+fig, axes = plt.subplots(1, 3, figsize=(18, 4))
+for min_step_size, history in runs.items():
+    _, log_likelihoods, drifts = zip(*history)
+    label = f'$\\eta_{{min}}$={min_step_size}'
+    axes[0].plot(smooth(log_likelihoods), label=label)
+    axes[1].plot(smooth([d['trans_mat'] for d in drifts]), label=label)
+    axes[2].plot(smooth([d['obs_mat'] for d in drifts]), label=label)
+axes[0].set_ylabel('log likelihood per roll')
+axes[1].set_ylabel('drift of the transition matrix')
+axes[2].set_ylabel('drift of the observation matrix')
+for ax in axes:
+    ax.axvline(3000, color='k', linestyle='--')
+    ax.set_xlabel('chunk')
+    ax.legend()
+axes[1].set_yscale('log')
+axes[2].set_yscale('log')
+plt.show()
+
+# + [markdown] id="Tf8qVn3hXe6K"
+# The model learned with $\eta_{min} = 0.01$, at the end of the stream.
+
+# + id="Ud1bKx4rMi7N"
+params_online, _, _ = runs[0.01][-1]
+dot = hmm_plot_graphviz(params_online, '../figures/hmm_casino_online_em', state_names, obs_names)
+dot
+
 # + id="3Fr78xhIaGAv"
 
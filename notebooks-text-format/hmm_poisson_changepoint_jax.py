@@ -250,6 +250,186 @@ ax.set_ylabel("latent rate")
 ax.set_xlabel("time")
 ax.set_title("Inferred latent rate over time");
 
+# + [markdown] id="HEsaS4W415FK"
+# ## Parallel inference with associative scans
+#
+# `hmm_forwards`, `hmm_forwards_backwards` and `hmm_viterbi` take $T$ sequential steps. With $\ell_t(j) = \log p(x_t | z_t = j)$, the forward recursion can instead be written as a product of $K \times K$ matrices in log space,
+# $$
+# E_1(i, j) = \log \pi_j + \ell_1(j), \quad E_t(i, j) = \log A_{ij} + \ell_t(j), \quad
+# \log \alpha_t(j) = \log p(z_t = j, x_{1:t}) = (E_1 \otimes E_2 \otimes \dots \otimes E_t)(i, j)
+# $$
+# (for any row $i$), where $(E \otimes F)(i, k) = \log \sum_j \exp(E(i, j) + F(j, k))$. This product is associative, so all the prefix products can be computed with `lax.associative_scan` in $O(\log T)$ parallel steps, at the price of $O(T K^3)$ work instead of $O(T K^2)$. Similarly, $\log \beta_t(i) = \log p(x_{t+1:T} | z_t = i) = \log \sum_j \exp((E_{t+1} \otimes \dots \otimes E_T)(i, j))$ comes from a reverse scan, and the smoothed marginals are $p(z_t | x_{1:T}) = \alpha_t \beta_t / p(x_{1:T})$. Replacing $\log \sum \exp$ by $\max$ gives the Viterbi scores: the most probable state at time $t$ is the argmax of the best score of the paths up to $t$ plus the best score of the paths after $t$, which is the Viterbi path when it is unique.
+#
+# The functions below take the log initial probabilities, the log transition matrix and the $T \times K$ log likelihoods, and run either the sequential recursions (`lax.scan`) or the parallel ones, selected by `method`.
+
+# + id="wnYHv473i3sL"
+import time
+from functools import partial
+
+HMM_METHODS = ('sequential', 'parallel')
+
+def hmm_log_potentials(hmm, observations):
+  """Log initial probabilities, log transition matrix and (T, K) log likelihoods of an HMM"""
+  log_liks = hmm.obs_dist.log_prob(observations[:, None])
+  return jnp.log(hmm.init_dist.probs), jnp.log(hmm.trans_dist.probs), log_liks
+
+def _logsumexp(x, axis=None, keepdims=False):
+  # Like jax.nn.logsumexp, but with zero gradients when all the terms are
+  # -inf (states with probability 0), instead of nans
+  m = lax.stop_gradient(jnp.max(x, axis=axis, keepdims=True))
+  m = jnp.where(jnp.isfinite(m), m, 0.)
+  s = jnp.sum(jnp.exp(x - m), axis=axis, keepdims=True)
+  out = jnp.where(s > 0, jnp.log(jnp.where(s > 0, s, 1.)) + m, -jnp.inf)
+  return out if keepdims else jnp.squeeze(out, axis)
+
+def _log_matmul(E, F):
+  return _logsumexp(E[..., :, :, None] + F[..., None, :, :], axis=-2)
+
+def _max_matmul(E, F):
+  return jnp.max(E[..., :, :, None] + F[..., None, :, :], axis=-2)
+
+SUM_PRODUCT = (_logsumexp, _log_matmul)
+MAX_PRODUCT = (jnp.max, _max_matmul)
+
+def _normalize(E, reduce):
+  c = reduce(E, axis=(-2, -1), keepdims=True)
+  return E - c, c[..., 0, 0]
+
+def _scan_products(elements, semiring, reverse=False):
+  """Normalized prefix (or suffix) products of log space matrices, and the logs of their scales"""
+  reduce, matmul = semiring
+  def combine(x, y):
+    # With reverse=True, the scan passes the later element first
+    (E, a), (F, b) = (y, x) if reverse else (x, y)
+    G, c = _normalize(matmul(E, F), reduce)
+    return G, a + b + c
+  return lax.associative_scan(combine, _normalize(elements, reduce), reverse=reverse)
+
+def _forward(log_init, log_trans, log_liks, method, semiring):
+  """Normalized log alpha_t (or Viterbi scores, with the max semiring), shape (T, K), and their log scales"""
+  reduce, _ = semiring
+  first = log_init + log_liks[0]
+  if method == 'parallel':
+    elements = jnp.concatenate([jnp.broadcast_to(first, log_trans.shape)[None],
+                                log_trans + log_liks[1:, None, :]])
+    products, log_scales = _scan_products(elements, semiring)
+    # All the rows of the products are the same
+    rows = products[:, 0]
+    c = reduce(rows, axis=1)
+    return rows - c[:, None], log_scales + c
+  def step(carry, ll):
+    log_alpha, log_scale = carry
+    log_alpha = reduce(log_alpha[:, None] + log_trans, axis=0) + ll
+    c = reduce(log_alpha)
+    carry = log_alpha - c, log_scale + c
+    return carry, carry
+  c0 = reduce(first)
+  _, (rest, log_scales) = lax.scan(step, (first - c0, c0), log_liks[1:])
+  return jnp.vstack([first - c0, rest]), jnp.append(c0, log_scales)
+
+def _backward(log_trans, log_liks, method, semiring):
+  """log beta_t (or the best scores of the paths after t, with the max semiring) up to a constant, shape (T, K)"""
+  reduce, _ = semiring
+  last = jnp.zeros(log_liks.shape[1])
+  if method == 'parallel':
+    suffix, _ = _scan_products(log_trans + log_liks[1:, None, :], semiring, reverse=True)
+    rest = reduce(suffix, axis=-1)
+  else:
+    def step(carry, ll):
+      carry = reduce(log_trans + ll + carry, axis=1)
+      carry = carry - reduce(carry)
+      return carry, carry
+    _, rest = lax.scan(step, last, log_liks[1:], reverse=True)
+  return jnp.vstack([rest, last])
+
+@partial(jit, static_argnames='method')
+def hmm_filter(log_init, log_trans, log_liks, method='sequential'):
+  """Log likelihood and filtered marginals p(z_t | x_{1:t})"""
+  log_alpha, log_scales = _forward(log_init, log_trans, log_liks, method, SUM_PRODUCT)
+  return log_scales[-1], jnp.exp(log_alpha)
+
+@partial(jit, static_argnames='method')
+def hmm_smoother(log_init, log_trans, log_liks, method='sequential'):
+  """Log likelihood and smoothed marginals p(z_t | x_{1:T})"""
+  log_alpha, log_scales = _forward(log_init, log_trans, log_liks, method, SUM_PRODUCT)
+  log_beta = _backward(log_trans, log_liks, method, SUM_PRODUCT)
+  return log_scales[-1], jax.nn.softmax(log_alpha + log_beta, axis=1)
+
+@partial(jit, static_argnames='method')
+def hmm_map_states(log_init, log_trans, log_liks, method='sequential'):
+  """Most probable state sequence"""
+  if method == 'parallel':
+    scores, _ = _forward(log_init, log_trans, log_liks, method, MAX_PRODUCT)
+    return jnp.argmax(scores + _backward(log_trans, log_liks, method, MAX_PRODUCT), axis=1)
+  # Viterbi with back pointers
+  def step(delta, ll):
+    scores = delta[:, None] + log_trans
+    delta = jnp.max(scores, axis=0) + ll
+    return delta - jnp.max(delta), jnp.argmax(scores, axis=0)
+  delta, pointers = lax.scan(step, log_init + log_liks[0], log_liks[1:])
+  def backtrack(state, pointer):
+    state = pointer[state]
+    return state, state
+  last = jnp.argmax(delta)
+  _, states = lax.scan(backtrack, last, pointers, reverse=True)
+  return jnp.append(states, last)
+
+
+# + [markdown] id="ipIJHXSQydXH"
+# Both methods agree with `hmm_lib` on the 4-state model fitted above, and with each other on a sequence of $10^4$ steps drawn from it.
+
+# + id="7KyYHv-GoeVo"
+potentials = hmm_log_potentials(hmm, observed_counts)
+for method in HMM_METHODS:
+  log_likelihood, smoothed = hmm_smoother(*potentials, method=method)
+  print(f'{method}: log likelihood error {jnp.abs(log_likelihood - hmm_forwards(hmm, observed_counts)[0]):.1e}, '
+        f'smoothed error {jnp.max(jnp.abs(smoothed - posterior_probs)):.1e}, '
+        f'same Viterbi path {bool(jnp.all(hmm_map_states(*potentials, method=method) == hmm_viterbi(hmm, observed_counts)))}')
+
+def sample_counts(key, rates, transition_probs, num_steps):
+  k1, k2, k3 = split(key, 3)
+  def step(z, key):
+    z = jax.random.categorical(key, jnp.log(transition_probs[z]))
+    return z, z
+  z0 = jax.random.randint(k1, (), 0, len(rates))
+  _, z = lax.scan(step, z0, split(k2, num_steps))
+  return jax.random.poisson(k3, rates[z]).astype(jnp.float32)
+
+long_counts = sample_counts(PRNGKey(1), rates, transition_probs, 10**4)
+long_potentials = hmm_log_potentials(hmm, long_counts)
+ll_seq, filtered_seq = hmm_filter(*long_potentials)
+ll_par, filtered_par = hmm_filter(*long_potentials, method='parallel')
+print(f'filtered: log likelihood relative error {jnp.abs((ll_seq - ll_par) / ll_seq):.1e}, max error {jnp.max(jnp.abs(filtered_seq - filtered_par)):.1e}')
+print(f'smoothed: max error {jnp.max(jnp.abs(hmm_smoother(*long_potentials)[1] - hmm_smoother(*long_potentials, method="parallel")[1])):.1e}')
+print('same Viterbi path:', bool(jnp.all(hmm_map_states(*long_potentials) == hmm_map_states(*long_potentials, method='parallel'))))
+
+# + [markdown] id="KMoYcCuPL0Iu"
+# Time to compute the smoothed marginals of random HMMs with $K$ states and sequences of length $T$, with each method (compiled before timing), and the speedup of the parallel scan. The parallel scan does $K$ times more work, so it only pays off when there is spare parallel hardware for it, e.g. on a GPU, for long sequences and few states; on a CPU the sequential recursion is usually faster. The $T \times K \times K \times K$ intermediate arrays of the parallel scan also limit it to small $K$, so we skip the largest problems.
+
+# + id="IEZsrb1oHzIg"
+import pandas as pd
+
+def benchmark(f, *args):
+  jax.block_until_ready(f(*args))
+  t0 = time.time()
+  jax.block_until_ready(f(*args))
+  return time.time() - t0
+
+rows = []
+for K in [2, 4, 16, 64]:
+  for T in [100, 1000, 10000, 100000]:
+    if T * K**3 > 10**8:
+      continue
+    keys = split(PRNGKey(0), 2)
+    log_trans = jax.nn.log_softmax(jax.random.normal(keys[0], (K, K)))
+    log_liks = jax.random.normal(keys[1], (T, K))
+    log_init = jnp.full(K, -jnp.log(K))
+    times = {method: benchmark(partial(hmm_smoother, method=method), log_init, log_trans, log_liks)
+             for method in HMM_METHODS}
+    rows.append({'K': K, 'T': T, **{f'{method} (ms)': 1000 * t for method, t in times.items()},
+                 'speedup': times['sequential'] / times['parallel']})
+pd.DataFrame(rows)
+
 # + [markdown] id="_RnpDkTKK4el"
 # ## Model with unknown $K$
 
@@ -326,3 +506,94 @@ for i, learned_model_rates in enumerate(rates):
   ax.set_title("{}-state model".format(i+1))
   ax.legend(loc=4)
 plt.tight_layout()
+
+# + [markdown] id="doSfFoyq5bB3"
+# ## Fitting all the models in one compiled call
+#
+# Gradient descent can end in a poor local optimum (above, two of the states may end up with the same rate), so it is common to fit each model from several random initializations and keep the best one. `fit_changepoint_models` fits the models with $1, \dots,$ `max_num_states` states, each from `num_restarts` random initial rates, as a single jitted function: the Adam updates are a `lax.scan` over the steps, which is `vmap`ped over the restarts and the models, and the likelihood is computed with `hmm_filter` (with either `method`). It returns, for every model, the log marginal likelihood (the negative loss) of every restart, the best restart, its rates, and the posterior marginals of the states under it.
+
+# + id="Yndoqajj_zZg"
+from typing import NamedTuple
+
+class ChangepointModels(NamedTuple):
+  log_marginal_likelihoods: jnp.ndarray  # (num models, num restarts)
+  best_restarts: jnp.ndarray  # (num models,)
+  log_rates: jnp.ndarray  # (num models, max num states), of the best restarts
+  posterior_probs: jnp.ndarray  # (num models, T, max num states), of the best restarts
+  losses: jnp.ndarray  # (num models, num restarts, n_steps)
+
+@partial(jit, static_argnames=('max_num_states', 'num_restarts', 'n_steps', 'method'))
+def fit_changepoint_models(counts, rng_key, max_num_states, num_restarts=8, n_steps=201,
+                           daily_change_prob=0.05, learning_rate=1e-1, method='sequential'):
+  opt_init, opt_update, get_params = optimizers.adam(learning_rate)
+  states = jnp.arange(1, max_num_states + 1)
+  initial_state_probs, transition_probs = vmap(build_latent_state, in_axes=(0, None, None))(
+      states, max_num_states, daily_change_prob)
+
+  def loss_fn(log_rates, initial_state_probs, transition_probs):
+    hmm = make_hmm(log_rates, transition_probs, initial_state_probs)
+    log_likelihood, _ = hmm_filter(*hmm_log_potentials(hmm, counts), method=method)
+    return -(jnp.sum(rate_prior.log_prob(jnp.exp(log_rates))) + log_likelihood)
+
+  def fit_one(log_rates, initial_state_probs, transition_probs):
+    def train_step(opt_state, step):
+      loss, grads = jax.value_and_grad(loss_fn)(get_params(opt_state), initial_state_probs, transition_probs)
+      return opt_update(step, grads, opt_state), loss
+
+    opt_state, losses = lax.scan(train_step, opt_init(log_rates), jnp.arange(n_steps))
+    log_rates = get_params(opt_state)
+    return log_rates, loss_fn(log_rates, initial_state_probs, transition_probs), losses
+
+  # vmap over the restarts, and then over the models
+  fit_all = vmap(vmap(fit_one, in_axes=(0, None, None)), in_axes=(0, 0, 0))
+  init_log_rates = jnp.log(jnp.mean(counts)) + jax.random.normal(rng_key, (max_num_states, num_restarts, max_num_states))
+  log_rates, final_losses, losses = fit_all(init_log_rates, initial_state_probs, transition_probs)
+
+  best_restarts = jnp.argmin(final_losses, axis=1)
+  best_log_rates = log_rates[jnp.arange(max_num_states), best_restarts]
+  def posterior_marginals(log_rates, initial_state_probs, transition_probs):
+    hmm = make_hmm(log_rates, transition_probs, initial_state_probs)
+    return hmm_smoother(*hmm_log_potentials(hmm, counts), method=method)[1]
+  posterior_probs = vmap(posterior_marginals)(best_log_rates, initial_state_probs, transition_probs)
+  return ChangepointModels(-final_losses, best_restarts, best_log_rates, posterior_probs, losses)
+
+
+# + [markdown] id="azPLtMSr1HwD"
+# On the data above, with 8 restarts per model: the log marginal likelihood of every restart, and of the best one. The restarts of the same model can differ a lot, and the best ones peak at the true number of states.
+
+# + id="yaWtmgR6W_Wv"
+models = fit_changepoint_models(observed_counts, PRNGKey(2), max_num_states)
+
+plt.plot(states, models.log_marginal_likelihoods, 'o', c='tab:blue', alpha=0.3)
+plt.plot(states, models.log_marginal_likelihoods.max(axis=1), c='tab:blue', lw=3)
+plt.ylim([-400, -200])
+plt.ylabel("marginal likelihood $\\tilde{p}(x)$")
+plt.xlabel("number of latent states")
+plt.title("Model selection on latent states, with restarts");
+
+best_num_states = int(jnp.argmax(models.log_marginal_likelihoods.max(axis=1))) + 1
+print(f"best model: {best_num_states} states, with rates {jnp.exp(models.log_rates[best_num_states - 1, :best_num_states])}")
+print(f"best restart of each model: {models.best_restarts}")
+
+# + [markdown] id="zjPd-YUfUtVy"
+# The same sweep over ten years of daily counts, from a model with 5 rates that change on average every 500 days (which we use as the change probability of the fitted models), with up to 8 states and 8 restarts per model: 64 fits of 201 steps each, over 3650 days, in one compiled call. We time the compilation and the fit separately.
+
+# + id="vgpHRuscf77D"
+daily_rates = jnp.array([5., 20., 12., 40., 2.])
+daily_counts = sample_counts(PRNGKey(3), daily_rates, build_latent_state(5, 5, 0.002)[1], 3650)
+
+t0 = time.time()
+jax.block_until_ready(fit_changepoint_models(daily_counts, PRNGKey(4), 8, daily_change_prob=0.002))
+t1 = time.time()
+daily_models = jax.block_until_ready(fit_changepoint_models(daily_counts, PRNGKey(4), 8, daily_change_prob=0.002))
+t2 = time.time()
+print(f"compile and fit: {t1 - t0:.1f}s, fit: {t2 - t1:.1f}s")
+
+best = int(jnp.argmax(daily_models.log_marginal_likelihoods.max(axis=1)))
+print(f"best model: {best + 1} states, with rates {jnp.sort(jnp.exp(daily_models.log_rates[best, :best + 1]))}")
+fig, ax = plt.subplots(figsize=(14, 4))
+ax.plot(daily_counts, c='black', alpha=0.3, label='observed counts')
+ax.plot(jnp.exp(daily_models.log_rates[best])[jnp.argmax(daily_models.posterior_probs[best], axis=1)],
+        c='tab:green', lw=2, label='inferred rate')
+ax.set_xlabel("day")
+ax.legend(loc=1);
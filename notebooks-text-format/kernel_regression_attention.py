@@ -212,5 +212,166 @@ d2l.show_heatmaps(
 # + colab={"base_uri": "https://localhost:8080/"} id="thB233zmvc46" outputId="76aba334-9a51-42aa-a127-12c148afb58b"
 print(net.w)
 
+# + [markdown] id="5V38cbyjj1RM"
+# # Kernel regression for large data sets
+#
+# `NWKernelRegression` needs the queries and the keys tiled into (no. of queries, no. of keys) matrices, and the leave-one-out keys above take another $N \times N$ matrix, so it runs out of memory at a few tens of thousands of points. `ChunkedNWKernelRegression` takes the keys and values as vectors instead, and computes the same softmax-weighted average
+# $$
+# \hat{y}(q) = \sum_i \frac{\exp(s_i)}{\sum_j \exp(s_j)} y_i, \quad s_i = -\frac{(w (q - x_i))^2}{2}
+# $$
+# for chunks of queries and chunks of keys, with a streaming log-sum-exp: for every query we keep the largest score $m$ seen so far, and the sums $\sum_i e^{s_i - m}$ and $\sum_i e^{s_i - m} y_i$, which are rescaled by $e^{m - m'}$ whenever the maximum increases to $m'$. The memory is then $O(\text{query chunk} \times \text{key chunk})$, whatever the number of points. For leave-one-out predictions the queries are the keys themselves, and we set the score of every query with itself to $-\infty$, without building the leave-one-out keys.
+#
+# The Gaussian weights of the keys more than a few bandwidths $1/w$ away from a query are negligible, so we can also restrict every query to its `n_neighbors` nearest keys. In 1d the nearest keys of a query are consecutive in the sorted keys, so we find its position with a binary search (`torch.searchsorted`) and take the nearest keys in a window of twice that size around it. For inputs with more than one dimension we use a KD-tree. The cost is then $O(N \log N)$ instead of $O(N^2)$.
+
+# + id="Qn5ZV0n8lcTA"
+from scipy.spatial import cKDTree
+
+
+class KeyIndex:
+    """Finds the nearest keys of queries: with a sorted index in 1d, and a KD-tree otherwise"""
+    def __init__(self, keys):
+        keys = keys.detach()
+        self.n_keys = len(keys)
+        if keys.dim() > 1:
+            self.tree = cKDTree(keys.numpy())
+        else:
+            self.tree = None
+            self.sorted_keys, self.order = torch.sort(keys)
+
+    def query(self, queries, n_neighbors):
+        """Indices of the `n_neighbors` nearest keys of every query"""
+        queries = queries.detach()
+        n_neighbors = min(n_neighbors, self.n_keys)
+        if self.tree is not None:
+            _, idx = self.tree.query(queries.numpy(), k=n_neighbors)
+            return torch.as_tensor(idx).reshape(len(queries), n_neighbors)
+        # The nearest keys are among the n_neighbors sorted keys on either side
+        window = min(2 * n_neighbors, self.n_keys)
+        start = torch.searchsorted(self.sorted_keys, queries) - n_neighbors
+        candidates = start.clamp(0, self.n_keys - window)[:, None] + torch.arange(window)
+        dist = (self.sorted_keys[candidates] - queries[:, None]).abs()
+        nearest = torch.topk(dist, n_neighbors, dim=1, largest=False).indices
+        return self.order[torch.gather(candidates, 1, nearest)]
+
+
+class ChunkedNWKernelRegression(nn.Module):
+    def __init__(self, chunk_size=1024, key_chunk_size=4096, n_neighbors=None, **kwargs):
+        super().__init__(**kwargs)
+        self.w = nn.Parameter(torch.rand((1,), requires_grad=True))
+        self.chunk_size = chunk_size
+        self.key_chunk_size = key_chunk_size
+        self.n_neighbors = n_neighbors
+
+    def scores(self, queries, keys):
+        # Shape of `queries`: (no. of queries, ...), `keys`: (no. of queries or 1, no. of keys, ...)
+        diff = (queries.unsqueeze(1) - keys) * self.w
+        return -(diff.reshape(diff.shape[0], diff.shape[1], -1)**2).sum(dim=-1) / 2
+
+    def forward(self, queries, keys, values, leave_one_out=False):
+        # Shape of `keys` and `values`: (no. of key-value pairs, ...). With
+        # `leave_one_out`, the queries are the keys
+        if self.n_neighbors is not None:
+            index = KeyIndex(keys)
+        y_hat = []
+        for start in range(0, len(queries), self.chunk_size):
+            q = queries[start:start + self.chunk_size]
+            rows = torch.arange(start, start + len(q))[:, None]
+            if self.n_neighbors is None:
+                y_hat.append(self._streaming_average(q, keys, values, rows, leave_one_out))
+            else:
+                idx = index.query(q, self.n_neighbors + int(leave_one_out))
+                s = self.scores(q, keys[idx])
+                if leave_one_out:
+                    s = s.masked_fill(idx == rows, -math.inf)
+                y_hat.append((torch.softmax(s, dim=1) * values[idx]).sum(dim=1))
+        return torch.cat(y_hat)
+
+    def _streaming_average(self, q, keys, values, rows, leave_one_out):
+        m = torch.full((len(q),), torch.finfo(keys.dtype).min)
+        total = torch.zeros(len(q))
+        weighted = torch.zeros(len(q))
+        for start in range(0, len(keys), self.key_chunk_size):
+            s = self.scores(q, keys[start:start + self.key_chunk_size].unsqueeze(0))
+            if leave_one_out:
+                cols = torch.arange(start, start + s.shape[1])[None, :]
+                s = s.masked_fill(rows == cols, -math.inf)
+            m_new = torch.maximum(m, s.max(dim=1).values)
+            scale = torch.exp(m - m_new)
+            p = torch.exp(s - m_new[:, None])
+            total = total * scale + p.sum(dim=1)
+            weighted = weighted * scale + p @ values[start:start + self.key_chunk_size]
+            m = m_new
+        return weighted / total
+
+
+# + [markdown] id="ZpE9bWt2mJ1x"
+# With the bandwidth learned above, the chunked version gives the same predictions as `net`, and the same leave-one-out predictions as the tiled keys, here with chunks of 7 queries and 16 keys to exercise the streaming. Restricting every query to its 20 nearest keys changes the predictions very little.
+
+# + id="Cj5y1Sg3mQpE"
+chunked = ChunkedNWKernelRegression(chunk_size=7, key_chunk_size=16)
+chunked.load_state_dict(net.state_dict())
+with torch.no_grad():
+    print(torch.allclose(chunked(x_test, x_train, y_train),
+                         net(x_test, x_train.repeat((n_test, 1)), y_train.repeat((n_test, 1))), atol=1e-5))
+    mask = (1 - torch.eye(n_train)).type(torch.bool)
+    loo_keys = x_train.repeat((n_train, 1))[mask].reshape((n_train, -1))
+    loo_values = y_train.repeat((n_train, 1))[mask].reshape((n_train, -1))
+    print(torch.allclose(chunked(x_train, x_train, y_train, leave_one_out=True),
+                         net(x_train, loo_keys, loo_values), atol=1e-5))
+    pruned = ChunkedNWKernelRegression(n_neighbors=20)
+    pruned.load_state_dict(net.state_dict())
+    print(torch.max(torch.abs(pruned(x_test, x_train, y_train) - chunked(x_test, x_train, y_train))))
+
+# + [markdown] id="k7AqYwlemT3v"
+# A series with $10^6$ noisy observations of the same function, over a longer range. We learn the bandwidth from the leave-one-out loss on $10^5$ of the points, with 256 neighbors per point and the Adam optimizer, and then smooth the whole series with 2048 neighbors.
+
+# + id="o4VbM7r4mXoq"
+import time
+
+n_big = 10**6
+x_big, _ = torch.sort(torch.rand(n_big) * 1000)
+y_big = f(x_big) + torch.normal(0.0, 0.5, (n_big,))
+
+idx = torch.randperm(n_big)[:10**5]
+x_sub, y_sub = x_big[idx], y_big[idx]
+big_net = ChunkedNWKernelRegression(n_neighbors=256)
+big_net.w.data.fill_(1.)
+trainer = torch.optim.Adam(big_net.parameters(), lr=0.5)
+for epoch in range(20):
+    trainer.zero_grad()
+    l = loss(big_net(x_sub, x_sub, y_sub, leave_one_out=True), y_sub).mean() / 2
+    l.backward()
+    trainer.step()
+    print(f'epoch {epoch + 1}, loss {float(l):.6f}, w {float(big_net.w):.3f}')
+
+big_net.n_neighbors = 2048
+t0 = time.time()
+with torch.no_grad():
+    y_smooth = big_net(x_big, x_big, y_big)
+print(f'smoothed {n_big} points in {time.time() - t0:.1f}s')
+
+plt.figure(figsize=(12, 4))
+window = x_big < 20
+plt.plot(x_big[window], y_big[window], ',', alpha=0.3, label='data')
+plt.plot(x_big[window], y_smooth[window], label='smoothed')
+plt.plot(x_big[window], f(x_big[window]), '--', label='truth')
+plt.legend();
+
+# + [markdown] id="Ub8vQeGgmbuw"
+# Time to predict all the points from all the points. The streaming version uses bounded memory but still does $O(N^2)$ work, while the nearest keys only take $O(N \log N)$.
+
+# + id="TQ0pbGzsmeUj"
+with torch.no_grad():
+    for n in [10**4, 3 * 10**4, 10**5]:
+        x_n, y_n = x_big[:: n_big // n], y_big[:: n_big // n]
+        big_net.n_neighbors = None
+        t0 = time.time()
+        big_net(x_n, x_n, y_n)
+        t1 = time.time()
+        big_net.n_neighbors = 2048
+        big_net(x_n, x_n, y_n)
+        t2 = time.time()
+        print(f'n={n}: streaming {t1 - t0:.2f}s, nearest 2048 keys {t2 - t1:.2f}s')
+
 # + id="2gxdDrmTwAmV"
 
@@ -640,6 +640,184 @@ evecs = evecs[:,idx]
 tol = 1e-3
 assert jnp.allclose(evecs[:,0], u, tol)
 
+# + [markdown] id="MVKdhc7f57Sc"
+# ### Iterative eigensolvers
+#
+# `power_method` above runs in Python, and checks for convergence on the host after every iteration, and it only finds the leading eigenpair. Below are compiled versions of three iterative methods for the top $k$ eigenpairs of a symmetric matrix, which only use the matrix through a function `matvec(v)` $= A v$, so that $A$ need not be stored (for example, for a covariance matrix $X^T X / N$ we can compute $X^T (X v) / N$). The loops are `lax.while_loop`s that stop when the residuals $\|A u - \lambda u\|$ are below `tol` times the largest eigenvalue, or after `max_iter` iterations.
+#
+# * **Power iteration with deflation**: after finding $(\lambda_1, u_1)$, we run power iteration on $A - \lambda_1 u_1 u_1^T$, and so on, with a `lax.scan` over the $k$ eigenpairs.
+# * **Subspace iteration**: power iteration on a block of $p \ge k$ vectors, which are orthonormalized with a QR decomposition at every step. The eigenpairs of the small matrix $V^T A V$ (the Rayleigh-Ritz step) then approximate those of $A$, with an error that decreases like $(\lambda_{p+1} / \lambda_i)^t$, so a few extra vectors speed up convergence.
+# * **Lanczos iteration**: builds an orthonormal basis $Q$ of the Krylov subspace $\text{span}(v, A v, \dots, A^{m-1} v)$ with a three-term recurrence, in which $Q^T A Q$ is tridiagonal. Its extreme eigenvalues converge much faster than those of power iteration. In floating point the basis loses its orthogonality, so we reorthogonalize every new vector against the previous ones. The iteration stops early if the Krylov subspace becomes invariant.
+#
+# All of them return an `EigResult` with the eigenvalues in decreasing order, the eigenvectors as columns, the residual norms and the number of iterations.
+
+# + id="e7hW4fJq0Kc1"
+from typing import NamedTuple
+from jax import lax
+
+class EigResult(NamedTuple):
+  eigenvalues: jnp.ndarray
+  eigenvectors: jnp.ndarray
+  residuals: jnp.ndarray
+  n_iter: jnp.ndarray
+
+def _block(matvec):
+  # Apply matvec to the columns of a matrix
+  return vmap(matvec, in_axes=1, out_axes=1)
+
+def _residuals(matvec, lams, U):
+  return jnp.linalg.norm(_block(matvec)(U) - U * lams, axis=0)
+
+def _ritz(V, AV, k):
+  """Top k Ritz pairs of the orthonormal basis V, and their residual norms"""
+  theta, S = jnp.linalg.eigh(V.T @ AV)
+  theta, S = theta[::-1][:k], S[:, ::-1][:, :k]
+  residuals = jnp.linalg.norm(AV @ S - (V @ S) * theta, axis=0)
+  return theta, V @ S, residuals
+
+
+def power_iteration(matvec, v0, max_iter=1000, tol=1e-6):
+  """Leading eigenpair of a symmetric matrix"""
+  def cond(state):
+    i, u, lam, res = state
+    return (i < max_iter) & (res > tol * jnp.abs(lam))
+
+  def body(state):
+    i, u, _, _ = state
+    w = matvec(u)
+    lam = u @ w
+    res = jnp.linalg.norm(w - lam * u)
+    return i + 1, w / jnp.linalg.norm(w), lam, res
+
+  u0 = v0 / jnp.linalg.norm(v0)
+  init = (0, u0, jnp.zeros((), u0.dtype), jnp.full((), jnp.inf, u0.dtype))
+  i, u, lam, res = lax.while_loop(cond, body, init)
+  return EigResult(lam, u, res, i)
+
+def power_iteration_deflation(matvec, n, k, key, max_iter=1000, tol=1e-6):
+  """Top k eigenpairs, by power iteration on the matrix deflated by the eigenpairs found so far"""
+  def step(carry, v0):
+    lams, U, j = carry
+    # The columns of U that are not found yet are zero
+    deflated = lambda v: matvec(v) - U @ (lams * (U.T @ v))
+    lam, u, _, n_iter = power_iteration(deflated, v0, max_iter, tol)
+    return (lams.at[j].set(lam), U.at[:, j].set(u), j + 1), n_iter
+
+  V0 = jax.random.normal(key, (k, n))
+  (lams, U, _), n_iter = lax.scan(step, (jnp.zeros(k), jnp.zeros((n, k)), 0), V0)
+  return EigResult(lams, U, _residuals(matvec, lams, U), n_iter)
+
+
+def subspace_iteration(matvec, n, k, key, n_extra=10, max_iter=1000, tol=1e-6):
+  """Top k eigenpairs, by power iteration on a block of k + n_extra vectors"""
+  block_matvec = _block(matvec)
+
+  def cond(state):
+    i, V, AV, theta, res = state
+    return (i < max_iter) & (jnp.max(res) > tol * jnp.abs(theta[0]))
+
+  def body(state):
+    i, V, AV, _, _ = state
+    V, _ = jnp.linalg.qr(AV)
+    AV = block_matvec(V)
+    theta, _, res = _ritz(V, AV, k)
+    return i + 1, V, AV, theta, res
+
+  V, _ = jnp.linalg.qr(jax.random.normal(key, (n, k + n_extra)))
+  AV = block_matvec(V)
+  theta, _, res = _ritz(V, AV, k)
+  i, V, AV, theta, res = lax.while_loop(cond, body, (1, V, AV, theta, res))
+  return EigResult(*_ritz(V, AV, k), i)
+
+
+def lanczos(matvec, n, k, key, n_steps=100):
+  """Top k eigenpairs from up to n_steps steps of Lanczos with full reorthogonalization"""
+  def cond(state):
+    j, Q, alpha, beta, q, b = state
+    return (j < n_steps) & (b > 1e-6 * jnp.max(jnp.abs(alpha)))
+
+  def body(state):
+    j, Q, alpha, beta, q, _ = state
+    Q = Q.at[:, j].set(q)
+    w = matvec(q)
+    alpha = alpha.at[j].set(q @ w)
+    # Orthogonalizing against all the basis vectors (the columns after j are
+    # zero) includes the three-term recurrence; twice is enough in floating point
+    w = w - Q @ (Q.T @ w)
+    w = w - Q @ (Q.T @ w)
+    b = jnp.linalg.norm(w)
+    return j + 1, Q, alpha, beta.at[j].set(b), w / b, b
+
+  v0 = jax.random.normal(key, (n,))
+  init = (0, jnp.zeros((n, n_steps)), jnp.zeros(n_steps), jnp.zeros(n_steps),
+          v0 / jnp.linalg.norm(v0), jnp.ones(()))
+  m, Q, alpha, beta, _, _ = lax.while_loop(cond, body, init)
+  # If the iteration stopped early, put the unused diagonal entries below all
+  # the eigenvalues (by Gershgorin's theorem), so they are not selected
+  used = jnp.arange(n_steps) < m
+  alpha = jnp.where(used, alpha, jnp.min(jnp.where(used, alpha, jnp.inf)) - 2 * jnp.max(beta) - 1)
+  off = jnp.where(jnp.arange(1, n_steps) < m, beta[:-1], 0.)
+  T = jnp.diag(alpha) + jnp.diag(off, 1) + jnp.diag(off, -1)
+  theta, S = jnp.linalg.eigh(T)
+  lams, U = theta[::-1][:k], Q @ S[:, ::-1][:, :k]
+  return EigResult(lams, U, _residuals(matvec, lams, U), m)
+
+
+# + [markdown] id="Kd0rH3nW0PqS"
+# On a small PSD matrix, the three methods find the same top 5 eigenvalues as `jnp.linalg.eigh`. The eigenvalues of this matrix are close together, so power iteration needs many iterations, and can stop at `max_iter` before reaching the tolerance.
+
+# + id="Gx4pL8sE0Rr9"
+np.random.seed(0)
+X = np.random.randn(1000, 500) @ np.diag(np.linspace(0.1, 3, 500))
+A = jnp.array(X.T @ X / 1000)
+matvec = lambda v: A @ v
+key = jax.random.PRNGKey(0)
+k = 5
+
+evals = jnp.linalg.eigh(A)[0][::-1][:k]
+for name, result in [('power + deflation', power_iteration_deflation(matvec, 500, k, key)),
+                     ('subspace', subspace_iteration(matvec, 500, k, key)),
+                     ('lanczos', lanczos(matvec, 500, k, key, n_steps=60))]:
+  print(f'{name}: eigenvalue error {jnp.max(jnp.abs(result.eigenvalues - evals)):.1e}, '
+        f'max residual {jnp.max(result.residuals):.1e}, iterations {result.n_iter}')
+
+
+# + [markdown] id="M3cF8tYw0UxZ"
+# A $10^4 \times 10^4$ covariance matrix, with 20 large eigenvalues, of $N = 5000$ samples. We time the top 10 eigenpairs, from the dense matrix and from the data matrix with `matvec(v)` $= X^T (X v) / N$ (written as `(X @ v) @ X / N`, so that XLA does not transpose $X$), against the full `jnp.linalg.eigh`. Each function is compiled once before timing.
+
+# + id="Bq7yLhZ20WsT"
+def benchmark(f, *args):
+  jax.block_until_ready(f(*args))
+  t0 = time.time()
+  result = jax.block_until_ready(f(*args))
+  return result, time.time() - t0
+
+N, d, k = 5000, 10000, 10
+keys = jax.random.split(jax.random.PRNGKey(1), 3)
+# 20 directions with standard deviations from 10 to 4, plus isotropic noise
+scales = jnp.linspace(10, 4, 20)
+X = ((jax.random.normal(keys[0], (N, 20)) * scales) @ (jax.random.normal(keys[1], (20, d)) / jnp.sqrt(d))
+     + jax.random.normal(keys[2], (N, d)))
+C = X.T @ X / N
+
+evals, evecs = benchmark(jit(jnp.linalg.eigh), C)[0]
+rows = [{'method': 'eigh', 'matvec': 'dense', 'time (s)': benchmark(jit(jnp.linalg.eigh), C)[1]}]
+key = jax.random.PRNGKey(0)
+solvers = {
+  'power + deflation': lambda matvec: power_iteration_deflation(matvec, d, k, key, max_iter=500, tol=1e-4),
+  'subspace': lambda matvec: subspace_iteration(matvec, d, k, key, tol=1e-4),
+  'lanczos': lambda matvec: lanczos(matvec, d, k, key, n_steps=60),
+}
+for name, solver in solvers.items():
+  for kind, f in [('dense', jit(lambda C: solver(lambda v: C @ v))),
+                  ('data', jit(lambda X: solver(lambda v: (X @ v) @ X / N)))]:
+    result, elapsed = benchmark(f, C if kind == 'dense' else X)
+    rows.append({'method': name, 'matvec': kind, 'time (s)': elapsed,
+                 'eigenvalue error': float(jnp.max(jnp.abs(result.eigenvalues - evals[::-1][:k]))),
+                 'max residual': float(jnp.max(result.residuals)),
+                 'iterations': int(jnp.max(result.n_iter))})
+pd.DataFrame(rows)
+
 # + [markdown] id="WzDG4o8_wKys"
 # ## Singular value decomposition (SVD) <a class="anchor" id="SVD"></a>
 
@@ -1011,5 +1189,155 @@ for (method, soln) in zip(methods, solns):
     print(soln.T)
     print('\n')
 
+# + [markdown] id="tuoHD3-f79b_"
+# ### Choosing a least squares method
+#
+# The methods above trade speed for accuracy. For $A$ of size $m \times n$ with $m \ge n$ and condition number $\kappa$:
+#
+# * **Cholesky on the normal equations** $A^T A x = A^T b$ costs $m n^2 + n^3 / 3$ flops, the least, but squares the condition number, so the relative error is about $\kappa^2 \epsilon$, where $\epsilon$ is the machine precision.
+# * **QR** costs $2 m n^2$ flops, with an error of about $\kappa \epsilon$.
+# * **SVD** costs several times more, but it can also drop the singular values below $\text{rcond} \cdot \sigma_1$, which gives a stable solution even when $A$ is (numerically) rank deficient, and the minimum norm solution when $m < n$.
+#
+# `lstsq` below chooses between them. It always computes $A^T A$ and its Cholesky factor, and uses them to estimate $\kappa(A)^2 = \lambda_{max}(A^T A) / \lambda_{min}(A^T A)$, with a few steps of power iteration for $\lambda_{max}$ and of inverse iteration (two triangular solves per step) for $\lambda_{min}$. It then uses the Cholesky factor if $\kappa < \epsilon^{-1/4}$ (so that $\kappa^2 \epsilon < \sqrt{\epsilon}$), QR if $\kappa < \epsilon^{-1/2}$, and the SVD otherwise, or if the factorization fails. The choice is made on the device with `lax.switch`, so `lstsq` can be jitted. $B$ can have several columns, one per right hand side, and a batch of problems can be solved with `vmap`; note that under `vmap` the switch evaluates all the branches.
+#
+# For tall and skinny problems that do not fit in memory, `lstsq_tsqr` reads the rows in blocks, and keeps only the $R$ factor of the QR decomposition of $[A \; B]$ (TSQR). After each block, $[R; A_i \; B_i]$ is reduced to a new triangular factor. At the end, the top-left block of $R$ is the $R$ of $A$, the top-right block is $Q^T B$, and the bottom-right block gives the norms of the residuals.
+
+# + id="yR1kTgx0wKzf"
+from functools import partial
+
+LSTSQ_METHODS = ('cholesky', 'qr', 'svd')
+
+def lstsq_cholesky(A, B, L=None):
+  if L is None:
+    L = jnp.linalg.cholesky(A.T @ A)
+  return jax.scipy.linalg.cho_solve((L, True), A.T @ B)
+
+def lstsq_qr(A, B):
+  Q, R = jnp.linalg.qr(A)
+  return jax.scipy.linalg.solve_triangular(R, Q.T @ B)
+
+def lstsq_svd(A, B, rcond=None):
+  U, s, Vt = jnp.linalg.svd(A, full_matrices=False)
+  if rcond is None:
+    rcond = jnp.finfo(A.dtype).eps * min(A.shape)
+  s_inv = jnp.where(s > rcond * s[0], 1 / s, 0.)
+  if B.ndim > 1:
+    s_inv = s_inv[:, None]
+  return Vt.T @ (s_inv * (U.T @ B))
+
+def estimate_cond(L, n_iter=10):
+  """Estimated condition number of A, from the Cholesky factor L of A^T A"""
+  G = L @ L.T
+  v = jnp.ones(len(L)) / jnp.sqrt(len(L))
+  def power(i, u):
+    u = G @ u
+    return u / jnp.linalg.norm(u)
+  def inverse(i, u):
+    u = jax.scipy.linalg.cho_solve((L, True), u)
+    return u / jnp.linalg.norm(u)
+  u_max = lax.fori_loop(0, n_iter, power, v)
+  u_min = lax.fori_loop(0, n_iter, inverse, v)
+  cond2 = (u_max @ G @ u_max) / (u_min @ G @ u_min)
+  return jnp.where(jnp.all(jnp.isfinite(L)), jnp.sqrt(cond2), jnp.inf)
+
+@partial(jit, static_argnames='method')
+def lstsq(A, B, method='auto', rcond=None):
+  """Least squares solution of A X = B, and the index in LSTSQ_METHODS of the method used"""
+  if method != 'auto':
+    solve = {'cholesky': lstsq_cholesky, 'qr': lstsq_qr, 'svd': partial(lstsq_svd, rcond=rcond)}[method]
+    return solve(A, B), LSTSQ_METHODS.index(method)
+  if A.shape[0] < A.shape[1]:
+    # Underdetermined: the minimum norm solution
+    return lstsq_svd(A, B, rcond), 2
+  L = jnp.linalg.cholesky(A.T @ A)
+  cond = estimate_cond(L)
+  eps = jnp.finfo(A.dtype).eps
+  index = jnp.where(cond < eps**-0.25, 0, jnp.where(cond < eps**-0.5, 1, 2))
+  x = lax.switch(index, [lambda: lstsq_cholesky(A, B, L), lambda: lstsq_qr(A, B),
+                         lambda: lstsq_svd(A, B, rcond)])
+  return x, index
+
+
+@jit
+def _tsqr_step(R, A_block, B_block):
+  return jnp.linalg.qr(jnp.vstack([R, jnp.hstack([A_block, B_block])]), mode='r')
+
+def lstsq_tsqr(blocks):
+  """Least squares solution and residual norms from an iterable of row blocks (A_i, B_i)"""
+  R = None
+  for A_block, B_block in blocks:
+    B_block = B_block.reshape(len(B_block), -1)
+    if R is None:
+      n = A_block.shape[1]
+      R = jnp.zeros((n + B_block.shape[1],) * 2, A_block.dtype)
+    R = _tsqr_step(R, A_block, B_block)
+  if R is None:
+    raise ValueError("lstsq_tsqr needs at least one block of rows")
+  x = jax.scipy.linalg.solve_triangular(R[:n, :n], R[:n, n:])
+  residuals = jnp.linalg.norm(R[n:, n:], axis=0)
+  return x, residuals
+
+
+# + [markdown] id="h8RkzA3bwKzg"
+# On the small problem above, `lstsq` uses the normal equations, and gives the same solution as QR. A batch of problems, each with several right hand sides, is solved with `vmap`.
+
+# + id="mPz6L2xkwKzh"
+x, index = lstsq(A, b)
+print(LSTSQ_METHODS[int(index)], x, qr_solve(A, b))
+
+keys = jax.random.split(jax.random.PRNGKey(0), 2)
+As = jax.random.normal(keys[0], (8, 100, 10))
+Bs = jax.random.normal(keys[1], (8, 100, 3))
+Xs, indices = vmap(lstsq)(As, Bs)
+print(Xs.shape, indices)
+print(jnp.allclose(Xs[0], lstsq_qr(As[0], Bs[0]), atol=1e-4))
+
+# + [markdown] id="T0bZr1jrwKzi"
+# A problem with $10^7$ rows and 20 columns, generated in blocks of $10^5$ rows and solved with TSQR, without ever storing $A$.
+
+# + id="zq3fHk6EwKzj"
+n_rows, n_cols, block_size = 10**7, 20, 10**5
+x_true = jnp.arange(1., n_cols + 1)
+
+def make_blocks(seed=0):
+  key = jax.random.PRNGKey(seed)
+  for start in range(0, n_rows, block_size):
+    key, k1, k2 = jax.random.split(key, 3)
+    A_block = jax.random.normal(k1, (block_size, n_cols))
+    yield A_block, A_block @ x_true + 0.1 * jax.random.normal(k2, (block_size,))
+
+t0 = time.time()
+x, residuals = lstsq_tsqr(make_blocks())
+print(f'{time.time() - t0:.1f}s, max error {jnp.max(jnp.abs(x[:, 0] - x_true)):.1e}, '
+      f'residual rms {residuals[0] / jnp.sqrt(n_rows):.3f}')
+
+
+# + [markdown] id="Lq2vCw8HwKzk"
+# Time and accuracy of each method, for random problems with a given condition number: $A = U \text{diag}(s) V^T$ with random orthonormal $U$ and $V$, and singular values $s$ spaced logarithmically between 1 and $1 / \kappa$, and $b = A x^*$. We report the relative error of the solution, $\|x - x^*\| / \|x^*\|$, and the relative residual $\|A x - b\| / \|b\|$, in single precision ($\epsilon \approx 10^{-7}$), for which `lstsq` uses the normal equations up to $\kappa \approx 50$ and QR up to $\kappa \approx 3000$. With $\kappa = 10^6$, $\kappa \epsilon \approx 0.1$, and the SVD drops the smallest singular values: the solution is further from $x^*$, but it does not amplify the noise of $b$ in those directions by up to $\kappa$, as QR would.
+
+# + id="WfG8nYH3wKzl"
+def make_problem(key, m, n, cond):
+  k1, k2, k3 = jax.random.split(key, 3)
+  U, _ = jnp.linalg.qr(jax.random.normal(k1, (m, n)))
+  V, _ = jnp.linalg.qr(jax.random.normal(k2, (n, n)))
+  A = (U * jnp.logspace(0, -jnp.log10(cond), n)) @ V.T
+  x = jax.random.normal(k3, (n,))
+  return A, x, A @ x
+
+rows = []
+for m, n in [(1000, 50), (10000, 100), (100000, 200)]:
+  for cond in [1e1, 1e3, 1e6]:
+    A_, x_, b_ = make_problem(jax.random.PRNGKey(0), m, n, cond)
+    for method in ['auto'] + list(LSTSQ_METHODS):
+      jax.block_until_ready(lstsq(A_, b_, method=method))
+      t0 = time.time()
+      x, index = jax.block_until_ready(lstsq(A_, b_, method=method))
+      elapsed = time.time() - t0
+      rows.append({'m': m, 'n': n, 'cond': cond, 'method': method, 'used': LSTSQ_METHODS[int(index)],
+                   'time (ms)': 1000 * elapsed,
+                   'error': float(jnp.linalg.norm(x - x_) / jnp.linalg.norm(x_)),
+                   'residual': float(jnp.linalg.norm(A_ @ x - b_) / jnp.linalg.norm(b_))})
+pd.DataFrame(rows)
+
 # + id="lYBi9w70wKzd"
 
@@ -239,3 +239,386 @@ plt.xlabel('item')
 plt.ylabel('user')
 plt.title('Predcted ratings')
 plt.colorbar()
+
+# + [markdown] id="eKu2x3pQ460g"
+# # A sparse pipeline for large rating datasets
+#
+# The code above builds the dense $6040 \times 3706$ ratings matrix of ml-1m, subtracts the user means densely, and multiplies the factors back into a dense matrix of predictions. This is fine for ml-1m, but the dense matrix of MovieLens-25M has $162541 \times 59047$ entries, about 77 GB in float64, of which only 0.26% are observed ratings.
+#
+# Below we keep the ratings in a sparse CSR matrix throughout:
+#
+# * `read_ratings` parses `ratings.dat` (or the `ratings.csv` of the larger datasets) with the C parser of pandas, instead of splitting every line in Python, and `ratings_to_csr` maps the user and movie ids to rows and columns with `np.unique`.
+# * The centered matrix $R - m 1^T$, where $m$ holds the user means, is dense, but `svds` only needs products with it and its transpose, $(R - m 1^T) v = R v - m (1^T v)$ and $(R - m 1^T)^T u = R^T u - 1 (m^T u)$. We wrap these in a `LinearOperator`, so each product costs $O(\text{nnz} + \text{users} + \text{items})$.
+# * Predictions are computed only for the entries we need, or in blocks of users, never for the whole matrix at once.
+
+# + id="ymz4iyWqtQ6g"
+import io
+import time
+import scipy.sparse as sp
+from scipy.sparse.linalg import LinearOperator
+
+def read_ratings(path):
+  """Read a MovieLens ratings file into arrays of user ids, movie ids and ratings"""
+  names = ['UserID', 'MovieID', 'Rating', 'Timestamp']
+  dtype = {'UserID': np.int64, 'MovieID': np.int64, 'Rating': np.float32, 'Timestamp': np.int64}
+  if path.endswith('.csv'):
+    df = pd.read_csv(path, names=names, header=0, dtype=dtype)
+  else:
+    # The C parser does not support the multi-character separator '::'
+    with open(path, 'rb') as f:
+      data = f.read().replace(b'::', b'\t')
+    df = pd.read_csv(io.BytesIO(data), sep='\t', names=names, header=None, dtype=dtype)
+  return df['UserID'].to_numpy(), df['MovieID'].to_numpy(), df['Rating'].to_numpy()
+
+def ratings_to_csr(user_ids, movie_ids, ratings):
+  """Sparse users x movies matrix, and the user and movie id of every row and column"""
+  row_ids, rows = np.unique(user_ids, return_inverse=True)
+  col_ids, cols = np.unique(movie_ids, return_inverse=True)
+  R = sp.csr_matrix((ratings, (rows, cols)), shape=(len(row_ids), len(col_ids)))
+  return R, row_ids, col_ids
+
+def centered_operator(R, row_offsets):
+  """The matrix R - row_offsets 1^T as a LinearOperator, without forming it"""
+  row_offsets = np.asarray(row_offsets, dtype=np.float64)
+  Rt = R.T.tocsr()
+  def matmat(V):
+    return R @ V - np.outer(row_offsets, V.sum(axis=0))
+  def rmatmat(U):
+    return Rt @ U - np.outer(np.ones(R.shape[1]), row_offsets @ U)
+  return LinearOperator(R.shape, dtype=np.float64,
+                        matvec=lambda v: matmat(v.reshape(-1, 1)).ravel(),
+                        rmatvec=lambda u: rmatmat(u.reshape(-1, 1)).ravel(),
+                        matmat=matmat, rmatmat=rmatmat)
+
+def predict_entries(U, sigma, Vt, row_offsets, rows, cols):
+  """Predicted ratings of the (row, col) pairs only"""
+  return np.einsum('ik,k,ki->i', U[rows], sigma, Vt[:, cols]) + row_offsets[rows]
+
+def frobenius_error(R, U, sigma, Vt, row_offsets, block_size=1024, clip=(0, 5)):
+  """||R - clip(U diag(sigma) Vt + offsets)||_F, computed in blocks of users"""
+  total = 0.
+  for start in range(0, R.shape[0], block_size):
+    s = slice(start, start + block_size)
+    pred = (U[s] * sigma) @ Vt + row_offsets[s, None]
+    np.clip(pred, *clip, out=pred)
+    total += np.sum((R[s].toarray() - pred)**2)
+  return np.sqrt(total)
+
+
+# + [markdown] id="pAwx3rDGzZ1f"
+# On ml-1m the sparse pipeline gives the same factorization as the dense code above. As in the dense code, the user means average over all the movies, with the missing ratings counted as zeros.
+
+# + id="pCftPj2M8BQ9"
+t0 = time.time()
+user_ids, movie_ids, ratings = read_ratings(os.path.join(folder, 'ratings.dat'))
+R_sparse, row_ids, col_ids = ratings_to_csr(user_ids, movie_ids, ratings)
+print(f'read {R_sparse.nnz} ratings in {time.time() - t0:.2f}s')
+
+user_means = np.asarray(R_sparse.sum(axis=1)).ravel() / R_sparse.shape[1]
+t0 = time.time()
+U_sparse, sigma_sparse, Vt_sparse = svds(centered_operator(R_sparse, user_means), k=50)
+print(f'svds in {time.time() - t0:.2f}s')
+
+print('same singular values as the dense code:',
+      np.allclose(sigma_sparse, svds(R_demeaned, k=50)[1]))
+print('sparse matrix: {:.1f} MB, dense matrix: {:.1f} MB'.format(
+    (R_sparse.data.nbytes + R_sparse.indices.nbytes + R_sparse.indptr.nbytes) / 1e6, R.nbytes / 1e6))
+print('error', frobenius_error(R_sparse, U_sparse, sigma_sparse, Vt_sparse, user_means))
+
+# + [markdown] id="Fp6Y0QqZ1LrW"
+# The predicted ratings of a few users, without computing the others.
+
+# + id="e1ti7vfGwpmK"
+rows = np.searchsorted(row_ids, [837, 837, 1])
+cols = np.searchsorted(col_ids, [527, 1, 1])
+print(predict_entries(U_sparse, sigma_sparse, Vt_sparse, user_means, rows, cols))
+
+# + [markdown] id="o9E9ZnXG8qZb"
+# The same pipeline on MovieLens-25M (a 250 MB download). The ratings take about 200 MB in CSR form, and besides them `svds` only stores about a hundred vectors of the size of the users and the movies, so the whole fit needs less than 2 GB of memory.
+
+# + id="NrfoMNCe0bOV"
+# !wget http://files.grouplens.org/datasets/movielens/ml-25m.zip
+# !unzip ml-25m
+folder_25m = 'ml-25m'
+
+t0 = time.time()
+R_25m, row_ids_25m, col_ids_25m = ratings_to_csr(*read_ratings(os.path.join(folder_25m, 'ratings.csv')))
+print(f'read {R_25m.nnz} ratings of {R_25m.shape[0]} users and {R_25m.shape[1]} movies in {time.time() - t0:.1f}s')
+
+user_means_25m = np.asarray(R_25m.sum(axis=1)).ravel() / R_25m.shape[1]
+t0 = time.time()
+U_25m, sigma_25m, Vt_25m = svds(centered_operator(R_25m, user_means_25m), k=50)
+print(f'svds in {time.time() - t0:.1f}s')
+
+
+# + [markdown] id="DOw83ywVTxXR"
+# # Serving top-k recommendations
+#
+# `recommend_movies` sorts the predictions of all the movies for one user, and merges data frames to remove the movies the user has already rated and to look up the titles. To serve many users we precompute everything that does not depend on the query:
+#
+# * the user factors $U \Sigma$ and the item factors $V$, so the scores of a batch of users are one matrix multiply,
+# * the ratings in CSR form, whose rows give the movies each user has rated, which we mask with $-\infty$,
+# * arrays mapping user ids to rows, and columns to movie ids and titles.
+#
+# The top $k$ movies of every user are then found with `np.argpartition` in $O(\text{items})$, and only these $k$ are sorted.
+
+# + id="1W6EoQf1JfR6"
+class TopKRecommender:
+  def __init__(self, U, sigma, Vt, row_offsets, R, row_ids, col_ids, movies_df, dtype=np.float32):
+    self.user_factors = np.ascontiguousarray(U * sigma, dtype=dtype)
+    self.item_factors = np.ascontiguousarray(Vt.T, dtype=dtype)
+    self.row_offsets = np.asarray(row_offsets, dtype=dtype)
+    self.rated = R.tocsr()
+    self.col_ids = np.asarray(col_ids)
+    # user id -> row, with -1 for unknown users
+    self.user_row = np.full(row_ids.max() + 1, -1)
+    self.user_row[row_ids] = np.arange(len(row_ids))
+    titles = movies_df.set_index('MovieID')['Title']
+    self.titles = titles.reindex(self.col_ids).to_numpy()
+
+  def rows(self, user_ids):
+    user_ids = np.asarray(user_ids)
+    known = (user_ids >= 0) & (user_ids < len(self.user_row))
+    rows = np.full(user_ids.shape, -1)
+    rows[known] = self.user_row[user_ids[known]]
+    if np.any(rows < 0):
+      raise KeyError(f'Unknown users {user_ids[rows < 0]}')
+    return rows
+
+  def scores(self, rows):
+    """Predicted ratings of all the movies for a batch of rows, with the rated movies set to -inf"""
+    scores = self.user_factors[rows] @ self.item_factors.T + self.row_offsets[rows, None]
+    rated = self.rated[rows]
+    scores[np.repeat(np.arange(len(rows)), np.diff(rated.indptr)), rated.indices] = -np.inf
+    return scores
+
+  def recommend(self, user_ids, k=10, batch_size=1024):
+    """Movie ids, titles and predicted ratings of the top k unrated movies of every user, best first"""
+    rows = self.rows(np.atleast_1d(user_ids))
+    top = np.empty((len(rows), k), dtype=np.int64)
+    top_scores = np.empty((len(rows), k), dtype=self.user_factors.dtype)
+    for start in range(0, len(rows), batch_size):
+      s = slice(start, start + batch_size)
+      scores = self.scores(rows[s])
+      idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+      idx_scores = np.take_along_axis(scores, idx, axis=1)
+      order = np.argsort(-idx_scores, axis=1)
+      top[s] = np.take_along_axis(idx, order, axis=1)
+      top_scores[s] = np.take_along_axis(idx_scores, order, axis=1)
+    return self.col_ids[top], self.titles[top], top_scores
+
+
+# + [markdown] id="37E9OCb4a0q9"
+# The recommendations for user 837 agree with `recommend_movies` above.
+
+# + id="tqqYpVQtmSw7"
+recommender = TopKRecommender(U_sparse, sigma_sparse, Vt_sparse, user_means, R_sparse,
+                              row_ids, col_ids, movies_df)
+ids, titles, scores = recommender.recommend(837, k=10)
+print(np.array_equal(ids[0], predictions['MovieID'].to_numpy()))
+pd.DataFrame({'MovieID': ids[0], 'Title': titles[0], 'Predictions': scores[0]})
+
+# + [markdown] id="tzNRlFzWWWV0"
+# Throughput when serving all the users in batches.
+
+# + id="JEUuRtxC3YNA"
+for batch_size in [1, 64, 1024]:
+  t0 = time.time()
+  ids, titles, scores = recommender.recommend(row_ids, k=10, batch_size=batch_size)
+  elapsed = time.time() - t0
+  print(f'batch size {batch_size}: {len(row_ids) / elapsed:.0f} users per second')
+
+# + [markdown] id="Z5t45VKXvvrz"
+# # Fitting only the observed ratings: ALS and SGD
+#
+# The SVD above treats every missing rating as a zero, so the factorization spends most of its capacity predicting that users do not watch most movies. Instead, we fit the model
+# $$
+# \hat{r}_{ui} = \mu + b_u + c_i + p_u^T q_i
+# $$
+# to the observed ratings only, by minimizing
+# $$
+# \sum_{(u,i) \text{ observed}} (r_{ui} - \hat{r}_{ui})^2 + \lambda \left( \sum_u n_u (b_u^2 + \|p_u\|^2) + \sum_i n_i (c_i^2 + \|q_i\|^2) \right)
+# $$
+# where $n_u$ and $n_i$ are the numbers of ratings of user $u$ and movie $i$. We use two optimizers:
+#
+# * **Alternating least squares** (ALS). With the movie parameters fixed, the problem separates into one small least squares problem per user, for $(p_u, b_u)$ with features $(q_i, 1)$, and vice versa. For a chunk of users we build the normal equations $(\sum_i y_i y_i^T + \lambda n_u I) x_u = \sum_i r_{ui} y_i$ and solve them all with one batched `np.linalg.solve`. The sums are batched matrix products: the users of the chunk are grouped by their number of ratings, rounded up to a power of two, and the features and ratings of every group are gathered into one zero-padded array. So a chunk costs a handful of numpy calls, whatever its number of users, and the chunks are processed by a thread pool. numpy releases the GIL inside the gathers, the matrix products and the solves, which is almost all the work, so the chunks can run in parallel on several cores.
+# * **Stochastic gradient descent** (SGD), in the lock-free style of Hogwild (Niu et al., 2011). The shuffled ratings are split between the threads, and every thread updates the shared parameters with minibatch gradient steps, without any locking. Since each minibatch only touches a few rows of the parameter matrices, conflicting updates are rare.
+#
+# We hold out 10% of the ratings to measure the RMSE of the predictions, clipped to the range of the ratings.
+
+# + id="1eebrhJNgdnt"
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+class MFModel(NamedTuple):
+  mu: float
+  user_bias: np.ndarray
+  item_bias: np.ndarray
+  P: np.ndarray
+  Q: np.ndarray
+
+def predict_mf(model, rows, cols, clip=(1, 5)):
+  pred = (model.mu + model.user_bias[rows] + model.item_bias[cols]
+          + np.sum(model.P[rows] * model.Q[cols], axis=1))
+  return np.clip(pred, *clip)
+
+def rmse(pred, ratings):
+  return np.sqrt(np.mean((pred - ratings)**2))
+
+def split_ratings(R, test_frac=0.1, seed=0):
+  """Training matrix, and the rows, columns and values of the held-out ratings"""
+  R = R.tocoo()
+  test = np.random.default_rng(seed).random(R.nnz) < test_frac
+  R_train = sp.csr_matrix((R.data[~test], (R.row[~test], R.col[~test])), shape=R.shape)
+  return R_train, (R.row[test], R.col[test], R.data[test])
+
+
+def _row_chunks(indptr, chunk_nnz):
+  # Consecutive blocks of rows with about chunk_nnz entries each
+  bounds = np.searchsorted(indptr, np.arange(0, indptr[-1], chunk_nnz), side='right') - 1
+  bounds = np.unique(np.concatenate([[0], bounds, [len(indptr) - 1]]))
+  return list(zip(bounds[:-1], bounds[1:]))
+
+def _solve_rows(R, targets, Y, lam, start, stop):
+  """Solve min_x sum_i (t_i - x^T y_i)^2 + lam n ||x||^2 for the rows start:stop of R"""
+  indptr = R.indptr[start:stop + 1]
+  counts = np.diff(indptr)
+  f = Y.shape[1]
+  # Features and target of every entry, plus a row of zeros that padding entries point to
+  lo, hi = indptr[0], indptr[-1]
+  Z = np.vstack([np.hstack([Y[R.indices[lo:hi]], targets[lo:hi, None]]), np.zeros(f + 1)])
+  G = np.zeros((len(counts), f + 1, f + 1))
+  # Rows of similar lengths, padded to the next power of two, form one batched matrix product,
+  # whose blocks are the y y^T and t y sums of the normal equations
+  groups = np.ceil(np.log2(np.maximum(counts, 1))).astype(int)
+  for g in np.unique(groups[counts > 0]):
+    rows = np.flatnonzero((groups == g) & (counts > 0))
+    pos = np.arange(2**g)
+    Zg = Z[np.where(pos < counts[rows, None], indptr[rows, None] - lo + pos, hi - lo)]
+    G[rows] = Zg.transpose(0, 2, 1) @ Zg
+  A = G[:, :f, :f] + lam * np.maximum(counts, 1)[:, None, None] * np.eye(f)
+  return np.linalg.solve(A, G[:, :f, f:])[..., 0]
+
+def _als_step(R, targets, Y, lam, executor, chunk_nnz):
+  chunks = _row_chunks(R.indptr, chunk_nnz)
+  return np.concatenate(list(executor.map(lambda c: _solve_rows(R, targets, Y, lam, *c), chunks)))
+
+def fit_als(R, n_factors=20, lam=0.05, n_iters=10, n_workers=1, chunk_nnz=8192, seed=0, callback=None):
+  rng = np.random.default_rng(seed)
+  R = R.tocsr()
+  Rt = R.T.tocsr()
+  n_users, n_items = R.shape
+  mu = R.data.mean()
+  P = 0.1 * rng.normal(size=(n_users, n_factors))
+  Q = 0.1 * rng.normal(size=(n_items, n_factors))
+  user_bias, item_bias = np.zeros(n_users), np.zeros(n_items)
+  with ThreadPoolExecutor(n_workers) as executor:
+    for it in range(n_iters):
+      X = _als_step(R, R.data - mu - item_bias[R.indices], np.hstack([Q, np.ones((n_items, 1))]),
+                    lam, executor, chunk_nnz)
+      P, user_bias = X[:, :-1], X[:, -1]
+      X = _als_step(Rt, Rt.data - mu - user_bias[Rt.indices], np.hstack([P, np.ones((n_users, 1))]),
+                    lam, executor, chunk_nnz)
+      Q, item_bias = X[:, :-1], X[:, -1]
+      if callback is not None:
+        callback(it, MFModel(mu, user_bias, item_bias, P, Q))
+  return MFModel(mu, user_bias, item_bias, P, Q)
+
+
+def fit_sgd(R, n_factors=20, lr=0.01, lam=0.02, n_epochs=20, batch_size=256, n_workers=1,
+            seed=0, callback=None):
+  rng = np.random.default_rng(seed)
+  R = R.tocoo()
+  n_users, n_items = R.shape
+  mu = R.data.mean()
+  P = 0.1 * rng.normal(size=(n_users, n_factors))
+  Q = 0.1 * rng.normal(size=(n_items, n_factors))
+  user_bias, item_bias = np.zeros(n_users), np.zeros(n_items)
+
+  def run_shard(shard):
+    # Updates the shared parameters in place, without locks
+    for s in range(0, len(shard), batch_size):
+      batch = shard[s:s + batch_size]
+      u, i, r = R.row[batch], R.col[batch], R.data[batch]
+      pu, qi = P[u], Q[i]
+      err = r - (mu + user_bias[u] + item_bias[i] + np.sum(pu * qi, axis=1))
+      np.add.at(user_bias, u, lr * (err - lam * user_bias[u]))
+      np.add.at(item_bias, i, lr * (err - lam * item_bias[i]))
+      np.add.at(P, u, lr * (err[:, None] * qi - lam * pu))
+      np.add.at(Q, i, lr * (err[:, None] * pu - lam * qi))
+
+  with ThreadPoolExecutor(n_workers) as executor:
+    for epoch in range(n_epochs):
+      shards = np.array_split(rng.permutation(R.nnz), n_workers)
+      list(executor.map(run_shard, shards))
+      if callback is not None:
+        callback(epoch, MFModel(mu, user_bias, item_bias, P, Q))
+  return MFModel(mu, user_bias, item_bias, P, Q)
+
+
+# + [markdown] id="k4i430bH-yU9"
+# Held-out RMSE of ALS and SGD after every iteration, compared with the truncated SVD of the zero-filled matrix used above, fitted on the same training ratings.
+
+# + id="RSUSZCqUk_7K"
+R_train, (test_rows, test_cols, test_ratings) = split_ratings(R_sparse)
+
+train_means = np.asarray(R_train.sum(axis=1)).ravel() / R_train.shape[1]
+U_train, sigma_train, Vt_train = svds(centered_operator(R_train, train_means), k=50)
+svd_rmse = rmse(np.clip(predict_entries(U_train, sigma_train, Vt_train, train_means, test_rows, test_cols), 1, 5),
+                test_ratings)
+print('svds baseline', svd_rmse)
+
+history = {'ALS': [], 'SGD': []}
+def log_rmse(name):
+  return lambda it, model: history[name].append(rmse(predict_mf(model, test_rows, test_cols), test_ratings))
+
+t0 = time.time()
+als_model = fit_als(R_train, n_iters=10, callback=log_rmse('ALS'))
+print(f'ALS: {time.time() - t0:.1f}s, RMSE {history["ALS"][-1]:.4f}')
+t0 = time.time()
+sgd_model = fit_sgd(R_train, n_epochs=20, callback=log_rmse('SGD'))
+print(f'SGD: {time.time() - t0:.1f}s, RMSE {history["SGD"][-1]:.4f}')
+
+plt.figure()
+for name, errors in history.items():
+  plt.plot(np.arange(1, len(errors) + 1), errors, label=name)
+plt.axhline(svd_rmse, color='k', linestyle='--', label='svds of the zero-filled matrix')
+plt.xlabel('iteration')
+plt.ylabel('held-out RMSE')
+plt.legend()
+plt.show()
+
+# + [markdown] id="fC41_wX0Ds6X"
+# For comparison, the SVD algorithm of the Surprise library (see `matrix_factorization_recommender_surprise_lib.ipynb`), which is also a biased matrix factorization fitted with SGD, trained and evaluated on the same split.
+
+# + id="64irekB8GJPs"
+# !pip install surprise
+from surprise import SVD, Dataset, Reader
+
+train_coo = R_train.tocoo()
+train_df = pd.DataFrame({'UserID': train_coo.row, 'MovieID': train_coo.col, 'Rating': train_coo.data})
+trainset = Dataset.load_from_df(train_df, Reader(rating_scale=(1, 5))).build_full_trainset()
+t0 = time.time()
+algo = SVD(n_factors=20, n_epochs=20, random_state=0)
+algo.fit(trainset)
+surprise_pred = np.array([algo.predict(u, i).est for u, i in zip(test_rows, test_cols)])
+print(f'Surprise SVD: {time.time() - t0:.1f}s, RMSE {rmse(surprise_pred, test_ratings):.4f}')
+
+# + [markdown] id="ZnpC6HWVS0P7"
+# Wall-clock time of 5 iterations of ALS and 5 epochs of SGD with 1 to 8 threads. Neither can speed up beyond the number of cores of the machine, printed first. ALS can use them, since it spends almost all its time in numpy calls that release the GIL. SGD cannot: every minibatch step is a few small numpy calls driven by a Python loop, and `np.add.at` does not release the GIL, so its threads mostly take turns. Hogwild is shown here for its lock-free updates, which pay off when the updates run outside the interpreter, not for its speedup in CPython.
+
+# + id="1m4G_RUG_4gM"
+print('cores', os.cpu_count())
+rows = []
+for n_workers in [1, 2, 4, 8]:
+  t0 = time.time()
+  fit_als(R_train, n_iters=5, n_workers=n_workers)
+  als_time = time.time() - t0
+  t0 = time.time()
+  fit_sgd(R_train, n_epochs=5, n_workers=n_workers, batch_size=4096)
+  sgd_time = time.time() - t0
+  rows.append({'threads': n_workers, 'ALS (s)': als_time, 'SGD (s)': sgd_time})
+scaling = pd.DataFrame(rows)
+scaling['ALS speedup'] = scaling['ALS (s)'][0] / scaling['ALS (s)']
+scaling['SGD speedup'] = scaling['SGD (s)'][0] / scaling['SGD (s)']
+scaling
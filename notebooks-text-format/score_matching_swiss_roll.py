@@ -280,5 +280,122 @@ plt.tight_layout()
 plt.savefig('langevin_swiss_roll.png')
 plt.show()
 
+# + [markdown] id="Qm3Rb8TzV1cK"
+# # Sampling many particles at once
+#
+# `sample_langevin` runs one particle at a time, in a Python loop, and keeps every state. `sample_langevin_chains` below runs the same updates
+# $$
+# x_{t+1} = x_t + \frac{\epsilon_t}{2} s_\theta(x_t) + \sqrt{\epsilon_t} \, T z_t, \quad \epsilon_t = \epsilon_0 \gamma^t, \quad z_t \sim N(0, I),
+# $$
+# with the geometric schedule of step sizes (and so of noise levels) computed up front, for a whole batch of particles: the update of one particle is `vmap`ped over the particles, and the steps are a `lax.scan`, so the sampler compiles into a single function. Only every `thin`-th state is stored (with `thin=num_steps`, only the initial and final states), so the memory does not grow with the number of steps.
+#
+# With `mala=True` the update is used as the proposal of a Metropolis-Hastings step (MALA), which targets $p(x)^{1/T^2}$ exactly rather than up to the discretization error. The acceptance probability needs $\log p(x') - \log p(x)$, but the network only gives the score $s_\theta = \nabla \log p$. We therefore integrate the score along the segment from $x$ to $x'$,
+# $$
+# \log p(x') - \log p(x) = \int_0^1 s_\theta(x + \tau (x' - x)) \cdot (x' - x) \, d\tau,
+# $$
+# with Gauss-Legendre quadrature. This is exact only if the learned score is a gradient field, which the network does not enforce, but it is accurate for small steps.
+
+# + id="Fh8wXk2nTb6P"
+def langevin_step_sizes(eps, eps_decay, num_steps):
+    """Geometric schedule of step sizes eps * eps_decay**t"""
+    return eps * eps_decay ** jnp.arange(num_steps)
+
+
+def _log_density_difference(score, x, x_new, nodes, weights):
+    """log p(x_new) - log p(x), by quadrature of the score along the segment"""
+    points = x + nodes[:, None] * (x_new - x)
+    return jnp.sum(weights * (score(points) @ (x_new - x)))
+
+
+@partial(jax.jit, static_argnames=('num_steps', 'thin', 'mala', 'num_nodes'))
+def sample_langevin_chains(x_initial, *, net_params, key, eps=1e-2, eps_decay=0.9, num_steps=15, temperature=1.0,
+                           thin=1, mala=False, num_nodes=4):
+    """Langevin dynamics for particles x_initial of shape (n, d). Returns every thin-th state,
+    with shape (num_steps // thin + 1, n, d), and the acceptance rate of every step"""
+    assert num_steps % thin == 0, 'num_steps must be a multiple of thin'
+    score = partial(net_apply, net_params)
+    # Gauss-Legendre nodes and weights on [0, 1]
+    nodes, weights = np.polynomial.legendre.leggauss(num_nodes)
+    nodes, weights = (nodes + 1) / 2, weights / 2
+
+    def particle_step(x, eps, key):
+        key_z, key_u = jax.random.split(key)
+        s = score(x)
+        x_new = x + eps / 2 * s + jnp.sqrt(eps) * temperature * jax.random.normal(key_z, x.shape)
+        if not mala:
+            return x_new, 1.
+        s_new = score(x_new)
+        # log q(x | x_new) - log q(x_new | x), for the Gaussian proposal
+        log_q_ratio = (jnp.sum(jnp.square(x_new - x - eps / 2 * s))
+                       - jnp.sum(jnp.square(x - x_new - eps / 2 * s_new))) / (2 * eps * temperature**2)
+        log_ratio = _log_density_difference(score, x, x_new, nodes, weights) / temperature**2 + log_q_ratio
+        accept = jnp.log(jax.random.uniform(key_u)) < log_ratio
+        return jnp.where(accept, x_new, x), accept.astype(jnp.float32)
+
+    def step(x, inputs):
+        eps, key = inputs
+        x, accepted = jax.vmap(particle_step, in_axes=(0, None, 0))(x, eps, jax.random.split(key, len(x)))
+        return x, accepted.mean()
+
+    def thinned_steps(x, inputs):
+        x, acceptance = jax.lax.scan(step, x, inputs)
+        return x, (x, acceptance)
+
+    step_sizes = langevin_step_sizes(eps, eps_decay, num_steps).reshape(-1, thin)
+    keys = jax.random.split(key, num_steps).reshape(num_steps // thin, thin, -1)
+    _, (states, acceptance) = jax.lax.scan(thinned_steps, x_initial, (step_sizes, keys))
+    return jnp.concatenate([x_initial[None], states]), acceptance.reshape(-1)
+
+
+# + [markdown] id="Hw4cLr8pZe2N"
+# $10^5$ particles, started uniformly on the square, after 300 steps with step sizes decaying from $10^{-2}$ to $10^{-4}$, storing only the final states. We time the compilation and the sampling separately. The samples follow the density of the learned score, which is smoother than that of the data, so they cover the roll but do not trace it closely.
+
+# + id="Jd9nKs3yXq7V"
+import time
+
+n_particles, num_steps = 10**5, 300
+key, key_init, key_sample = jax.random.split(jax.random.PRNGKey(0), 3)
+x_initial = jax.random.uniform(key_init, (n_particles, 2), minval=-1.5, maxval=1.5)
+sampler_args = dict(net_params=net_params, key=key_sample, eps=1e-2, eps_decay=1e-2 ** (1 / num_steps),
+                    num_steps=num_steps, thin=num_steps)
+
+t0 = time.time()
+jax.block_until_ready(sample_langevin_chains(x_initial, **sampler_args))
+t1 = time.time()
+states, _ = jax.block_until_ready(sample_langevin_chains(x_initial, **sampler_args))
+t2 = time.time()
+print(f'compile and sample: {t1 - t0:.1f}s, sample: {t2 - t1:.1f}s, stored states: {states.shape}')
+
+plt.figure(figsize=[16, 8])
+plt.subplot(1, 2, 1)
+plt.title('data')
+plt.scatter(*sample_batch(n_particles).T, s=1, alpha=0.05)
+plt.xlim(-1.5, 1.5)
+plt.ylim(-1.5, 1.5)
+plt.subplot(1, 2, 2)
+plt.title('Langevin samples')
+plt.scatter(*states[-1].T, s=1, alpha=0.05)
+plt.xlim(-1.5, 1.5)
+plt.ylim(-1.5, 1.5)
+plt.show()
+
+# + [markdown] id="Ke5tRn1mYc8Q"
+# With a constant step size of $1$, the unadjusted updates overshoot, and the samples spread far from the roll. The Metropolis adjustment rejects about half of the moves, and keeps the samples where the small step sizes put them. We run $10^4$ particles for 300 steps, storing every 100th state. The acceptance rate is close to $1$ for the step sizes used above, where the adjustment changes little.
+
+# + id="Lp3vCx9nWa2E"
+plt.figure(figsize=[16, 8])
+for i, mala in enumerate([False, True]):
+    mala_states, acceptance = sample_langevin_chains(x_initial[:10**4], net_params=net_params, key=key_sample, eps=1.,
+                                                     eps_decay=1., num_steps=num_steps, thin=100, mala=mala)
+    print(f'mala={mala}: stored states {mala_states.shape}, mean acceptance rate {acceptance.mean():.3f}, '
+          f'standard deviation of the samples {mala_states[-1].std():.2f}')
+    plt.subplot(1, 2, i + 1)
+    plt.title('MALA' if mala else 'unadjusted Langevin')
+    plt.scatter(*mala_states[-1].T, s=1, alpha=0.2)
+    plt.xlim(-4, 4)
+    plt.ylim(-4, 4)
+plt.show()
+
+
 # + colab={"base_uri": "https://localhost:8080/", "height": 33} id="6jhP-yF5QD0B" outputId="c821a148-722a-4e97-9206-627b8391ac67"
 
@@ -256,5 +256,159 @@ for proposal in proposals:
 
 
 
+# + [markdown] id="s6U7sE_DIhXf"
+# # Vectorized annealing with parallel tempering
+#
+# `sim_anneal` runs a single chain with a scalar Python loop and grows `x_hist` with `np.vstack` at every step, which is quadratic in the number of steps. Below we run many chains at once as arrays. The chains are arranged on a ladder of temperatures, shape `(n_temps, n_chains)`, and every `swap_every` steps neighbouring temperatures try to exchange their states (replica exchange). A swap between states $x_i$ at temperature $T_i$ and $x_j$ at $T_j$ is accepted with probability
+# $$
+# \min\left(1, \exp\left((\mathcal{E}(x_i) - \mathcal{E}(x_j))(1/T_i - 1/T_j)\right)\right)
+# $$
+# which leaves the joint distribution of all replicas invariant. The whole ladder is multiplied by a cooling schedule, a function of the step number, so a constant schedule gives plain parallel tempering and a single temperature gives vectorized simulated annealing.
+#
+# The energy can be a grid, like `energy` above, in which case the states are integer indices into the grid, or a vectorized function of continuous states together with their bounds. The history buffers are preallocated and only filled every `record_every` steps.
+
+# + id="tLao1nRR0wbV"
+def exponential_schedule(alpha):
+  return lambda t: alpha ** t
+
+def logarithmic_schedule(c=1.):
+  return lambda t: 1. / (1. + c * np.log1p(t))
+
+def constant_schedule():
+  return lambda t: 1.
+
+def parallel_tempering_anneal(energy, temps, n_chains=100, n_steps=1000, proposal='gaussian',
+                              sigma=10, schedule=None, swap_every=10, record_every=1,
+                              bounds=None, seed=42):
+  rng = np.random.default_rng(seed)
+  temps = np.asarray(temps, dtype=float)
+  n_temps = len(temps)
+  schedule = schedule if schedule is not None else constant_schedule()
+  if callable(energy):
+    energy_fn, discrete = energy, False
+    lo, hi = np.asarray(bounds, dtype=float).T
+  else:
+    grid = np.asarray(energy)
+    energy_fn = lambda x: grid[tuple(np.moveaxis(x, -1, 0))]
+    discrete = True
+    lo, hi = np.zeros(grid.ndim), np.array(grid.shape) - 1.
+  dim = len(lo)
+  shape = (n_temps, n_chains, dim)
+
+  def propose(x):
+    if callable(proposal):
+      return proposal(rng, x)
+    if proposal == 'uniform':
+      xnew = rng.uniform(lo, hi + discrete, size=shape)
+    elif proposal == 'gaussian':
+      xnew = np.clip(x + rng.normal(size=shape) * sigma, lo, hi)
+    else:
+      raise ValueError('Unknown proposal')
+    return xnew.astype(int) if discrete else xnew
+
+  xcur = rng.uniform(lo, hi + discrete, size=shape)
+  xcur = xcur.astype(int) if discrete else xcur
+  Ecur = energy_fn(xcur)
+
+  n_records = n_steps // record_every
+  x_hist = np.empty((n_records,) + shape, dtype=xcur.dtype)
+  energy_hist = np.empty((n_records, n_temps, n_chains))
+  temp_hist = np.empty((n_records, n_temps))
+  naccept = np.zeros(n_temps)
+  nswap_proposed = np.zeros(n_temps - 1)
+  nswap_accept = np.zeros(n_temps - 1)
+  best_x, best_energy = xcur[0, 0].copy(), np.inf
+
+  for t in range(n_steps):
+    T = temps * schedule(t)
+    xnew = propose(xcur)
+    Enew = energy_fn(xnew)
+    accept = np.log(rng.uniform(size=(n_temps, n_chains))) <= -(Enew - Ecur) / T[:, None]
+    xcur = np.where(accept[..., None], xnew, xcur)
+    Ecur = np.where(accept, Enew, Ecur)
+    naccept += accept.sum(axis=1)
+
+    if n_temps > 1 and (t + 1) % swap_every == 0:
+      # Alternate between the even and the odd pairs of neighbouring temperatures
+      i = np.arange((t // swap_every) % 2, n_temps - 1, 2)
+      j = i + 1
+      log_ratio = (Ecur[i] - Ecur[j]) * (1. / T[i] - 1. / T[j])[:, None]
+      swap = np.log(rng.uniform(size=log_ratio.shape)) <= log_ratio
+      xi, xj = xcur[i], xcur[j]
+      xcur[i], xcur[j] = np.where(swap[..., None], xj, xi), np.where(swap[..., None], xi, xj)
+      Ei, Ej = Ecur[i], Ecur[j]
+      Ecur[i], Ecur[j] = np.where(swap, Ej, Ei), np.where(swap, Ei, Ej)
+      nswap_proposed[i] += n_chains
+      nswap_accept[i] += swap.sum(axis=1)
+
+    k = np.unravel_index(np.argmin(Ecur), Ecur.shape)
+    if Ecur[k] < best_energy:
+      best_x, best_energy = xcur[k].copy(), Ecur[k]
+    if (t + 1) % record_every == 0:
+      r = t // record_every
+      x_hist[r], energy_hist[r], temp_hist[r] = xcur, Ecur, T
+
+  return {'x_hist': x_hist, 'energy_hist': energy_hist, 'temp_hist': temp_hist,
+          'x': xcur, 'energy': Ecur, 'best_x': best_x, 'best_energy': best_energy,
+          'accept_rate': naccept / (n_steps * n_chains),
+          'swap_rate': nswap_accept / np.maximum(nswap_proposed, 1)}
+
+
+# + [markdown] id="Rsl5DO8HWthK"
+# With a single temperature, a single chain and the same exponential cooling this is the experiment above, but the history is preallocated.
+
+# + id="ylM9bph_3r1s"
+res = parallel_tempering_anneal(energy, temps=[1.], n_chains=1, n_steps=300,
+                                schedule=exponential_schedule(0.99))
+print('acceptance rate', res['accept_rate'], 'best pdf value', pdf[tuple(res['best_x'])])
+
+# + [markdown] id="DYiGeGzoW84E"
+# Parallel tempering with 8 temperatures and 1000 chains per temperature, and a mild cooling of the whole ladder. We report the acceptance rates per temperature, the swap acceptance rates between neighbouring temperatures, and the throughput in proposals per second.
+
+# + id="26JB2ForMRQA"
+import time
+
+temps = np.geomspace(0.05, 5., 8)
+t0 = time.time()
+res = parallel_tempering_anneal(energy, temps=temps, n_chains=1000, n_steps=2000, sigma=5,
+                                schedule=exponential_schedule(0.999), record_every=20)
+elapsed = time.time() - t0
+print(f'{len(temps) * 1000 * 2000 / elapsed:.3g} proposals per second')
+for T, a in zip(temps, res['accept_rate']):
+  print(f'T={T:.3f}  acceptance rate {a:.3f}')
+print('swap rates', np.round(res['swap_rate'], 3))
+
+ind = np.unravel_index(np.argmax(pdf, axis=None), pdf.shape)
+coldest = res['x'][0]
+print('best state', res['best_x'], 'global max', ind)
+print('fraction of coldest chains at the global max',
+      np.mean(np.all(np.abs(coldest - np.array(ind)) <= 2, axis=1)))
+
+# + id="gyw_myuLzjtm"
+f1, ax = plt.subplots()
+ax.imshow(pdf.transpose(), aspect='auto', extent=[0,100,100,0], interpolation='none')
+ax.plot(res['x'][-1, :, 0], res['x'][-1, :, 1], 'w+', alpha=0.3, label=f'T={temps[-1]:.2f}')
+ax.plot(coldest[:, 0], coldest[:, 1], 'k+', label=f'T={temps[0]:.2f}')
+ax.plot(ind[0], ind[1], 'ro', markersize=10)
+ax.legend()
+plt.tight_layout()
+pml.savefig('sim_anneal_2d_parallel_tempering.pdf')
+plt.show()
+
+
+# + [markdown] id="Q1KffQJTIjnp"
+# The energy can also be any vectorized function. Here is the continuous version of the peaks energy on $[-3, 3]^2$.
+
+# + id="EvRraHsJQm8E"
+def peaks_energy(z):
+  x, y = z[..., 0], z[..., 1]
+  p = (3.*(1-x)**2*np.exp(-(x**2)-(y+1)**2) - 10.*(x/5-x**3-y**5)*np.exp(-x**2-y**2)
+       - 1./3*np.exp(-(x+1)**2-y**2))
+  return -np.log(np.abs(p))
+
+res = parallel_tempering_anneal(peaks_energy, temps=np.geomspace(0.05, 5., 8), n_chains=1000,
+                                n_steps=1000, sigma=0.2, bounds=[(-3, 3), (-3, 3)], record_every=10)
+print('best state', res['best_x'], 'energy', res['best_energy'])
+
 # + id="XDM1SEc9dCKk"
 
@@ -57,8 +57,8 @@ def sinkhorn_knopp_np(M, r, c, lam, niter=100000):
   P /= P.sum()
   # normalize this matrix
   for i in trange(niter):
-      P *= (r / P.sum(1))
-      P *= (c / P.sum(0))
+      P *= (r / P.sum(1)).reshape((-1, 1))
+      P *= (c / P.sum(0)).reshape((1, -1))
   return P, np.sum(P * M)
 
 
@@ -85,6 +85,282 @@ P, d = sinkhorn_knopp_jax(M, r, c, lam=30, niter=1000)
 # + colab={"base_uri": "https://localhost:8080/", "height": 66, "referenced_widgets": ["55ca0aa0edbd4e1389460d0ad335ef7f", "71f6e7139e96400bbe3bc543f30d785d", "91dffb97288f45d2b182d82ea8ac3100", "f0ad9d6fe1b44a37b07e105f2883810e", "a117a60496f24216a86da919372df79f", "f6c14dceebcc4f4792f276530be23eb9", "8a1fad5c8f90416691d9ebdbb533a602", "d26b39c75ca940b2910d71198f6df47e"]} id="o9_6tRbr5BVm" outputId="e4d66dd9-bc24-44ea-8cf1-4f9fd02100f3"
 P, d = sinkhorn_knopp_np(M, r, c, lam=30, niter=1000)
 
+# + [markdown] id="gWeBbZ9CHLAR"
+# # Log-domain Sinkhorn with a compiled fixed-point loop
+#
+# The implementations above have two problems. First, they drive every iteration from Python, so `niter=1000` means 1000 round trips between the host and the device. Second, they work with $P = \exp(-\lambda M)$ directly, which underflows to zero as soon as $\lambda M_{ij}$ is larger than about 100 (float32) or 700 (float64).
+#
+# Instead we keep two log-domain scaling vectors $f \in \mathbb{R}^n$ and $g \in \mathbb{R}^m$ such that
+# $$
+# P_{ij} = \exp(f_i + g_j - \lambda M_{ij})
+# $$
+# and alternate the updates
+# $$
+# f_i = \log r_i - \log \sum_j \exp(g_j - \lambda M_{ij}), \qquad
+# g_j = \log c_j - \log \sum_i \exp(f_i - \lambda M_{ij})
+# $$
+# using `logsumexp`, so no intermediate ever underflows. The whole fixed-point iteration runs inside a single `lax.while_loop`, which stops as soon as the L1 error of the row marginals drops below `tol` (the column marginals are exact after every $g$ update).
+
+# + id="NVjwBqghMluA"
+from functools import partial
+from typing import NamedTuple
+
+from jax import lax, vmap
+from jax.scipy.special import logsumexp
+
+
+class SinkhornResult(NamedTuple):
+  f: jnp.ndarray  # log row scalings, shape (n,)
+  g: jnp.ndarray  # log column scalings, shape (m,)
+  cost: jnp.ndarray  # transport cost sum(P * M)
+  n_iter: jnp.ndarray  # number of iterations performed
+  err: jnp.ndarray  # L1 error of the row marginals
+
+
+def sinkhorn_plan(M, f, g, lam):
+  """Materialize the transport plan from the log scalings."""
+  return jnp.exp(f[:, None] + g[None, :] - lam * M)
+
+
+@partial(jit, static_argnames=("max_iter",))
+def sinkhorn_log(M, r, c, lam, tol=1e-6, max_iter=10000, f0=None, g0=None):
+  """Log-domain Sinkhorn; f0, g0 optionally warm start the scalings."""
+  n, m = M.shape
+  log_K = -lam * M
+  log_r, log_c = jnp.log(r), jnp.log(c)
+  f = jnp.zeros(n, M.dtype) if f0 is None else f0
+  g = jnp.zeros(m, M.dtype) if g0 is None else g0
+
+  def cond_fun(state):
+    f, g, err, i = state
+    return (err > tol) & (i < max_iter)
+
+  def body_fun(state):
+    f, g, err, i = state
+    # The row log-sums used by the f update also give the current row marginals.
+    lse_rows = logsumexp(g[None, :] + log_K, axis=1)
+    err = jnp.sum(jnp.abs(jnp.exp(f + lse_rows) - r))
+    f = log_r - lse_rows
+    g = log_c - logsumexp(f[:, None] + log_K, axis=0)
+    return f, g, err, i + 1
+
+  init = (f, g, jnp.array(jnp.inf, M.dtype), jnp.array(0))
+  f, g, err, n_iter = lax.while_loop(cond_fun, body_fun, init)
+  cost = jnp.sum(sinkhorn_plan(M, f, g, lam) * M)
+  return SinkhornResult(f, g, cost, n_iter, err)
+
+
+# + [markdown] id="0ALbu7_7pN3M"
+# For large $\lambda$ Sinkhorn needs many iterations from a cold start. With $\epsilon$-scaling we solve a sequence of problems with geometrically increasing $\lambda$ (i.e. decreasing regularization $\epsilon = 1/\lambda$), warm starting each one from the previous solution. The dual potentials $f/\lambda$ and $g/\lambda$ change slowly along this path, so we rescale the log scalings by $\lambda_{k+1}/\lambda_k$ when moving to the next problem.
+
+# + id="A-EAnB7Y_eai"
+@partial(jit, static_argnames=("n_scales", "max_iter"))
+def sinkhorn_log_eps_scaling(M, r, c, lam, lam0=1.0, n_scales=5, tol=1e-6,
+                             max_iter=10000):
+  lams = jnp.geomspace(lam0, lam, n_scales)
+
+  def step(carry, lam_k):
+    f, g, lam_prev = carry
+    res = sinkhorn_log(M, r, c, lam_k, tol=tol, max_iter=max_iter,
+                       f0=f * lam_k / lam_prev, g0=g * lam_k / lam_prev)
+    return (res.f, res.g, lam_k), res
+
+  n, m = M.shape
+  init = (jnp.zeros(n, M.dtype), jnp.zeros(m, M.dtype), lams[0])
+  _, res = lax.scan(step, init, lams)
+  return SinkhornResult(res.f[-1], res.g[-1], res.cost[-1],
+                        jnp.sum(res.n_iter), res.err[-1])
+
+
+def sinkhorn_log_batched(Ms, r, c, lam, tol=1e-6, max_iter=10000):
+  """Solve a stack of problems with cost matrices Ms of shape (b, n, m)."""
+  solve = partial(sinkhorn_log, tol=tol, max_iter=max_iter)
+  return vmap(solve, in_axes=(0, None, None, None))(Ms, r, c, lam)
+
+
+# + [markdown] id="iVxQdyBvXst0"
+# The log-domain solver agrees with the numpy version on the `make_circles` problem, and reports how many iterations it actually needed.
+
+# + id="CiH0xlAlWfc7"
+res = sinkhorn_log(M, r, c, lam=30, tol=1e-6, max_iter=1000)
+print(f"cost {res.cost:.5f} (numpy {d:.5f}), {res.n_iter} iterations, marginal error {res.err:.2e}")
+
+# + [markdown] id="NcPbp-rixD99"
+# It is also stable for large $\lambda$, where the dense `exp(-lam * M)` of the original implementations underflows to zero and produces `nan`s. Convergence gets slower as $\lambda$ grows, though: here the last stage of $\epsilon$-scaling stops at `max_iter` with a marginal error of a few $10^{-5}$, above `tol`, so the result is finite but not converged to `tol` (3000 iterations per stage only bring the error down to about $1.5 \cdot 10^{-5}$).
+
+# + id="TupMQ8Rf7v0i"
+res = sinkhorn_log_eps_scaling(M, r, c, lam=1000, lam0=10., n_scales=4, max_iter=1000)
+print(f"cost {res.cost:.5f}, {res.n_iter} iterations, marginal error {res.err:.2e}, "
+      f"converged to tol=1e-6: {bool(res.err < 1e-6)}")
+print("min of exp(-lam * M):", jnp.exp(-1000 * M).min())
+
+# + [markdown] id="qnY4nYF67dKv"
+# Batched problems: here we compare the circles against several rotated copies of themselves.
+
+# + id="0cb5dqQ4OzsO"
+angles = jnp.linspace(0, jnp.pi / 2, 4)
+rot = jnp.stack([jnp.array([[jnp.cos(a), -jnp.sin(a)], [jnp.sin(a), jnp.cos(a)]]) for a in angles])
+Ms = jnp.stack([jnp.array(distance_matrix(X1, X2 @ R.T)) for R in np.asarray(rot)])
+res = sinkhorn_log_batched(Ms, r, c, 30.)
+print("costs:", res.cost, "iterations:", res.n_iter)
+
+# + [markdown] id="dKweJzwaVKJs"
+# ## Benchmark
+#
+# Wall-clock time of 1000 iterations of the numpy and the original JAX implementations, versus the compiled log-domain solver run to a tolerance of `1e-6` (capped at 1000 iterations). We time the second call of the compiled solver so compilation is excluded.
+
+# + id="qAYoAMHdb34L"
+import time
+
+def timeit(fn, *args, **kwargs):
+  t0 = time.time()
+  out = fn(*args, **kwargs)
+  jax.tree_util.tree_map(lambda x: x.block_until_ready() if hasattr(x, "block_until_ready") else x, out)
+  return out, time.time() - t0
+
+M_np = np.asarray(M)
+_, t_np = timeit(sinkhorn_knopp_np, M_np, r, c, lam=30, niter=1000)
+_, t_jax = timeit(sinkhorn_knopp_jax, M, r, c, lam=30, niter=1000)
+sinkhorn_log(M, r, c, 30., max_iter=1000)  # compile
+res, t_log = timeit(sinkhorn_log, M, r, c, 30., max_iter=1000)
+print(f"numpy loop:        {t_np:.2f}s (1000 iterations)")
+print(f"jax python loop:   {t_jax:.2f}s (1000 iterations)")
+print(f"jax log-domain:    {t_log:.2f}s ({res.n_iter} iterations, error {res.err:.1e})")
+
+
+# + [markdown] id="5x2taWOrxnQf"
+# # Online Sinkhorn without the cost matrix
+#
+# Even in log-space, `sinkhorn_log` needs the dense $n \times m$ cost matrix `M`, so memory grows as $O(nm)$: 10^4 points per side already take 400MB in float32. But each Sinkhorn update only needs the row and column log-sum-exp reductions of $g_j - \lambda C(x_i, y_j)$ and $f_i - \lambda C(x_i, y_j)$. We can compute these tile by tile, recomputing each `block_size` x `block_size` block of costs from the point clouds on the fly and combining the partial results with `logaddexp`. Memory is then $O(n + m + \text{block\_size}^2)$.
+#
+# The point clouds are padded to a multiple of `block_size`; padded points get zero mass ($\log r_i = -\infty$), so they never contribute to any reduction.
+
+# + id="72c_-g_j_T4R"
+def euclidean_cost(x, y):
+  """Pairwise Euclidean distances between the rows of x and y."""
+  sq = jnp.sum(x**2, 1)[:, None] + jnp.sum(y**2, 1)[None, :] - 2 * x @ y.T
+  return jnp.sqrt(jnp.maximum(sq, 0.))
+
+
+def _pad_blocks(a, block_size, fill=0.):
+  """Pad a along axis 0 to a multiple of block_size and split it into blocks."""
+  n = a.shape[0]
+  n_blocks = -(-n // block_size)
+  pad = [(0, n_blocks * block_size - n)] + [(0, 0)] * (a.ndim - 1)
+  a = jnp.pad(a, pad, constant_values=fill)
+  return a.reshape((n_blocks, block_size) + a.shape[1:])
+
+
+def _tiled_logsumexp(Xb, Yb, h, cost_fn, lam):
+  """log sum_j exp(h_j - lam * C(x_i, y_j)) for every x_i, one tile at a time."""
+  def row_block(xb):
+    def col_step(acc, inputs):
+      yb, hb = inputs
+      tile = logsumexp(hb[None, :] - lam * cost_fn(xb, yb), axis=1)
+      return jnp.logaddexp(acc, tile), None
+    acc, _ = lax.scan(col_step, jnp.full(xb.shape[0], -jnp.inf), (Yb, h))
+    return acc
+  return lax.map(row_block, Xb)
+
+
+@partial(jit, static_argnames=("cost_fn", "block_size", "max_iter"))
+def sinkhorn_online(X, Y, r, c, lam, cost_fn=euclidean_cost, block_size=1024,
+                    tol=1e-6, max_iter=10000):
+  """Log-domain Sinkhorn between point clouds X (n, d) and Y (m, d)."""
+  n, m = X.shape[0], Y.shape[0]
+  Xb, Yb = _pad_blocks(X, block_size), _pad_blocks(Y, block_size)
+  log_r = _pad_blocks(jnp.log(r), block_size, -jnp.inf)
+  log_c = _pad_blocks(jnp.log(c), block_size, -jnp.inf)
+  cost_fn_t = lambda y, x: cost_fn(x, y).T
+
+  def cond_fun(state):
+    f, g, err, i = state
+    return (err > tol) & (i < max_iter)
+
+  def body_fun(state):
+    f, g, err, i = state
+    lse_rows = _tiled_logsumexp(Xb, Yb, g, cost_fn, lam)
+    err = jnp.sum(jnp.abs(jnp.exp(f + lse_rows) - jnp.exp(log_r)))
+    f = log_r - lse_rows
+    g = log_c - _tiled_logsumexp(Yb, Xb, f, cost_fn_t, lam)
+    return f, g, err, i + 1
+
+  init = (jnp.zeros_like(log_r), jnp.zeros_like(log_c), jnp.array(jnp.inf), jnp.array(0))
+  f, g, err, n_iter = lax.while_loop(cond_fun, body_fun, init)
+
+  def row_block(inputs):
+    xb, fb = inputs
+    def col_step(acc, inputs):
+      yb, gb = inputs
+      C = cost_fn(xb, yb)
+      return acc + jnp.sum(jnp.exp(fb[:, None] + gb[None, :] - lam * C) * C), None
+    acc, _ = lax.scan(col_step, jnp.array(0.), (Yb, g))
+    return acc
+  cost = jnp.sum(lax.map(row_block, (Xb, f)))
+  return SinkhornResult(f.reshape(-1)[:n], g.reshape(-1)[:m], cost, n_iter, err)
+
+
+# + [markdown] id="rDjzHIO-eVBW"
+# The transport plan is exposed lazily: `online_plan` returns a function that computes any block `P[rows][:, cols]`, and a function that applies $P$ to a vector (or to the columns of a matrix) tile by tile.
+
+# + id="X2rKVFncTb3O"
+def online_plan(X, Y, res, lam, cost_fn=euclidean_cost, block_size=1024):
+  """Lazy access to the plan of a sinkhorn_online result."""
+  def block(rows, cols):
+    C = cost_fn(X[rows], Y[cols])
+    return jnp.exp(res.f[rows][:, None] + res.g[cols][None, :] - lam * C)
+
+  @jit
+  def matvec(v):
+    Xb, Yb = _pad_blocks(X, block_size), _pad_blocks(Y, block_size)
+    fb = _pad_blocks(res.f, block_size, -jnp.inf)
+    gb = _pad_blocks(res.g, block_size, -jnp.inf)
+    vb = _pad_blocks(v, block_size)
+
+    def row_block(inputs):
+      xb, fr = inputs
+      def col_step(acc, inputs):
+        yb, gc, vc = inputs
+        P = jnp.exp(fr[:, None] + gc[None, :] - lam * cost_fn(xb, yb))
+        return acc + jnp.tensordot(P, vc, axes=1), None
+      acc, _ = lax.scan(col_step, jnp.zeros(xb.shape[:1] + v.shape[1:]), (Yb, gb, vb))
+      return acc
+    Pv = lax.map(row_block, (Xb, fb))
+    return Pv.reshape((-1,) + v.shape[1:])[:X.shape[0]]
+
+  return block, matvec
+
+
+# + [markdown] id="4nIjpiOeTtrE"
+# On the `make_circles` problem above the online solver matches the dense log-domain solver, and applying the lazy plan to a vector of ones recovers the row marginals.
+
+# + id="AjjT3813h8qJ"
+res_dense = sinkhorn_log(M, r, c, 30., max_iter=1000)
+res_online = sinkhorn_online(X1, X2, r, c, 30., block_size=1024, max_iter=1000)
+print(f"dense cost {res_dense.cost:.5f}, online cost {res_online.cost:.5f}")
+
+plan_block, plan_matvec = online_plan(X1, X2, res_online, 30.)
+print("max |P 1 - r| =", jnp.abs(plan_matvec(jnp.ones(m)) - r).max())
+print("max |P[:5, :5] - dense| =",
+      jnp.abs(plan_block(jnp.arange(5), jnp.arange(5)) - sinkhorn_plan(M, res_dense.f, res_dense.g, 30.)[:5, :5]).max())
+
+# + [markdown] id="9B0TIDcpmqBZ"
+# Scaling up: 10^5 points per side would need a 40GB cost matrix, but the online solver only ever holds one `block_size` x `block_size` tile at a time. Each iteration still does $O(nm)$ work, so on a CPU we cap the number of iterations at 10 here. This run only measures the time per iteration: it stops far from convergence, and its cost and marginal error are those of an unconverged plan.
+
+# + id="vys-Sq9T0hvc"
+n_large = 200000
+X_large, y_large = make_circles(n_samples=n_large, noise=0.05, factor=0.5, shuffle=False)
+X1_large, X2_large = jnp.array(X_large[y_large == 0]), jnp.array(X_large[y_large == 1])
+r_large = jnp.ones(len(X1_large)) / len(X1_large)
+c_large = jnp.ones(len(X2_large)) / len(X2_large)
+
+t0 = time.time()
+# Timing only: 10 iterations are far from convergence
+res_large = sinkhorn_online(X1_large, X2_large, r_large, c_large, 30., block_size=2048, max_iter=10)
+res_large.cost.block_until_ready()
+print(f"{len(X1_large)} x {len(X2_large)} points: cost {res_large.cost:.5f}, "
+      f"{res_large.n_iter} iterations, marginal error {res_large.err:.2e}, {time.time() - t0:.1f}s")
+
 # + [markdown] id="ZZepBvuoJlMo"
 # # Visualisation of sinkorn algorithm
 # **Warning**: Only taking a subset of points to map otherwise the visualisation will look cluttered on matplotlib